@@ -0,0 +1,26 @@
+# run the below command from the root directory of project
+# python3 -m benchmarks.bench_change_dtypes
+
+import timeit
+from dfcleaner.cleaner import _filter_characters, _filter_characters_vectorized
+from benchmarks.data import make_currency_column
+
+
+def main(n_rows=1_000_000, repeat=3):
+    col = make_currency_column(n_rows)
+
+    apply_time = min(timeit.repeat(
+        lambda: col.apply(lambda x: _filter_characters(float, x)),
+        number=1, repeat=repeat))
+    vectorized_time = min(timeit.repeat(
+        lambda: _filter_characters_vectorized(float, col),
+        number=1, repeat=repeat))
+
+    print('rows: {}'.format(n_rows))
+    print('apply:      {:.3f}s'.format(apply_time))
+    print('vectorized: {:.3f}s'.format(vectorized_time))
+    print('speedup:    {:.1f}x'.format(apply_time / vectorized_time))
+
+
+if __name__ == '__main__':
+    main()
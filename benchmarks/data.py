@@ -0,0 +1,77 @@
+'''
+synthetic dirty data for the benchmarks
+'''
+import numpy as np
+import pandas as pd
+
+
+def make_currency_column(n_rows, seed=0):
+    '''
+    builds a column of currency strings like '$ 5,000.00' with
+    a few '?' placeholders and missing values mixed in
+    '''
+    rng = np.random.default_rng(seed)
+    amounts = rng.uniform(0, 100000, n_rows).round(2)
+    values = np.array(['$ {:,.2f}'.format(x) for x in amounts], dtype=object)
+    values[rng.random(n_rows) < 0.01] = '?'
+    values[rng.random(n_rows) < 0.01] = np.nan
+    return pd.Series(values, name='price')
+
+
+def make_placeholder_column(n_rows, seed=0):
+    '''
+    builds a column of numbers stored as strings ('12.5', '7') with
+    '?', 'null' and 'na' placeholders instead of nan values
+    '''
+    rng = np.random.default_rng(seed)
+    values = rng.normal(50, 10, n_rows).round(1).astype(str).astype(object)
+    is_placeholder = rng.random(n_rows) < 0.05
+    values[is_placeholder] = rng.choice(['?', 'null', 'na'], is_placeholder.sum())
+    return pd.Series(values, name='Measured Value')
+
+
+def make_dirty_frame(n_rows, n_numeric_cols=8, duplicate_ratio=0.05, seed=0):
+    '''
+    builds a dataframe that looks like real dirty data
+        - float columns with nan values and a few outliers
+        - an int column with a huge outlier
+        - a currency string column and a column of numbers as strings
+            with placeholders (see the functions above)
+        - a low cardinality string column and an id like column
+        - a label column with nan values
+        - 'duplicate_ratio' of the rows are copies of other rows
+
+    Returns: (pandas.DataFrame, conversion dictionary for its string columns)
+    '''
+    rng = np.random.default_rng(seed)
+    n_unique = n_rows - int(n_rows * duplicate_ratio)
+
+    features = rng.normal(0, 1, (n_unique, n_numeric_cols))
+    features[rng.random(features.shape) < 0.05] = np.nan
+    features[rng.random(features.shape) < 0.001] = 1000
+    df = pd.DataFrame(features, columns=['feature {}'.format(i) for i in range(n_numeric_cols)])
+
+    df['Quantity'] = rng.integers(0, 100, n_unique)
+    df.loc[0, 'Quantity'] = 10 ** 6
+    df['price'] = make_currency_column(n_unique, seed).to_numpy()
+    df['Measured Value'] = make_placeholder_column(n_unique, seed).to_numpy()
+    df['CountryName'] = rng.choice(['France', 'India', 'Peru', None], n_unique)
+    df['customer_id'] = np.arange(n_unique).astype(str)
+    df['label'] = rng.choice([0.0, 1.0, np.nan], n_unique, p=[0.45, 0.45, 0.1])
+
+    duplicates = df.iloc[rng.integers(0, n_unique, n_rows - n_unique)]
+    df = pd.concat([df, duplicates], ignore_index=True)
+
+    return df, {'price': float, 'Measured Value': float}
+
+
+def make_wide_frame(n_rows, n_cols, seed=0):
+    '''
+    builds a dataframe with many float columns (with nan values and
+    outliers) and a few rows
+    '''
+    rng = np.random.default_rng(seed)
+    values = rng.normal(0, 1, (n_rows, n_cols))
+    values[rng.random((n_rows, n_cols)) < 0.05] = np.nan
+    values[rng.random((n_rows, n_cols)) < 0.001] = 1000
+    return pd.DataFrame(values, columns=['Col{}'.format(i) for i in range(n_cols)])
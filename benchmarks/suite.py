@@ -0,0 +1,220 @@
+# run the below command from the root directory of project
+# python3 -m benchmarks.suite                 (compare with the stored baseline)
+# python3 -m benchmarks.suite --save          (store the results as the new baseline)
+# python3 -m benchmarks.suite -k preprocess   (only the cases whose name contains 'preprocess')
+
+'''
+benchmark suite of the cleaner functions on synthetic dirty data
+(see benchmarks.data) at a few sizes and shapes.
+
+Every case is run 'repeat' times and the fastest time is kept. The
+peak memory allocated during one more run is measured with tracemalloc
+(numpy and pandas buffers included).
+
+The results are compared with the baseline stored in
+benchmarks/baseline.json and the exit code is 1 if any case got slower
+or uses more memory than the baseline plus the tolerances. The times
+depend on the machine, so the baseline should be saved (--save) on the
+machine the suite runs on, before the change to verify. The default
+time tolerance (50%) absorbs the noise of shared machines, use
+--time-tolerance 0.1 on a quiet one.
+'''
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from dfcleaner import cleaner
+from dfcleaner.dflogger import change_logger
+from benchmarks.data import make_dirty_frame, make_wide_frame, make_currency_column, make_placeholder_column
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+
+def _preprocess_case(n_rows):
+    df, conversion_dictionary = make_dirty_frame(n_rows)
+    return lambda: cleaner.preprocess(df, conversion_dictionary, label_col='label')
+
+
+def _wide_case(n_rows, n_cols):
+    df = make_wide_frame(n_rows, n_cols)
+    return lambda: cleaner.preprocess(df)
+
+
+def _change_dtypes_case(n_rows):
+    df, conversion_dictionary = make_dirty_frame(n_rows)
+    return lambda: cleaner.change_dtypes(df, conversion_dictionary)
+
+
+def _sanitize_case(n_rows):
+    names = pd.concat([make_placeholder_column(n_rows), make_currency_column(n_rows)])
+    names = names.fillna('missing')
+
+    def sanitize():
+        # every run starts without the cached results of the previous one
+        cleaner._sanitize_string.cache_clear()
+        return cleaner.sanitize(names)
+    return sanitize
+
+
+def _suggest_case(n_rows):
+    df, _ = make_dirty_frame(n_rows)
+    return lambda: cleaner.suggest_conversion_dict(df)
+
+
+def _logged_case(n_rows, log_format):
+    df, conversion_dictionary = make_dirty_frame(n_rows)
+    df = cleaner.change_dtypes(df, conversion_dictionary)
+    log_dir = tempfile.mkdtemp(prefix='dfcleaner_bench_')
+    logged = change_logger(True, log_dir, log_format)(cleaner.remove_outliers)
+    return lambda: logged(df, label_col='label')
+
+
+# name: (function building the data and returning the function to time)
+CASES = {
+    'preprocess_10k': lambda: _preprocess_case(10_000),
+    'preprocess_200k': lambda: _preprocess_case(200_000),
+    'preprocess_wide_2k_x_500': lambda: _wide_case(2_000, 500),
+    'change_dtypes_200k': lambda: _change_dtypes_case(200_000),
+    'sanitize_200k': lambda: _sanitize_case(100_000),
+    'suggest_conversion_dict_200k': lambda: _suggest_case(200_000),
+    'change_logger_csv_50k': lambda: _logged_case(50_000, 'csv'),
+    'change_logger_npz_200k': lambda: _logged_case(200_000, 'npz'),
+}
+
+
+def measure(function, repeat=5):
+    '''
+    Returns: dictionary with the fastest 'time' (seconds) of 'repeat'
+        runs of function() and the 'peak_memory' (bytes) of one run
+    '''
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'time': min(times), 'peak_memory': peak_memory}
+
+
+def run(names=None, repeat=5):
+    '''
+    Returns: dictionary with the case names as keys and the output of
+        measure() as values
+    '''
+    results = {}
+    for name, make_case in CASES.items():
+        if names is not None and name not in names:
+            continue
+        results[name] = measure(make_case(), repeat)
+    return results
+
+
+def compare(results, baseline, time_tolerance=0.5, memory_tolerance=0.1, min_time_delta=0.01):
+    '''
+    Returns: list of (case name, metric, baseline value, new value) of
+        the metrics that are worse than the baseline plus the tolerance
+        (Eg: 0.5 => more than 50% slower). Times that grew by less than
+        'min_time_delta' seconds are timer noise and never regressions.
+    '''
+    tolerances = {'time': time_tolerance, 'peak_memory': memory_tolerance}
+    regressions = []
+    for name, metrics in results.items():
+        if name not in baseline:
+            continue
+        for metric, tolerance in tolerances.items():
+            old, new = baseline[name][metric], metrics[metric]
+            if metric == 'time' and new - old < min_time_delta:
+                continue
+            if new > old * (1 + tolerance):
+                regressions.append((name, metric, old, new))
+    return regressions
+
+
+def environment():
+    return {'python': platform.python_version(), 'numpy': np.__version__,
+            'pandas': pd.__version__, 'machine': platform.machine(),
+            'processor': platform.processor()}
+
+
+def load_baseline(path=BASELINE_PATH):
+    '''
+    Returns: (results, environment) stored by save_baseline()
+    '''
+    with open(path) as f:
+        stored = json.load(f)
+    return stored['results'], stored['environment']
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    # cases that were not run keep their stored values
+    if os.path.exists(path):
+        stored, _ = load_baseline(path)
+        results = dict(stored, **results)
+
+    with open(path, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=2, sort_keys=True)
+
+
+def _format_row(name, metrics, baseline):
+    row = '{:<30} {:>9.4f}s {:>10.1f}MB'.format(name, metrics['time'], metrics['peak_memory'] / 1e6)
+    if name in baseline:
+        row += ' {:>+8.1%} {:>+8.1%}'.format(metrics['time'] / baseline[name]['time'] - 1,
+                                             metrics['peak_memory'] / max(baseline[name]['peak_memory'], 1) - 1)
+    return row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-k', dest='filter', default='',
+                        help='only run the cases whose name contains this string')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', action='store_true', help='store the results as the new baseline')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--time-tolerance', type=float, default=0.5)
+    parser.add_argument('--memory-tolerance', type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    names = [name for name in CASES if args.filter in name]
+    results = run(names, args.repeat)
+
+    baseline, baseline_environment = {}, None
+    if os.path.exists(args.baseline):
+        baseline, baseline_environment = load_baseline(args.baseline)
+
+    print('{:<30} {:>10} {:>12} {:>8} {:>8}'.format('case', 'time', 'peak memory', 'time', 'memory'))
+    for name, metrics in results.items():
+        print(_format_row(name, metrics, baseline))
+
+    if args.save:
+        save_baseline(results, args.baseline)
+        print('baseline saved to {}'.format(args.baseline))
+        return 0
+
+    if baseline_environment is not None and baseline_environment != environment():
+        print('warning: the baseline was saved with {}'.format(baseline_environment))
+
+    regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+    for name, metric, old, new in regressions:
+        print('REGRESSION {} {}: {:.4g} -> {:.4g}'.format(name, metric, old, new))
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
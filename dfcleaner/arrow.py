@@ -0,0 +1,183 @@
+import numpy as np
+import pandas as pd
+
+ENGINES = ['auto', 'python', 'arrow']
+
+# number of strings filtered at once by filter_characters()
+_BLOCK_ROWS = 1 << 16
+
+# the same steps as cleaner._sanitize_string() in RE2 syntax
+_SANITIZE_STEPS = [
+    (r'[^A-Za-z0-9 _]', ''),
+    (r' +', ' '),
+    (r'^ +| +$', ''),
+    (r' ', '_'),
+    (r'(.)([A-Z][a-z]+)', r'\1_\2'),
+    (r'([a-z0-9])([A-Z])', r'\1_\2'),
+    (r'_+', '_'),
+]
+
+
+def use_arrow(engine):
+    '''
+    whether the string conversions should run on Arrow arrays
+
+    Args:
+        engine: 'auto' (Arrow if pyarrow is installed), 'python' or
+            'arrow' (raises an ImportError without pyarrow)
+    '''
+    if engine not in ENGINES:
+        raise ValueError("'engine' must be one of {}".format(ENGINES))
+    if engine == 'python':
+        return False
+    try:
+        import pyarrow.compute  # noqa: F401
+    except ImportError:
+        if engine == 'arrow':
+            raise ImportError("pyarrow is required for the 'arrow' string engine (pip install pyarrow)")
+        return False
+    return True
+
+
+def string_array(values):
+    '''
+    Returns: Arrow string array with the values (missing values as
+        nulls) or None if they are not all strings. A pandas column
+        already stored in Arrow ('str' or 'string[pyarrow]' dtype) is not
+        copied (unless it is split into several chunks).
+
+    Args:
+        values: pandas.Series, pandas.Index or numpy array
+    '''
+    import pyarrow as pa
+
+    try:
+        array = pa.array(values, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return None
+    if not (pa.types.is_string(array.type) or pa.types.is_large_string(array.type)):
+        return None
+    # Eg: a column built by pandas.concat(), only copied if there are several chunks
+    if isinstance(array, pa.ChunkedArray):
+        array = array.chunk(0) if array.num_chunks == 1 else array.combine_chunks()
+    return array
+
+
+def filter_characters(dtype, series):
+    '''
+    Arrow version of cleaner._filter_characters_vectorized(): every
+    character except the digits and '.' is removed by a numpy pass over
+    the data buffer of the Arrow array (the digits are compacted and the
+    offsets of every string are moved accordingly) and the remaining
+    strings are cast to float64 or int64 by Arrow. The rows are processed
+    in blocks written into the result, so the temporary arrays are block
+    sized instead of data buffer sized.
+
+    Returns: pandas.Series with the parsed values, or None when the
+        result could differ from the python one (non-string values, non
+        ascii strings that str.isdigit() may accept, strings that float()
+        or int() reject, ...) and the python version must be used
+
+    Args:
+        dtype: int or float
+        series: pandas.Series of strings
+    '''
+    array = string_array(series)
+    if array is None:
+        return None
+    # the python version only gives a float column when the missing values
+    # of an object column are float nans (None stays None)
+    if array.null_count and series.dtype == object:
+        missing = series.to_numpy()[series.isna().to_numpy()]
+        if any(type(value) is not float for value in missing):
+            return None
+
+    # int64 as long as there are no missing values, like the python version
+    values = np.empty(len(array), dtype=np.int64 if dtype is int else np.float64)
+    is_missing = np.zeros(len(array), dtype=bool) if dtype is int else None
+    for start in range(0, len(array), _BLOCK_ROWS):
+        parsed = _parse_block(array.slice(start, _BLOCK_ROWS), dtype)
+        if parsed is None:
+            return None
+        block = slice(start, start + len(parsed))
+        if dtype is int:
+            is_missing[block] = parsed.is_null().to_numpy(zero_copy_only=False)
+            parsed = parsed.fill_null(0)
+        values[block] = parsed.to_numpy(zero_copy_only=False)
+
+    if is_missing is not None and is_missing.any():
+        values = values.astype(np.float64)
+        values[is_missing] = np.nan
+    return pd.Series(values, index=series.index, name=series.name)
+
+
+def _parse_block(array, dtype):
+    '''
+    filters and casts the strings of a block of rows for
+    filter_characters(), so the temporary arrays stay block sized
+
+    Returns: int64 or float64 Arrow array or None
+    '''
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    offsets, data = _string_buffers(array)
+    if data.size and data.max() >= 0x80:
+        return None
+
+    is_kept = ((data >= ord('0')) & (data <= ord('9'))) | (data == ord('.'))
+    kept_before = np.zeros(len(data) + 1, dtype=np.int64)
+    np.cumsum(is_kept, out=kept_before[1:])
+    digit_offsets = kept_before[offsets]
+
+    # no digits and no '.' => nan, like the missing values
+    is_valid = np.diff(digit_offsets) > 0
+    if array.null_count:
+        is_valid &= array.is_valid().to_numpy(zero_copy_only=False)
+
+    digits = pa.LargeStringArray.from_buffers(
+        len(array), pa.py_buffer(digit_offsets), pa.py_buffer(data[is_kept]),
+        pa.py_buffer(np.packbits(is_valid, bitorder='little')))
+    try:
+        return pc.cast(digits, pa.int64() if dtype is int else pa.float64())
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return None
+
+
+def _string_buffers(array):
+    '''
+    Returns: (offsets, data) numpy views of the buffers of an Arrow string
+        array, where string i is data[offsets[i]:offsets[i + 1]]
+    '''
+    _, offsets_buffer, data_buffer = array.buffers()
+    offset_dtype = np.int64 if array.type == 'large_string' else np.int32
+    offsets = np.frombuffer(offsets_buffer, dtype=offset_dtype)[array.offset:array.offset + len(array) + 1]
+
+    first, last = int(offsets[0]), int(offsets[-1])
+    data = np.zeros(0, dtype=np.uint8)
+    if data_buffer is not None:
+        data = np.frombuffer(data_buffer, dtype=np.uint8)[first:last]
+    return offsets.astype(np.int64) - first, data
+
+
+def sanitize_strings(values):
+    '''
+    Arrow version of the cleaner.sanitize() steps
+
+    Returns: list of the sanitized strings or None if the values are
+        not all strings
+
+    Args:
+        values: pandas.Series, pandas.Index or numpy array of strings
+    '''
+    import pyarrow.compute as pc
+
+    array = string_array(values)
+    if array is None or array.null_count > 0:
+        return None
+
+    for pattern, replacement in _SANITIZE_STEPS:
+        array = pc.replace_substring_regex(array, pattern, replacement)
+    # only ascii characters are left
+    return pc.ascii_lower(array).to_pylist()
+
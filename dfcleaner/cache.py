@@ -0,0 +1,307 @@
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import time
+import uuid
+import numpy as np
+import pandas as pd
+import dfcleaner
+from dfcleaner.cleaner import preprocess
+
+# preprocess() parameters that don't change the result (inplace=True is
+# rejected: a hit couldn't change df like a miss does)
+_UNKEYED_PARAMS = ['df', 'n_jobs', 'executor', 'inplace']
+# numpy dtype kinds stored as .npy files (everything else goes to Arrow)
+_NPY_KINDS = 'biufcmM'
+
+
+class PreprocessCache:
+    '''
+    content-addressed on-disk cache of cleaner.preprocess() results, for
+    jobs that clean the same input with the same arguments again.
+
+    The key is a hash of
+        - every column of the input frame, losslessly: the raw buffer of
+            numpy columns, pandas.util.hash_pandas_object() of the other
+            ones plus the type of every value of object columns (so 1 and
+            '1' give different keys), the column names and dtypes and the
+            index
+        - the preprocess() arguments that change the result (n_jobs and
+            executor don't) and the dfcleaner version
+    so computing it costs a single vectorized pass over the frame (and a
+    look at the type of every value of object columns).
+
+    Every cached result is a directory in cache_dir with
+        - one .npy file per numeric, bool or datetime column, opened back
+            memory mapped (copy on write: the returned dataframe can be
+            changed, the file is never modified) so a hit doesn't read or
+            copy the columns until they are used
+        - one Arrow IPC file (memory mapped, needs pyarrow) with the other
+            columns (strings, categories, nullable dtypes...) and the index
+            unless it is a RangeIndex
+    Results with other columns are not cached if pyarrow is missing, nor
+    are results with duplicate column names.
+
+    Eviction: when 'max_bytes' is given, the least recently used results
+    are deleted once the cache holds more (every hit refreshes the time
+    of its result).
+
+    Processes on the same host can share a cache_dir: a result is written
+    into a temporary directory and renamed into place (only the first
+    process to finish keeps its copy), and evicted results are renamed
+    away before they are deleted, so a reader only sees complete results.
+    Readers that already mapped the files of an evicted result keep them.
+
+    Attributes:
+        hits, misses: number of preprocess() calls served from the cache
+            or computed
+
+    Args:
+        cache_dir: directory of the cache (created if needed)
+        max_bytes: (optional) maximum total size of the cached files
+    '''
+
+    def __init__(self, cache_dir, max_bytes=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def preprocess(self, df, *args, **kwargs):
+        '''
+        cached cleaner.preprocess(): same arguments and result, except
+        inplace=True which raises a ValueError (df is never changed)
+
+        Returns: the cleaned up pandas.DataFrame
+        '''
+        key = self.key(df, *args, **kwargs)
+        cleaned = self.get(key)
+        if cleaned is not None:
+            self.hits += 1
+            return cleaned
+
+        self.misses += 1
+        cleaned = preprocess(df, *args, **kwargs)
+        self.put(key, cleaned)
+        return cleaned
+
+    def key(self, df, *args, **kwargs):
+        '''
+        Returns: hex key of the preprocess() result of df with the given
+            arguments
+        '''
+        params = inspect.signature(preprocess).bind(df, *args, **kwargs)
+        params.apply_defaults()
+        if params.arguments['inplace']:
+            raise ValueError("'inplace' parameter can't be True with a cache, a cached result "
+                             "can't be written into df")
+        params = {name: value for name, value in params.arguments.items()
+                  if name not in _UNKEYED_PARAMS}
+        # the order of the conversions doesn't change the result
+        conversions = params.pop('column_dtype_conversion_dictionary')
+        params['conversions'] = sorted((repr(col_name), repr(dtype)) for col_name, dtype in conversions.items())
+
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(json.dumps([dfcleaner.__version__, params,
+                                  [repr(col_name) for col_name in df.columns],
+                                  [str(dtype) for dtype in df.dtypes]],
+                                 sort_keys=True, default=repr).encode())
+        for i in range(df.shape[1]):
+            _update_column(digest, df.iloc[:, i])
+        digest.update(pd.util.hash_pandas_object(df.index).to_numpy().tobytes())
+        digest.update(repr(df.index.names).encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        '''
+        Returns: the cached pandas.DataFrame or None
+        '''
+        entry_dir = os.path.join(self.cache_dir, key)
+        try:
+            with open(os.path.join(entry_dir, 'meta.json')) as f:
+                meta = json.load(f)
+            df = _read_entry(entry_dir, meta)
+            # last use, for the LRU eviction
+            os.utime(os.path.join(entry_dir, 'meta.json'))
+        except (FileNotFoundError, NotADirectoryError):
+            # not cached, or evicted by another process meanwhile
+            return None
+        return df
+
+    def put(self, key, df):
+        '''
+        caches df under key (if its columns can be stored) and evicts the
+        least recently used results if the cache gets too big
+        '''
+        if not df.columns.is_unique or (not _has_pyarrow() and _needs_arrow(df)):
+            return
+
+        tmp_dir = os.path.join(self.cache_dir, '.tmp-{}'.format(uuid.uuid4().hex))
+        os.makedirs(tmp_dir)
+        try:
+            meta = _write_entry(tmp_dir, df)
+            with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+                json.dump(meta, f)
+            try:
+                os.rename(tmp_dir, os.path.join(self.cache_dir, key))
+            except OSError:
+                # another process cached the same result first
+                pass
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        if self.max_bytes is not None:
+            self._evict(self.max_bytes)
+
+    def size(self):
+        '''
+        Returns: total size in bytes of the cached results
+        '''
+        return sum(entry_bytes for _, _, entry_bytes in self._entries())
+
+    def clear(self):
+        '''
+        deletes all the cached results
+        '''
+        self._evict(0)
+
+    def _entries(self):
+        '''
+        Returns: list of (last use time, key, bytes) of the cached results
+        '''
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            if key.startswith('.'):
+                continue
+            meta_path = os.path.join(self.cache_dir, key, 'meta.json')
+            try:
+                last_use = os.stat(meta_path).st_mtime
+                with open(meta_path) as f:
+                    entries.append((last_use, key, json.load(f)['bytes']))
+            except (FileNotFoundError, NotADirectoryError, ValueError):
+                continue
+        return entries
+
+    def _evict(self, max_bytes):
+        entries = sorted(self._entries())
+        total = sum(entry_bytes for _, _, entry_bytes in entries)
+        for _, key, entry_bytes in entries:
+            if total <= max_bytes:
+                break
+            trash_dir = os.path.join(self.cache_dir, '.evicted-{}'.format(uuid.uuid4().hex))
+            try:
+                os.rename(os.path.join(self.cache_dir, key), trash_dir)
+            except OSError:
+                # evicted by another process
+                continue
+            shutil.rmtree(trash_dir, ignore_errors=True)
+            total -= entry_bytes
+
+
+def _update_column(digest, col):
+    '''
+    adds the values of a column to a hash, losslessly
+    '''
+    values = col.to_numpy() if isinstance(col.dtype, np.dtype) else None
+    if values is not None and values.dtype != object:
+        digest.update(np.ascontiguousarray(values).view(np.uint8))
+        return
+
+    digest.update(pd.util.hash_pandas_object(col, index=False).to_numpy().tobytes())
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        # the order of the categories
+        digest.update(pd.util.hash_pandas_object(col.cat.categories, index=False).to_numpy().tobytes())
+        digest.update(repr(col.cat.ordered).encode())
+    if values is not None and pd.api.types.infer_dtype(values, skipna=False) != 'string':
+        # hash_pandas_object() hashes the objects through their string
+        # representation, so 1 and '1' only differ by their type
+        digest.update('\0'.join(type(value).__name__ for value in values).encode())
+
+
+def _has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _is_npy_column(col):
+    return isinstance(col.dtype, np.dtype) and col.dtype.kind in _NPY_KINDS
+
+
+def _needs_arrow(df):
+    return not isinstance(df.index, pd.RangeIndex) or not all(
+        _is_npy_column(df.iloc[:, i]) for i in range(df.shape[1]))
+
+
+def _write_entry(entry_dir, df):
+    '''
+    writes the columns of df into entry_dir
+
+    Returns: json serializable description of the files (see _read_entry())
+    '''
+    columns = []
+    arrow_positions = []
+    for i in range(df.shape[1]):
+        col = df.iloc[:, i]
+        if _is_npy_column(col):
+            filename = 'col_{}.npy'.format(i)
+            np.save(os.path.join(entry_dir, filename), col.to_numpy())
+            columns.append(['npy', filename])
+        else:
+            arrow_positions.append(i)
+            columns.append(['arrow', None])
+
+    index = None
+    if isinstance(df.index, pd.RangeIndex):
+        index = [df.index.start, df.index.stop, df.index.step, df.index.name]
+    if arrow_positions or index is None:
+        import pyarrow as pa
+
+        # string names for Arrow, the real ones are in 'names'
+        arrow_df = df.iloc[:, arrow_positions]
+        arrow_df.columns = ['col_{}'.format(i) for i in arrow_positions]
+        table = pa.Table.from_pandas(arrow_df, preserve_index=index is None)
+        with pa.OSFile(os.path.join(entry_dir, 'columns.arrow'), 'wb') as f:
+            with pa.ipc.new_file(f, table.schema) as writer:
+                writer.write_table(table)
+
+    names = list(df.columns)
+    entry_bytes = sum(os.path.getsize(os.path.join(entry_dir, filename))
+                      for filename in os.listdir(entry_dir))
+    return {'names': names, 'columns': columns, 'range_index': index, 'rows': len(df),
+            'bytes': entry_bytes, 'created': time.time()}
+
+
+def _read_entry(entry_dir, meta):
+    arrow_df = None
+    if os.path.exists(os.path.join(entry_dir, 'columns.arrow')):
+        import pyarrow as pa
+
+        with pa.memory_map(os.path.join(entry_dir, 'columns.arrow')) as source:
+            arrow_df = pa.ipc.open_file(source).read_all().to_pandas()
+
+    data = {}
+    for i, (storage, filename) in enumerate(meta['columns']):
+        if storage == 'npy':
+            values = np.load(os.path.join(entry_dir, filename), mmap_mode='c')
+            data[i] = pd.Series(values.view(np.ndarray), copy=False)
+        else:
+            data[i] = arrow_df['col_{}'.format(i)].reset_index(drop=True)
+
+    if meta['range_index'] is not None:
+        start, stop, step, name = meta['range_index']
+        index = pd.RangeIndex(start, stop, step, name=name)
+    else:
+        index = arrow_df.index
+
+    df = pd.DataFrame(data, copy=False)
+    if not data:
+        df = pd.DataFrame(index=range(meta['rows']))
+    df.index = index
+    df.columns = pd.Index(meta['names'])
+    return df
@@ -1,14 +1,54 @@
+import functools
+import os
 import pandas as pd
 import numpy as np
 import re
-from dfcleaner.dflogger import change_logger
+from concurrent.futures import ThreadPoolExecutor
+from dfcleaner.dflogger import change_logger, LogConfig, snapshot
+from dfcleaner.profiling import profiled, is_profiling, timed_call, record_columns
+from dfcleaner.stats import column_stats, ColumnStats, Moments, QuantileSketch
+from dfcleaner.dedup import first_row_occurrences
+from dfcleaner.inference import infer_types
+from dfcleaner.impute import group_fill_values, regression_fill_values
+from dfcleaner import arrow
+from dfcleaner.rules import RuleSet
+from dfcleaner.encoding import OneHotEncoder, SCALE_METHODS, scale_values, scale_parameters
 
 ENABLE_LOGGING = False
 LOG_DIR = '.'
-
-
-@change_logger(ENABLE_LOGGING, LOG_DIR)
-def preprocess(df, column_dtype_conversion_dictionary={}, std_coeff=1.5, fill_na_method='median', label_col=None):
+LOG_FORMAT = 'csv'
+# read by the decorated functions on every call, so the settings above
+# can be changed at any time (through the module or the config)
+LOG_CONFIG = LogConfig(namespace=globals())
+# 'auto', 'python' or 'arrow', see arrow.use_arrow()
+STRING_ENGINE = 'auto'
+
+FILL_NA_METHODS = ['median', 'mean', 'approx_median']
+OUTLIER_METHODS = ['zscore', 'iqr', 'mad']
+
+# scale of the median absolute deviation to estimate the std of
+# normally distributed values
+_MAD_SCALE = 1.4826
+
+# number of rows handed over to the byte level parser at once
+_PARSE_BLOCK_ROWS = 1 << 16
+# longest string handed over to the byte level parser: a block is as
+# wide as its longest string and is scanned once per character position,
+# so longer strings (never plain numbers) are parsed one by one
+_MAX_PARSE_WIDTH = 64
+# number of values handed over to a quantile sketch at once
+_SKETCH_BLOCK_ROWS = 1 << 16
+# number of rows whose outlier scores are computed at once
+_MASK_BLOCK_ROWS = 1 << 16
+# 10**k is exactly representable as a float for k <= 22
+_POWERS_OF_TEN = np.array([float(10 ** k) for k in range(23)])
+
+
+@profiled
+@change_logger(LOG_CONFIG)
+def preprocess(df, column_dtype_conversion_dictionary={}, std_coeff=1.5, fill_na_method='median', label_col=None,
+               n_jobs=None, executor=None, quantile_error=0.01, downcast=False, inplace=False,
+               outlier_method='zscore', scale_method=None, one_hot=None, max_levels=None):
     '''
     A convinient function that 
         - changes the datatypes of columns according to the 
@@ -17,13 +57,38 @@ def preprocess(df, column_dtype_conversion_dictionary={}, std_coeff=1.5, fill_na
         - drops duplicate rows
         - if there is a target(label) column then drops all rows where that
             column value is null
-        - removes outliers according to the std coefficient given as a parameter
-            (doesn't consider the target(label) column to check for outliers)
+        - removes outliers according to the std coefficient and the outlier
+            method given as parameters (doesn't consider the target(label)
+            column to check for outliers)
         - fills nan values according to the fill_na_method parameter
+        - (if scale_method is given) scales the numeric columns, except
+            the target(label) column, see scale()
+        - (if one_hot is given) one-hot encodes the categorical columns,
+            see one_hot_encode()
+        - (if downcast is True) stores every column with the smallest
+            dtype that holds its values, see downcast_dtypes()
 
     Note: This function performs all the above said actions in the 
         same order as mentioned.
 
+    inplace and copy (same for every function of this module):
+        - inplace=False (default): df is left untouched. The changed
+            columns are new arrays; the other columns are shared with
+            df (with copy on write, pandas >= 3) or copied (older pandas).
+            Every changed column costs one column sized allocation.
+        - inplace=True: df itself is changed and returned. The outliers
+            and nan values of float columns are written into the existing
+            column buffers with a boolean mask, without any column sized
+            allocation (unless another dataframe shares the buffer, then
+            pandas copies it first, and when df holds columns of several
+            dtypes, pandas uses a temporary copy of the column while
+            writing). Columns that change dtype (dtype
+            conversions, int columns that get nan values, downcasting) are
+            replaced by new columns and the rows are dropped in place,
+            which needs a unique index.
+        Here, copy mode copies df once (shallow with copy on write) and
+        then runs every step in place on that copy.
+
     All the functions that are used here can also be used
     independently.
 
@@ -38,24 +103,147 @@ def preprocess(df, column_dtype_conversion_dictionary={}, std_coeff=1.5, fill_na
 
         std_coeff: coefficient of standard deviation in outlier removal
 
-        fill_na_method: 'mean' or 'median'. nan values of each column will
-            be replaced by that column's mean or median
+        fill_na_method: 'mean', 'median' or 'approx_median'. nan values of
+            each column will be replaced by that column's mean or median
+            (see fill_nan())
 
         label_col: the target(label) column name (if any) as a string
+
+        n_jobs: (optional) number of threads to spread the per column
+            work of every step over (-1 means one per cpu)
+
+        executor: (optional) concurrent.futures executor to use instead
+            (Eg: a ProcessPoolExecutor); see change_dtypes()
+
+        quantile_error: rank error of the 'approx_median' fill_na_method
+
+        downcast: whether to run downcast_dtypes() on the cleaned up
+            dataframe to cut its memory
+
+        inplace: if True, df itself is cleaned up and returned
+
+        outlier_method: 'zscore', 'iqr' or 'mad', see remove_outliers()
+
+        scale_method: (optional) 'standard' or 'minmax', see scale()
+
+        one_hot: (optional) True to one-hot encode all the 'category'
+            columns or a list of the columns to encode
+
+        max_levels: (optional) maximum number of levels per encoded
+            column, see one_hot_encode()
     '''
+    # a single thread pool shared by all the steps
+    if executor is None and _n_workers(n_jobs) > 1:
+        with ThreadPoolExecutor(_n_workers(n_jobs)) as pool:
+            return _preprocess(df, column_dtype_conversion_dictionary, std_coeff,
+                               fill_na_method, label_col, pool, quantile_error, downcast, inplace,
+                               outlier_method, scale_method, one_hot, max_levels)
+
+    return _preprocess(df, column_dtype_conversion_dictionary, std_coeff,
+                       fill_na_method, label_col, executor, quantile_error, downcast, inplace,
+                       outlier_method, scale_method, one_hot, max_levels)
+
+
+def lazy(df):
+    '''
+    Returns: lazy.LazyFrame that records the cleaning steps called on it
+        and runs them as an optimized plan on collect()
+        Eg: lazy(df).change_dtypes(conversion_dict).dedup().dropna('label') \\
+                .remove_outliers(1.5, label_col='label').fill_nan('median').collect()
+    '''
+    from dfcleaner.lazy import LazyFrame
+    return LazyFrame(df)
+
+
+def _preprocess(df, column_dtype_conversion_dictionary, std_coeff, fill_na_method, label_col, executor,
+                quantile_error, downcast, inplace, outlier_method, scale_method, one_hot, max_levels):
+    if not inplace:
+        df = snapshot(df)
+
     # df = sanitize_column_names(df)
-    df = change_dtypes(df, column_dtype_conversion_dictionary)
-    df = df.drop_duplicates()
+    df = change_dtypes(df, column_dtype_conversion_dictionary, executor=executor, inplace=True)
 
-    if label_col is not None:
+    # in copy mode, the rows are taken into a new dataframe instead of
+    # being dropped in place, which would need a unique index
+    df = drop_duplicates(df, inplace=inplace)
+
+    if label_col is not None and inplace:
+        df.dropna(subset=[label_col], inplace=True)
+    elif label_col is not None:
         df = df.dropna(subset=[label_col])
 
-    df = remove_outliers(df, std_coeff, label_col=label_col)
-    df = fill_nan(df, fill_na_method, label_col=label_col)
+    df = remove_outliers(df, std_coeff, label_col=label_col, executor=executor, inplace=True,
+                         method=outlier_method)
+
+    if scale_method is None:
+        df = fill_nan(df, fill_na_method, label_col=label_col, executor=executor,
+                      quantile_error=quantile_error, inplace=True)
+    else:
+        # the scaling statistics come from the pass of the fill values
+        fill_cols = [col_name for col_name in df.columns if df[col_name].dtype == float]
+        scale_cols = [col_name for col_name in df.columns
+                      if col_name != label_col and df[col_name].dtype.kind in 'iuf']
+        fill_values, parameters = _fill_and_scale_parameters(df, fill_cols, scale_cols, fill_na_method,
+                                                             scale_method, quantile_error)
+        df = fill_nan(df, fill_na_method, fill_values=fill_values, executor=executor, inplace=True)
+        df = scale(df, scale_method, parameters=parameters, executor=executor, inplace=True)
+    if one_hot is not None:
+        df = one_hot_encode(df, columns=_one_hot_columns(df, one_hot, label_col), max_levels=max_levels,
+                            inplace=True)
+
+    if downcast:
+        df = downcast_dtypes(df, executor=executor, inplace=True)
 
     return df
 
 
+def _fill_and_scale_parameters(df, fill_cols, scale_cols, fill_na_method, scale_method, quantile_error):
+    '''
+    fill values of fill_cols and scale() parameters of scale_cols once
+    filled, from a single stats.column_stats() pass: filling the k nan
+    values of a column with f merges Moments(k, f, 0, f, f) into its
+    moments, so the filled columns don't need another pass
+
+    Returns: (dictionary of the fill values, dictionary of the
+        (center, spread) parameters)
+    '''
+    cols = fill_cols + [col_name for col_name in scale_cols if col_name not in fill_cols]
+    stats = column_stats([df[col_name].to_numpy() for col_name in cols],
+                         quantiles=[0.5] if fill_na_method == 'median' else None)
+    moments = dict(zip(cols, stats.to_moments()))
+
+    fill_values = {}
+    for i, col_name in enumerate(fill_cols):
+        if fill_na_method == 'approx_median':
+            fill_values[col_name] = float(_approx_median(df[col_name].to_numpy(), quantile_error))
+        elif fill_na_method == 'median':
+            fill_values[col_name] = float(stats.median[i])
+        else:
+            fill_values[col_name] = float(stats.mean[i])
+
+        n_nan = len(df) - moments[col_name].count
+        fill_value = fill_values[col_name]
+        if n_nan > 0 and fill_value == fill_value:
+            moments[col_name].merge(Moments(n_nan, fill_value, 0.0, fill_value, fill_value))
+
+    scale_moments = [moments[col_name] for col_name in scale_cols]
+    scale_stats = ColumnStats(*(np.array([getattr(col_moments, name) for col_moments in scale_moments],
+                                         dtype=np.float64)
+                                for name in ['count', 'mean', 'm2', 'min', 'max']))
+    return fill_values, dict(zip(scale_cols, scale_parameters(scale_method, scale_stats)))
+
+
+def _one_hot_columns(df, one_hot, label_col):
+    '''
+    Returns: the columns preprocess() encodes: the given ones or, if
+        one_hot is True, the 'category' columns except the label column
+    '''
+    if one_hot is not True:
+        return list(one_hot)
+    return [col_name for col_name in df.columns
+            if isinstance(df[col_name].dtype, pd.CategoricalDtype) and col_name != label_col]
+
+
 def sanitize(arr):
     '''
     for each string in the array, this function will
@@ -70,34 +258,64 @@ def sanitize(arr):
     Note: This function performs all the above said actions in the 
         same order as mentioned
 
+    The results are cached, so repeated strings are only sanitized once.
+    If a pandas.Series or pandas.Index is given (Eg: a categorical column
+    with millions of rows), only its distinct values are sanitized and
+    then spread back over all the rows. With the Arrow string engine
+    (see STRING_ENGINE), the distinct values all go through each step at
+    once with pyarrow.compute regex kernels.
+
     Returns: array of strings where the strings are 'sanitized'
     Args:
-        arr: array of strings
+        arr: array of strings (list, numpy array, pandas.Series or pandas.Index)
     '''
-    new_arr = []
-    for string in arr:
-        # only keep alphanumeric, space and underscore
-        string = re.sub(r"[^A-Za-z0-9 _]", "", string)
+    if isinstance(arr, (pd.Series, pd.Index)):
+        codes, uniques = pd.factorize(arr)
 
-        # remove multiple consecutive spaces
-        string = re.sub(r" +", " ", string)
+        # missing values can't be sanitized, the loop below raises
+        # the same error the strings of a list would
+        if not (codes == -1).any():
+            sanitized = None
+            if arrow.use_arrow(STRING_ENGINE):
+                sanitized = arrow.sanitize_strings(uniques)
+            if sanitized is None:
+                sanitized = [_sanitize_string(string) for string in uniques]
+            return np.array(sanitized, dtype=object)[codes].tolist()
+
+    return [_sanitize_string(string) for string in arr]
+
+
+_NON_ALLOWED_CHARACTERS = re.compile(r"[^A-Za-z0-9 _]")
+_MULTIPLE_SPACES = re.compile(r" +")
+_CAMEL_CASE_WORD = re.compile('(.)([A-Z][a-z]+)')
+_CAMEL_CASE_BOUNDARY = re.compile('([a-z0-9])([A-Z])')
+_MULTIPLE_UNDERSCORES = re.compile(r"_+")
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def _sanitize_string(string):
+    '''
+    sanitizes a single string for sanitize()
+    '''
+    # only keep alphanumeric, space and underscore
+    string = _NON_ALLOWED_CHARACTERS.sub("", string)
 
-        # strip leading and trailing white spaces, lowercase
-        # and replace space with underscore
-        string = string.strip().replace(" ", "_")
+    # remove multiple consecutive spaces
+    string = _MULTIPLE_SPACES.sub(" ", string)
 
-        # convert CamelCase to snake_case
-        string = re.sub('(.)([A-Z][a-z]+)', r'\1_\2', string)
-        string = re.sub('([a-z0-9])([A-Z])', r'\1_\2', string)
+    # strip leading and trailing white spaces, lowercase
+    # and replace space with underscore
+    string = string.strip().replace(" ", "_")
 
-        # remove multiple consecutive underscores
-        string = re.sub(r"_+", "_", string)
+    # convert CamelCase to snake_case
+    string = _CAMEL_CASE_WORD.sub(r'\1_\2', string)
+    string = _CAMEL_CASE_BOUNDARY.sub(r'\1_\2', string)
 
-        # lower case
-        string = string.lower()
-        new_arr.append(string)
+    # remove multiple consecutive underscores
+    string = _MULTIPLE_UNDERSCORES.sub("_", string)
 
-    return new_arr
+    # lower case
+    return string.lower()
 
 
 def _filter_characters(dtype, element):
@@ -134,8 +352,203 @@ def _filter_characters(dtype, element):
         return dtype(''.join(filtered_characters))
 
 
-@change_logger(ENABLE_LOGGING, LOG_DIR)
-def change_dtypes(df, conversion_dictionary):
+def _parse_digits(strings, dtype):
+    '''
+    byte level parser behind _filter_characters_vectorized().
+
+    The (ascii) strings are encoded into a fixed width bytes array and
+    all of them are walked over at once, one character position at a
+    time. Everything except digits and '.' is ignored, the digits are
+    accumulated into an int64 mantissa and the digits after the '.'
+    are counted.
+
+    A float is then built as mantissa / 10**fraction_digits which is
+    exactly what float() returns as long as the mantissa fits in 53 bits
+    and there are at most 22 fraction digits (both operands are exact
+    so the division is correctly rounded).
+    Strings that don't meet these conditions (or have more than one '.',
+    which float() and int() reject) are not parsed here and are left
+    for _filter_characters().
+
+    Returns: (values, is_empty, is_parsed) numpy arrays
+        values: float64 (or int64 if dtype is int) parsed values
+        is_empty: True where the string has no digits and no '.'
+        is_parsed: True where values holds the parsed value
+
+    Args:
+        strings: numpy array of ascii strings
+        dtype: int or float
+    '''
+    n = len(strings)
+    values = np.zeros(n, dtype=np.int64 if dtype is int else np.float64)
+    is_empty = np.zeros(n, dtype=bool)
+    is_parsed = np.zeros(n, dtype=bool)
+
+    for start in range(0, n, _PARSE_BLOCK_ROWS):
+        block = strings[start:start + _PARSE_BLOCK_ROWS].astype(bytes)
+        chars = block.view(np.uint8).reshape(len(block), -1).T.copy()
+
+        mantissa = np.zeros(len(block), dtype=np.int64)
+        n_digits = np.zeros(len(block), dtype=np.int64)
+        n_fraction_digits = np.zeros(len(block), dtype=np.int64)
+        n_dots = np.zeros(len(block), dtype=np.int64)
+
+        for char in chars:
+            is_digit = (char >= ord('0')) & (char <= ord('9'))
+            mantissa = np.where(is_digit,
+                                mantissa * 10 + (char - ord('0')), mantissa)
+            n_digits += is_digit
+            n_fraction_digits += is_digit & (n_dots > 0)
+            n_dots += char == ord('.')
+
+        # more than 18 digits may overflow the int64 mantissa
+        ok = (n_digits > 0) & (n_digits <= 18)
+        if dtype is int:
+            ok &= n_dots == 0
+            block_values = mantissa
+        else:
+            ok &= (n_dots <= 1) & (mantissa < 2 ** 53) & (
+                n_fraction_digits < len(_POWERS_OF_TEN))
+            block_values = mantissa / _POWERS_OF_TEN[
+                np.minimum(n_fraction_digits, len(_POWERS_OF_TEN) - 1)]
+
+        block_slice = slice(start, start + len(block))
+        values[block_slice] = block_values
+        is_empty[block_slice] = (n_digits == 0) & (n_dots == 0)
+        is_parsed[block_slice] = ok
+
+    return values, is_empty, is_parsed
+
+
+def _filter_characters_vectorized(dtype, series):
+    '''
+    vectorized equivalent of
+        series.apply(lambda x: _filter_characters(dtype, x))
+
+    All the ascii strings of the series are parsed at once by
+    _parse_digits(). The few strings it can't handle exactly (non ascii
+    strings, since str.isdigit() accepts unicode digits, strings longer
+    than _MAX_PARSE_WIDTH, very long numbers, more than one '.', ...) are handed over to
+    _filter_characters() so the results (and raised errors) are exactly
+    the same as the element wise version. Non-string elements are
+    passed through untouched.
+
+    Only object and string dtype columns are vectorized; any other
+    dtype falls back to the element wise apply. With the Arrow string
+    engine (see STRING_ENGINE) the columns of strings are first handed
+    to arrow.filter_characters(), which reads 'str' columns without a
+    copy; it gives way to the numpy parser whenever its result could
+    differ.
+
+    Returns: pandas.Series with the parsed values
+
+    Args:
+        dtype: the desired dtype to convert the elements into (int or float)
+        series: pandas.Series object (dataframe column)
+    '''
+    if dtype not in [int, float] or len(series) == 0 or not (
+            series.dtype == object or pd.api.types.is_string_dtype(series.dtype)):
+        return series.apply(lambda x: _filter_characters(dtype, x))
+
+    if arrow.use_arrow(STRING_ENGINE):
+        result = arrow.filter_characters(dtype, series)
+        if result is not None:
+            return result
+
+    values = series.to_numpy(dtype=object)
+    types = np.frompyfunc(type, 1, 1)(values)
+    is_str = types == str
+
+    strings = values[is_str]
+    is_short_ascii = np.frompyfunc(str.isascii, 1, 1)(strings).astype(bool)
+    # a single long string would make its whole block that wide
+    is_short_ascii &= np.frompyfunc(len, 1, 1)(strings).astype(np.int64) <= _MAX_PARSE_WIDTH
+
+    parsed = np.zeros(len(strings), dtype=np.int64 if dtype is int else np.float64)
+    is_empty = np.zeros(len(strings), dtype=bool)
+    needs_fallback = ~is_short_ascii
+
+    ascii_values, ascii_empty, ascii_parsed = _parse_digits(
+        strings[is_short_ascii], dtype)
+    parsed[is_short_ascii] = ascii_values
+    is_empty[is_short_ascii] = ascii_empty
+    needs_fallback[is_short_ascii] = ~(ascii_parsed | ascii_empty)
+
+    fallback_values = [_filter_characters(dtype, string)
+                       for string in strings[needs_fallback]]
+
+    passthrough_is_float = (types[~is_str] == float).all()
+    if not needs_fallback.any() and passthrough_is_float:
+        # common case: only strings and float nans in the column,
+        # the result is directly a numeric array
+        if dtype is int and is_str.all() and not is_empty.any():
+            return pd.Series(parsed, index=series.index, name=series.name)
+
+        result = np.empty(len(values), dtype=np.float64)
+        result[~is_str] = values[~is_str].astype(np.float64)
+        result[is_str] = np.where(is_empty, np.nan, parsed)
+        return pd.Series(result, index=series.index, name=series.name)
+
+    converted = parsed.astype(object)
+    converted[is_empty] = np.nan
+    converted[needs_fallback] = fallback_values
+
+    result = values.copy()
+    result[is_str] = converted
+    return pd.Series(result, index=series.index, name=series.name).infer_objects()
+
+
+def _n_workers(n_jobs):
+    if n_jobs is None:
+        return 1
+    if n_jobs < 0:
+        return os.cpu_count() or 1
+    return n_jobs
+
+
+def _map_columns(function, tasks, n_jobs=None, executor=None, names=None):
+    '''
+    calls function(*task) for every task (the work of a cleaner function
+    on a single column) and returns the results in the same order.
+
+    The tasks run one after the other unless an executor is given or
+    n_jobs > 1, in which case they are spread over the executor or a
+    new thread pool of n_jobs threads. With a process pool, only the
+    arguments of a task (a single column) are pickled and sent to the
+    worker that runs it, never the whole dataframe.
+
+    Since the results are collected in order and the work on a column
+    doesn't depend on any other column, the results are exactly the
+    same in all the cases.
+
+    While a profiling.Profiler is active, the time spent on every task
+    is recorded under the given column names.
+    '''
+    if not tasks:
+        return []
+
+    if names is not None and is_profiling():
+        timed = _map_columns(functools.partial(timed_call, function), tasks, n_jobs, executor)
+        record_columns(names, [timings for _, *timings in timed])
+        return [result for result, *_ in timed]
+
+    if executor is not None:
+        return list(executor.map(function, *zip(*tasks)))
+
+    if _n_workers(n_jobs) > 1:
+        with ThreadPoolExecutor(_n_workers(n_jobs)) as pool:
+            return list(pool.map(function, *zip(*tasks)))
+
+    return [function(*task) for task in tasks]
+
+
+def _is_parallel(n_jobs, executor):
+    return executor is not None or _n_workers(n_jobs) > 1
+
+
+@profiled
+@change_logger(LOG_CONFIG)
+def change_dtypes(df, conversion_dictionary, n_jobs=None, executor=None, inplace=False):
     '''
     This function will take a pandas.DataFrame and a 
     conversion dictionary as input and changes the datatypes 
@@ -164,55 +577,388 @@ def change_dtypes(df, conversion_dictionary):
         conversion_dict: dictionary with column names as keys and the 
             dtypes as values
             Eg: {'col_0': float, 'col_1': 'category', 'col_5': int}
+        n_jobs: (optional) number of threads to convert the columns
+            with in parallel (-1 means one per cpu)
+        executor: (optional) concurrent.futures executor to convert the
+            columns with in parallel (Eg: a ProcessPoolExecutor, to which
+            only the columns to convert are sent)
+        inplace: if True, df itself is changed and returned, else df is
+            left untouched (see 'inplace and copy' in preprocess())
     '''
-    for col_name, dtype in conversion_dictionary.items():
-        if dtype in [int, float]:
-            if df[col_name].dtype not in [int, float]:
-                df[col_name] = df[col_name].apply(
-                    lambda x: _filter_characters(dtype, x))
-            else:
-                df[col_name] = df[col_name].astype(dtype)
+    if not inplace:
+        df = df.copy(deep=False)
 
-        else:
-            df[col_name] = df[col_name].astype(dtype)
+    tasks = [(df[col_name], dtype)
+             for col_name, dtype in conversion_dictionary.items()]
+    converted = _map_columns(_convert_column, tasks, n_jobs, executor, names=list(conversion_dictionary))
+
+    for col_name, col in zip(conversion_dictionary, converted):
+        df[col_name] = col
 
     return df
 
 
-@change_logger(ENABLE_LOGGING, LOG_DIR)
-def remove_outliers(df, std_coeff=1.5, label_col=None):
+def _convert_column(col, dtype):
+    '''
+    converts a single column for change_dtypes()
+    '''
+    if dtype in [int, float] and col.dtype not in [int, float]:
+        return _filter_characters_vectorized(dtype, col)
+    return col.astype(dtype)
+
+
+@profiled
+@change_logger(LOG_CONFIG)
+def drop_duplicates(df, deduplicator=None, inplace=False):
+    '''
+    This function will take a dataframe and drops the duplicate rows,
+    keeping the first occurrence of every row.
+
+    The rows are compared through 64 bit fingerprints computed column by
+    column (see dedup.row_fingerprints()) instead of hashing every row
+    as a tuple of python objects, and the rows with the same fingerprint
+    are then compared value by value, so the result is exactly the one
+    of pandas.DataFrame.drop_duplicates() (see
+    dedup.first_row_occurrences()). With a dedup.Deduplicator, the rows
+    already seen in the previous dataframes given to it are dropped
+    too, which removes the duplicates across chunks or files (compared
+    by fingerprint only, see dedup.Deduplicator).
+
+    Returns: pandas.DataFrame object without duplicate rows
+    Args:
+        df: pandas.DataFrame object
+        deduplicator: (optional) dedup.Deduplicator shared between calls;
+            its 'removed' attribute counts the rows dropped so far
+        inplace: if True, df itself is changed and returned, else df is
+            left untouched (see 'inplace and copy' in preprocess())
+    '''
+    if inplace and not df.index.is_unique:
+        raise ValueError("dropping rows in place needs a dataframe with a unique index")
+
+    if deduplicator is None:
+        keep = first_row_occurrences(df)
+    else:
+        keep = deduplicator.first_occurrences(df)
+    if not inplace:
+        return df[keep]
+
+    if not keep.all():
+        df.drop(index=df.index[~keep], inplace=True)
+    return df
+
+
+@profiled
+@change_logger(LOG_CONFIG)
+def remove_outliers(df, std_coeff=1.5, label_col=None, moments=None, n_jobs=None, executor=None,
+                    inplace=False, method='zscore', by=None, clip=False):
     '''
     This function will take a dataframe and replaces all the outliers
     with np.nan.
     If target(label) column name is given, then it wont consider that
     column to check and remove outliers.
 
-    The outliers are determined based on the std_coeff given as a parameter.
+    The outliers are determined based on the std_coeff given as a parameter
+    and the method:
+        'zscore': abs(value - mean) / std > std_coeff
+        'iqr': value outside of the Tukey fences
+            [q1 - std_coeff * iqr, q3 + std_coeff * iqr]
+            where q1, q3 are the 25th and 75th percentiles and iqr = q3 - q1
+        'mad': abs(value - median) / (1.4826 * mad) > std_coeff
+            where mad is the median of abs(value - median) (1.4826 * mad
+            is the std for normally distributed values)
+    The median and the percentiles are not distorted by the outliers
+    themselves, unlike the mean and the std. Columns whose spread (std,
+    iqr or mad) is 0 have no outliers.
+
+    With 'by', the thresholds of every group of rows (rows with the same
+    values in the 'by' columns) are computed from the values of that
+    group only, for all the groups at once (a single sort per column)
+    instead of calling the function on every group.
 
     Returns: pandas.DataFrame object without outlier values
     Args:
         df: pandas.DataFrame object
-        std_coeff: the coefficient of standard deviation
+        std_coeff: the coefficient of standard deviation (or of the iqr
+            or the scaled mad, see above)
             Eg: 1.5(recommended) or 3
         label_col: the target(label) column name (if any) as a string
-
+        moments: (optional, 'zscore' without 'by' only) dictionary with
+            column names as keys and (mean, std) tuples as values. If given,
+            only these columns are checked and these values are used
+            instead of the mean and std of the columns of df
+            Eg: statistics of the whole dataset when df is just a chunk of it
+        n_jobs, executor: (optional) to check the columns in parallel,
+            see change_dtypes()
+        inplace: if True, df itself is changed and returned, else df is
+            left untouched (see 'inplace and copy' in preprocess())
+        method: 'zscore', 'iqr' or 'mad'
+        by: (optional) column name or list of column names to group the
+            rows by (these columns are not checked); rows with a null
+            group key are never outliers
+        clip: if True, the outliers are replaced by the nearest threshold
+            (Eg: mean + std_coeff * std) instead of np.nan
     '''
+    if method not in OUTLIER_METHODS:
+        raise ValueError("'method' parameter must be one of {}".format(OUTLIER_METHODS))
+    if moments is not None and (method != 'zscore' or by is not None):
+        raise ValueError("'moments' parameter can only be used with method='zscore' and without 'by'")
+
+    if not inplace:
+        df = df.copy(deep=False)
+
     cols = list(df.columns)
 
     # consider only feat cols while removing outliers
     if label_col is not None:
         cols.remove(label_col)
 
-    for col_name in cols:
-        if df[col_name].dtype in [int, float]:
-            df[col_name] = df[col_name].mask(df[col_name].sub(
-                df[col_name].mean()).div(df[col_name].std()).abs().gt(std_coeff))
+    if moments is not None:
+        cols = [col_name for col_name in cols if col_name in moments]
+
+    groups = None
+    if by is not None:
+        by = [by] if isinstance(by, str) else list(by)
+        cols = [col_name for col_name in cols if col_name not in by]
+        # rows with a null group key get a nan group number
+        codes = df.groupby(by, sort=False).ngroup().fillna(-1).to_numpy(dtype=np.int64)
+        groups = (codes, int(codes.max()) + 1 if len(codes) else 0)
+
+    numeric_cols = [col_name for col_name in cols
+                    if df[col_name].dtype in [int, float]]
+
+    # mean and std of all the numeric columns in a single pass
+    # (in parallel mode, every column computes its own)
+    if method == 'zscore' and groups is None and moments is None and not _is_parallel(n_jobs, executor):
+        stats = column_stats([df[col_name].to_numpy() for col_name in numeric_cols])
+        moments = dict(zip(numeric_cols, zip(stats.mean, stats.std)))
+
+    tasks = [(df[col_name].to_numpy(), None if moments is None else moments[col_name], std_coeff,
+              method, groups, clip)
+             for col_name in numeric_cols]
+    results = _map_columns(_column_outliers, tasks, n_jobs, executor, names=numeric_cols)
+
+    for col_name, outliers in zip(numeric_cols, results):
+        if outliers is not None:
+            _put_values(df, col_name, *outliers, inplace)
 
     return df
 
 
-@change_logger(ENABLE_LOGGING, LOG_DIR)
-def fill_nan(df, how, label_col=None):
+def _column_outliers(values, moments, std_coeff, method='zscore', groups=None, clip=False):
+    '''
+    finds the outliers of a single column for remove_outliers()
+
+    Returns: (is_outlier, replacement) or None if there are no outliers
+        is_outlier: boolean numpy array which is True for the outliers
+        replacement: np.nan or (clip) numpy array with the threshold
+            closest to every outlier
+
+    Args:
+        values: numpy array
+        moments: ('zscore' only) (mean, std) tuple or None to compute
+            them from values
+        std_coeff: the coefficient of standard deviation
+        method: see remove_outliers()
+        groups: (codes, n_groups) tuple where codes is the int numpy array
+            of the group of every row (-1: no group) or None
+        clip: whether to return the thresholds as replacement
+    '''
+    if groups is not None:
+        lower, upper = _grouped_bounds(values, *groups, method, std_coeff)
+        is_outlier = _bounds_mask(values, lower, upper)
+
+    elif method == 'zscore':
+        if moments is None:
+            stats = column_stats([values])
+            moments = (stats.mean[0], stats.std[0])
+
+        mean, std = moments
+        is_outlier = _outlier_mask(values, mean, std, std_coeff)
+        lower, upper = mean - std_coeff * std, mean + std_coeff * std
+
+    else:
+        lower, upper = _column_bounds(values, method, std_coeff)
+        is_outlier = _bounds_mask(values, lower, upper)
+
+    if not is_outlier.any():
+        return None
+
+    if not clip:
+        return is_outlier, np.nan
+
+    if np.ndim(lower) > 0:
+        lower, upper = lower[is_outlier], upper[is_outlier]
+    return is_outlier, np.where(values[is_outlier] < lower, lower, upper)
+
+
+def _column_bounds(values, method, std_coeff):
+    '''
+    Returns: (lower, upper) thresholds of the 'iqr' or 'mad' method,
+        both nan if the column has no values or no spread
+    '''
+    values = values[~np.isnan(values)] if values.dtype.kind == 'f' else values
+    if len(values) == 0:
+        return np.nan, np.nan
+
+    if method == 'iqr':
+        q1, q3 = np.quantile(values, [0.25, 0.75])
+        return _spread_bounds(q1, q3, q3 - q1, std_coeff)
+
+    median = np.median(values)
+    mad = np.median(np.abs(values - median)) * _MAD_SCALE
+    return _spread_bounds(median, median, mad, std_coeff)
+
+
+def _spread_bounds(low, high, spread, std_coeff):
+    # works on scalars and on numpy arrays (one value per group)
+    with np.errstate(invalid='ignore'):
+        no_spread = ~(spread > 0)
+    lower = np.where(no_spread, np.nan, low - std_coeff * spread)
+    upper = np.where(no_spread, np.nan, high + std_coeff * spread)
+    if np.ndim(lower) == 0:
+        return float(lower), float(upper)
+    return lower, upper
+
+
+def _grouped_bounds(values, codes, n_groups, method, std_coeff):
+    '''
+    thresholds of every group, for _column_outliers()
+
+    Returns: (lower, upper) float numpy arrays with the thresholds of the
+        group of every row (nan for the rows without a group)
+    '''
+    values = values.astype(np.float64)
+    is_valid = (codes >= 0) & ~np.isnan(values)
+    group_values, group_codes = values[is_valid], codes[is_valid]
+    counts = np.bincount(group_codes, minlength=n_groups)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if method == 'zscore':
+            # same as pandas: std with one degree of freedom
+            mean = np.bincount(group_codes, group_values, minlength=n_groups) / counts
+            squares = np.bincount(group_codes, (group_values - mean[group_codes]) ** 2, minlength=n_groups)
+            std = np.sqrt(squares / (counts - 1))
+            lower, upper = _spread_bounds(mean, mean, std, std_coeff)
+
+        elif method == 'iqr':
+            q1, q3 = _grouped_quantiles(group_values, group_codes, counts, [0.25, 0.75])
+            lower, upper = _spread_bounds(q1, q3, q3 - q1, std_coeff)
+
+        else:
+            median, = _grouped_quantiles(group_values, group_codes, counts, [0.5])
+            deviations = np.abs(group_values - median[group_codes])
+            mad, = _grouped_quantiles(deviations, group_codes, counts, [0.5])
+            lower, upper = _spread_bounds(median, median, mad * _MAD_SCALE, std_coeff)
+
+    # code -1 picks the appended nan
+    return np.append(lower, np.nan)[codes], np.append(upper, np.nan)[codes]
+
+
+def _grouped_quantiles(values, codes, counts, quantiles):
+    '''
+    quantiles of the values of every group (linear interpolation like
+    numpy.quantile()) from the values sorted by (group, value)
+
+    Returns: list with a float numpy array of n_groups values per quantile
+        (nan for the empty groups)
+    '''
+    # sorting the values and then stably by group is faster than
+    # numpy.lexsort(), and numpy uses a radix sort for 16 bit codes
+    order = np.argsort(values)
+    code_dtype = np.int16 if len(counts) <= np.iinfo(np.int16).max else np.int64
+    order = order[np.argsort(codes[order].astype(code_dtype), kind='stable')]
+    sorted_values = values[order]
+    starts = np.cumsum(counts) - counts
+    last = np.maximum(counts - 1, 0)
+    if len(sorted_values) == 0:
+        return [np.full(len(counts), np.nan) for _ in quantiles]
+
+    results = []
+    for q in quantiles:
+        position = q * last
+        below = np.floor(position).astype(np.int64)
+        above = np.minimum(below + 1, last)
+        fraction = position - below
+        low = sorted_values[np.minimum(starts + below, len(sorted_values) - 1)]
+        high = sorted_values[np.minimum(starts + above, len(sorted_values) - 1)]
+        results.append(np.where(counts > 0, low + (high - low) * fraction, np.nan))
+    return results
+
+
+def _bounds_mask(values, lower, upper):
+    '''
+    returns a boolean numpy array which is True where values < lower or
+    values > upper (nan values and nan bounds never are), computed block
+    by block like _outlier_mask(); lower and upper are scalars or
+    arrays with a bound per value
+    '''
+    is_outlier = np.empty(len(values), dtype=bool)
+    is_above = np.empty(min(len(values), _MASK_BLOCK_ROWS), dtype=bool)
+    per_row = np.ndim(lower) > 0
+
+    for start in range(0, len(values), _MASK_BLOCK_ROWS):
+        block_slice = slice(start, start + _MASK_BLOCK_ROWS)
+        block = values[block_slice]
+        block_lower = lower[block_slice] if per_row else lower
+        block_upper = upper[block_slice] if per_row else upper
+        np.less(block, block_lower, out=is_outlier[block_slice])
+        np.greater(block, block_upper, out=is_above[:len(block)])
+        is_outlier[block_slice] |= is_above[:len(block)]
+
+    return is_outlier
+
+
+def _put_values(df, col_name, mask, value, inplace):
+    '''
+    sets df[col_name] to value where mask is True (value is a scalar or
+    an array with a value per True element of mask)
+
+    In place, a float column is written through its own buffer (pandas
+    copies it first only if another dataframe shares it). Otherwise, or
+    when the column can't hold the value (an int column getting nan),
+    the column is replaced by a new float array.
+    '''
+    if inplace and df[col_name].dtype == float:
+        df.loc[mask, col_name] = value
+        return
+
+    values = df[col_name].to_numpy().astype(np.float64)
+    if np.ndim(value) == 0:
+        np.putmask(values, mask, value)
+    else:
+        values[mask] = value
+    df[col_name] = values
+
+
+def _outlier_mask(values, mean, std, std_coeff):
+    '''
+    returns a boolean numpy array which is True where
+    abs(values - mean) / std > std_coeff
+    (nan values are never outliers)
+
+    It is computed block by block in a single small temporary buffer
+    instead of creating a new column sized array (or pandas.Series) for
+    every operation.
+    '''
+    is_outlier = np.empty(len(values), dtype=bool)
+    scores = np.empty(min(len(values), _MASK_BLOCK_ROWS), dtype=np.float64)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for start in range(0, len(values), _MASK_BLOCK_ROWS):
+            block = values[start:start + _MASK_BLOCK_ROWS]
+            block_scores = scores[:len(block)]
+            np.subtract(block, mean, out=block_scores, dtype=np.float64)
+            np.divide(block_scores, std, out=block_scores)
+            np.abs(block_scores, out=block_scores)
+            np.greater(block_scores, std_coeff, out=is_outlier[start:start + len(block)])
+
+    return is_outlier
+
+
+@profiled
+@change_logger(LOG_CONFIG)
+def fill_nan(df, how, label_col=None, fill_values=None, n_jobs=None, executor=None, quantile_error=0.01,
+             inplace=False, by=None):
     '''
     This function will take a pandas.DataFrame and fills all the 
     null values in all columns according to the method provided.
@@ -224,53 +970,409 @@ def fill_nan(df, how, label_col=None):
 
     Args:
         df: pandas.DataFrame
-        how: 'median'(recommended) or 'mean'
+        how: 'median'(recommended), 'mean' or 'approx_median'.
+            'approx_median' computes the median with a stats.QuantileSketch
+            which needs much less memory than the exact median on huge
+            columns and can be merged across chunks.
+            'regression' predicts every nan value from the column that is
+            the most correlated with its column (simple linear regression,
+            see impute.regression_models(); the target(label) column is
+            never used as predictor); the rows where that column is null
+            too are filled with the median
+        label_col: the target(label) column name (if any) as a string
+        fill_values: (optional) dictionary with column names as keys and
+            the values to fill the nulls with as values. If given, only
+            these columns are filled and these values are used instead
+            of the mean or median of the columns of df
+        n_jobs, executor: (optional) to fill the columns in parallel,
+            see change_dtypes()
+        quantile_error: rank error of the 'approx_median'
+            Eg: 0.01 => a value between the 49th and 51st percentiles
+        inplace: if True, df itself is changed and returned, else df is
+            left untouched (see 'inplace and copy' in preprocess())
+        by: (optional, 'median' or 'mean' only) column name or list of
+            column names to group the rows by; the nan values are filled
+            with the median or mean of their group (see
+            impute.group_fill_values()), these columns are not filled
+    '''
+    if fill_values is None and how not in FILL_NA_METHODS + ['regression']:
+        raise ValueError("'how' parameter must be one of {}".format(FILL_NA_METHODS + ['regression']))
+    if by is not None and (fill_values is not None or how not in ['median', 'mean']):
+        raise ValueError("'by' parameter can only be used with how='median' or how='mean'")
+    if fill_values is None and how == 'regression':
+        return _fill_nan_by_model(df, how, label_col, None, inplace)
+    if by is not None:
+        return _fill_nan_by_model(df, how, label_col, by, inplace)
+
+    if not inplace:
+        df = df.copy(deep=False)
+
+    cols = df.columns
+    if fill_values is not None:
+        cols = [col_name for col_name in cols if col_name in fill_values]
+
+    numeric_cols = [col_name for col_name in cols
+                    if df[col_name].dtype in [int, float]]
+
+    # int columns can't have nan values
+    float_cols = [col_name for col_name in numeric_cols
+                  if df[col_name].dtype == float]
+
+    # mean or median of all the numeric columns in a single pass
+    # (in parallel mode or with sketches, every column computes its own)
+    if fill_values is None and how != "approx_median" and not _is_parallel(n_jobs, executor):
+        stats = column_stats([df[col_name].to_numpy() for col_name in float_cols],
+                             quantiles=[0.5] if how == "median" else None)
+        fill_values = dict(zip(float_cols,
+                               stats.median if how == "median" else stats.mean))
+
+    tasks = [(df[col_name].to_numpy(), how, None if fill_values is None else fill_values[col_name],
+              quantile_error)
+             for col_name in float_cols]
+    results = _map_columns(_column_nans, tasks, n_jobs, executor, names=float_cols)
+
+    for col_name, result in zip(float_cols, results):
+        if result is not None:
+            is_nan, fill_value = result
+            _put_values(df, col_name, is_nan, fill_value, inplace)
+
+    return df
+
+
+def _fill_nan_by_model(df, how, label_col, by, inplace):
+    '''
+    fill_nan() with values that depend on the row: group statistics
+    (by) or regression predictions
+    '''
+    if not inplace:
+        df = df.copy(deep=False)
+
+    by_cols = [] if by is None else [by] if isinstance(by, str) else list(by)
+    numeric_cols = [col_name for col_name in df.columns
+                    if df[col_name].dtype in [int, float] and col_name not in by_cols]
+    float_cols = [col_name for col_name in numeric_cols if df[col_name].dtype == float]
+
+    if by is not None:
+        fills = group_fill_values(df, float_cols, by_cols, how)
+    else:
+        predictors = [col_name for col_name in numeric_cols if col_name != label_col]
+        fills = regression_fill_values(df, float_cols, predictors)
+
+    for col_name, (is_nan, values) in fills.items():
+        _put_values(df, col_name, is_nan, values, inplace)
+
+    return df
+
+
+def _column_nans(values, how, fill_value, quantile_error):
+    '''
+    finds the nan values of a single float column and the value to fill
+    them with for fill_nan()
+
+    Returns: (boolean numpy array which is True for the nan values,
+        fill value) or None if there are no nan values
+
+    Args:
+        values: float numpy array
+        how: 'median', 'mean' or 'approx_median'
+        fill_value: value to fill with or None to compute it from values
+        quantile_error: rank error of the 'approx_median'
+    '''
+    is_nan = np.isnan(values)
+    if not is_nan.any():
+        return None
+
+    if fill_value is None and how == "approx_median":
+        fill_value = _approx_median(values, quantile_error)
+    elif fill_value is None:
+        stats = column_stats([values], quantiles=[0.5] if how == "median" else None)
+        fill_value = stats.median[0] if how == "median" else stats.mean[0]
+
+    return is_nan, fill_value
+
+
+def _approx_median(values, quantile_error):
+    '''
+    median of a column computed with a stats.QuantileSketch that
+    gets the values in blocks, so that the memory stays bounded
+    '''
+    sketch = QuantileSketch(quantile_error)
+    for start in range(0, len(values), _SKETCH_BLOCK_ROWS):
+        sketch.update(values[start:start + _SKETCH_BLOCK_ROWS])
+    return sketch.quantile(0.5)
+
+
+@profiled
+@change_logger(LOG_CONFIG)
+def scale(df, method='standard', label_col=None, parameters=None, dtype=np.float32, n_jobs=None,
+          executor=None, inplace=False):
+    '''
+    This function will take a dataframe and scales all the numeric
+    columns according to the method:
+        'standard': (value - mean) / std
+        'minmax': (value - min) / (max - min), between 0 and 1
+    Columns whose std (or max - min) is 0 are only centered.
+
+    The scaled columns are stored as 'dtype' (float32 by default, half
+    the memory of float64): every column is scaled in float64 block by
+    block and written into that new buffer, without any other column
+    sized temporary array (see encoding.scale_values()). The statistics of all the columns come from
+    a single stats.column_stats() pass, unless they are given.
+
+    If target(label) column name is given, then it wont be scaled.
+
+    Returns: pandas.DataFrame with the scaled columns
+    Args:
+        df: pandas.DataFrame object
+        method: 'standard' or 'minmax'
         label_col: the target(label) column name (if any) as a string
+        parameters: (optional) dictionary with column names as keys and
+            (center, spread) tuples as values. If given, only these
+            columns are scaled with these values
+            Eg: the (mean, std) moments given to remove_outliers(), or
+            the statistics of the training data (see estimator.Cleaner)
+        dtype: dtype of the scaled columns (np.float32 or np.float64)
+        n_jobs, executor: (optional) to scale the columns in parallel,
+            see change_dtypes()
+        inplace: if True, df itself is changed and returned, else df is
+            left untouched (see 'inplace and copy' in preprocess())
     '''
-    for col_name in df.columns:
-        if df[col_name].dtype in [int, float]:
-            if how == "median":
-                df[col_name] = df[col_name].fillna(df[col_name].median())
-            elif how == "mean":
-                df[col_name] = df[col_name].fillna(df[col_name].mean())
-            else:
-                raise ValueError("'how' parameter must be 'mean' or 'median'")
+    if method not in SCALE_METHODS:
+        raise ValueError("'method' parameter must be one of {}".format(SCALE_METHODS))
+
+    if not inplace:
+        df = df.copy(deep=False)
+
+    cols = [col_name for col_name in df.columns if col_name != label_col]
+    if parameters is not None:
+        cols = [col_name for col_name in cols if col_name in parameters]
+
+    # python int and float columns and the downcasted ones (not bool)
+    numeric_cols = [col_name for col_name in cols
+                    if df[col_name].dtype.kind in 'iuf']
+
+    if parameters is None:
+        stats = column_stats([df[col_name].to_numpy() for col_name in numeric_cols])
+        parameters = dict(zip(numeric_cols, scale_parameters(method, stats)))
+
+    tasks = [(df[col_name].to_numpy(), *parameters[col_name], dtype, inplace)
+             for col_name in numeric_cols]
+    results = _map_columns(scale_values, tasks, n_jobs, executor, names=numeric_cols)
+
+    for col_name, scaled in zip(numeric_cols, results):
+        df[col_name] = scaled
 
     return df
 
 
-def _can_convert_to_float(feat_col):
+@profiled
+@change_logger(LOG_CONFIG)
+def one_hot_encode(df, columns=None, max_levels=None, min_frequency=1, sparse=False, encoder=None,
+                   inplace=False):
     '''
-    determine if a feature column need to change their dtype from
-    string to float by picking 10 random samples from that
-    column and trying to parse it as float (float(value)).
-    If the majority of them get converted to float then the
-    dtype may be converted to float.
-    eg: a numeric column might have a '?' instead of np.nan
+    This function will take a dataframe and replaces the categorical
+    columns with one int8 column per level (1 where the column has that
+    level), like pandas.get_dummies(), but encoded straight from the
+    category codes into a single int8 block (or sparse columns) by an
+    encoding.OneHotEncoder. The new columns are named '<column>_<level>'
+    and come after the other columns (a name that is already taken
+    raises a ValueError).
+
+    The rare levels can be capped: only the levels seen at least
+    'min_frequency' times are kept, at most the 'max_levels' most
+    frequent ones, and the rows of all the other levels get a 1 in a
+    single '<column>_other' column.
+
+    Memory: the dense block takes one byte per row and level. With
+    sparse=True, the columns are pandas sparse int8 columns that only
+    store the ones (one value per row and encoded column), built from a
+    scipy.sparse matrix (needs scipy). To get the scipy.sparse.csr_matrix
+    itself, use OneHotEncoder.to_csr().
+
+    Returns: pandas.DataFrame with the encoded columns
+    Args:
+        df: pandas.DataFrame object
+        columns: (optional) list of the columns to encode
+            (default: all the 'category' columns, Eg: the ones
+            suggest_conversion_dict() suggests)
+        max_levels: (optional) maximum number of levels per column
+        min_frequency: minimum number of rows of a level
+        sparse: whether the new columns are pandas sparse columns
+        encoder: (optional) fitted encoding.OneHotEncoder to use (Eg: the
+            one of the training data) instead of the parameters above
+        inplace: if True, df itself is changed and returned, else df is
+            left untouched (see 'inplace and copy' in preprocess())
+    '''
+    if encoder is None:
+        encoder = OneHotEncoder(columns, max_levels, min_frequency).fit(df)
+
+    # the encoded columns are dropped, the other ones are kept
+    taken = set(df.columns) - set(encoder.levels)
+    collisions = []
+    for name in encoder.feature_names:
+        if name in taken:
+            collisions.append(name)
+        taken.add(name)
+    if collisions:
+        raise ValueError("the encoded column names {} are already taken".format(collisions))
+
+    if sparse:
+        encoded = pd.DataFrame.sparse.from_spmatrix(encoder.to_csr(df), index=df.index,
+                                                    columns=encoder.feature_names)
+    else:
+        encoded = pd.DataFrame(encoder.to_array(df), index=df.index, columns=encoder.feature_names,
+                               copy=False)
 
+    if not inplace:
+        return pd.concat([df.drop(columns=list(encoder.levels)), encoded], axis=1)
+
+    df.drop(columns=list(encoder.levels), inplace=True)
+    df[encoder.feature_names] = encoded
+    return df
+
+
+@profiled
+@change_logger(LOG_CONFIG)
+def downcast_dtypes(df, category_threshold=0.5, nullable=True, n_jobs=None, executor=None,
+                    inplace=False):
+    '''
+    This function will take a dataframe and stores every column with
+    the smallest dtype that holds all its values exactly
+        - integer columns: the smallest of int8, int16, int32 (or uint8,
+            uint16, uint32 when there are no negative values) that fits
+            the range of the column
+        - float columns whose values are all whole numbers: the same
+            integer dtypes, or the pandas nullable ones (Int8, UInt16 ...)
+            when there are nan values and 'nullable' is True
+        - other float columns: float32 when every value survives the
+            round trip to float32, else they are left as float64
+        - object and string columns with few distinct values (at most
+            'category_threshold' times the number of rows): category
+
+    Use memory_savings() to see the memory saved per column.
+
+    Note: the other cleaner functions only work on the python int and
+        float dtypes, so this should be the last step (see the 'downcast'
+        parameter of preprocess())
+
+    Returns: pandas.DataFrame with the downcasted dtypes
     Args:
-        feat_col: pandas.Series object (dataframe column)
+        df: pandas.DataFrame object
+        category_threshold: maximum ratio of distinct values to rows of
+            the columns converted to category
+        nullable: whether whole number float columns with nan values
+            are converted to the pandas nullable integer dtypes
+        n_jobs, executor: (optional) to downcast the columns in parallel,
+            see change_dtypes()
+        inplace: if True, df itself is changed and returned, else df is
+            left untouched (see 'inplace and copy' in preprocess())
     '''
-    num_samples = 10
-    required_sucess_ratio = 2/3
-    samples = feat_col.sample(num_samples)
+    if not inplace:
+        df = df.copy(deep=False)
 
-    successful_parse_count = 0
-    for sample in samples:
+    cols = list(df.columns)
+    tasks = [(df[col_name], category_threshold, nullable) for col_name in cols]
+    downcasted = _map_columns(_downcast_column, tasks, n_jobs, executor, names=cols)
+
+    for col_name, col in zip(cols, downcasted):
+        if col is not None:
+            df[col_name] = col
+
+    return df
+
+
+# candidate integer dtypes from the smallest to the biggest
+_SIGNED_DTYPES = [np.int8, np.int16, np.int32, np.int64]
+_UNSIGNED_DTYPES = [np.uint8, np.uint16, np.uint32, np.uint64]
+
+
+def _downcast_column(col, category_threshold, nullable):
+    '''
+    downcasts a single column for downcast_dtypes()
+
+    Returns: the downcasted column (None if it can't be made smaller)
+    '''
+    if col.dtype == int:
+        values = col.to_numpy()
+        if len(values) == 0:
+            return None
+        dtype = _smallest_int_dtype(values.min(), values.max())
+        return col.astype(dtype) if dtype != values.dtype else None
+
+    if col.dtype == float:
+        return _downcast_float(col, nullable)
+
+    if col.dtype == object or pd.api.types.is_string_dtype(col.dtype):
+        if len(col) == 0:
+            return None
         try:
-            float(sample)
-            successful_parse_count += 1
-        except ValueError:
-            pass
+            codes, uniques = pd.factorize(col, sort=True)
+        except TypeError:
+            # mixed types that can't be sorted
+            codes, uniques = pd.factorize(col)
+        if len(uniques) > category_threshold * len(col):
+            return None
+        return pd.Series(pd.Categorical.from_codes(codes, uniques),
+                         index=col.index, name=col.name)
+
+    return None
+
+
+def _smallest_int_dtype(minimum, maximum):
+    candidates = _UNSIGNED_DTYPES if minimum >= 0 else _SIGNED_DTYPES
+    for dtype in candidates:
+        info = np.iinfo(dtype)
+        if info.min <= minimum and maximum <= info.max:
+            return np.dtype(dtype)
+    return None
+
+
+def _downcast_float(col, nullable):
+    values = col.to_numpy()
+    is_nan = np.isnan(values)
+    if is_nan.all():
+        return None
+
+    present = values[~is_nan]
+    minimum, maximum = present.min(), present.max()
+    is_whole = (np.abs(present) < 2 ** 53).all() and (present == np.round(present)).all()
+    if is_whole:
+        dtype = _smallest_int_dtype(minimum, maximum)
+        if not is_nan.any():
+            return col.astype(dtype)
+        if nullable:
+            # 'int8' => 'Int8', 'uint16' => 'UInt16' ...
+            name = dtype.name.capitalize().replace('Uint', 'UInt')
+            return col.astype(name)
+
+    with np.errstate(over='ignore'):
+        as_float32 = present.astype(np.float32)
+    if (as_float32 == present).all():
+        return col.astype(np.float32)
+
+    return None
+
+
+def memory_savings(old_df, new_df):
+    '''
+    memory used by every column of old_df and new_df (Eg: before and
+    after downcast_dtypes()), counting the python objects of object columns
+
+    Returns: pandas.DataFrame with the column names as index and the
+        columns 'before', 'after' (bytes) and 'saved' (bytes and ratio)
+
+    Args:
+        old_df, new_df: pandas.DataFrame objects with the same columns
+    '''
+    before = old_df.memory_usage(index=False, deep=True)
+    after = new_df.memory_usage(index=False, deep=True)[before.index]
 
-    if successful_parse_count > num_samples*required_sucess_ratio:
-        return True
-    return False
+    return pd.DataFrame({'before': before, 'after': after,
+                         'saved': before - after,
+                         'saved_ratio': 1 - after / before})
 
 
 def suggest_conversion_dict(df):
-    # use the _can_convert_to_float() function
-    # if the column has nan then definitely int dtype
     '''
     This function checks if any string columns can be converted into float
     Eg:
@@ -282,7 +1384,8 @@ def suggest_conversion_dict(df):
         - because of a single string value, the whole column might 
             have the 'Object' or 'category' datatype
 
-    This function also checks if any numeric (int or float) columns can be converted into categorical columns with the dtype 'category'.
+    This function also checks if any numeric (int or float) columns can be
+    converted into categorical columns with the dtype 'category'.
     Eg:
         - a column namely has_credit_card may have binary values 1 or 0.
         - This column can be considered as categorical because the 
@@ -290,58 +1393,44 @@ def suggest_conversion_dict(df):
             the total number of values in the column is very small 
             (smaller than a threshold of 0.01)
 
+    Every column is scanned in full (until its decision can't change) and
+    vectorized by inference.infer_types(), which also reports the parse
+    ratio and the approximate number of distinct values of every column.
+    A string column should be float when more than 2/3 of its values are
+    numbers or null.
+
     returns: dictionary that can be passed as an argument to the change_dtypes() function
 
     Args:
         df: pandas.DataFrame
     '''
+    report = infer_types(df)
+    suggestions = report['suggestion']
+    return {col: suggestion for col, suggestion in suggestions.items() if suggestion is not None}
 
-    suggested_conversion_dict = {}
-    for col in df.columns:
-        if df[col].dtype in [int, float]:
-            if _can_convert_to_category(df[col]):
-                suggested_conversion_dict[col] = 'category'
-
-        else:
-            if _can_convert_to_float(df[col]):
-                suggested_conversion_dict[col] = float
-
-    return suggested_conversion_dict
-
-
-def _can_convert_to_category(feat_col, threshold=0.01):
-    '''
-    determine if a numeric column is actually categorical by
-    looking at what percentage of unique values are there when
-    compared to the total number values
-    Eg: 'has_credit_card' might have values 1 or 0
-        which is technically numeric(int) but actually categorical
-    '''
-    uniq_len = len(feat_col.unique())
-    total_len = len(feat_col)
-
-    if uniq_len / total_len < threshold:
-        return True
-
-    return False
 
-
-def spot_irrelevant_columns(cols):
+def spot_irrelevant_columns(cols, rules=None):
     '''
     if there are any columns like names, first_names, ID
     then they are suggested to be dropped
 
+    The column names are checked by a rules.RuleSet (all its patterns in
+    a single compiled regex); with a dataframe, the constant columns and
+    the near unique (non-float) columns are spotted too. To check many
+    tables at once, use rules.RuleSet.check_catalog().
+
     Args:
-        cols: a list of column names
+        cols: a list of column names, or a pandas.DataFrame to check the
+            values of its columns too
+        rules: (optional) rules.RuleSet to use instead of the default one
+            (the 'name' and 'id' rules and the content rules)
 
     returns:
         a list of columns to drop
     '''
-    cols_to_drop = []
-    for col in cols:
-        if re.search(r'name\b', col.lower()):
-            cols_to_drop.append(col)
-        if re.search(r'(\b|[ _])id\b', col.lower()):
-            cols_to_drop.append(col)
+    if rules is None:
+        rules = _DEFAULT_RULES
+    return list(rules.check(cols))
+
 
-    return cols_to_drop
+_DEFAULT_RULES = RuleSet(['name', 'id'])
@@ -0,0 +1,390 @@
+import os
+import numpy as np
+import pandas as pd
+from pandas.util import hash_array
+
+DEDUP_METHODS = ['exact', 'bloom']
+
+# integers up to this magnitude are exactly representable as float64
+_MAX_EXACT_INT = 2 ** 53
+
+# mixing constants of the column hashes (64 bit odd multiplier)
+_SEED = np.uint64(0x9e3779b97f4a7c15)
+_MULTIPLIER = np.uint64(0x100000001b3)
+_NA_HASH = hash_array(np.array([None], dtype=object))
+
+
+def row_fingerprints(df):
+    '''
+    64 bit fingerprint of every row of df (the index is not hashed).
+
+    Every column is hashed on its own with pandas.util.hash_array()
+    (the non-numeric columns are factorized first, so only their
+    distinct values are hashed) and the column hashes are mixed into
+    one fingerprint per row.
+
+    Two rows with the same values get the same fingerprint, whatever the
+    chunk they come from. For that
+        - integer columns are hashed as floats (the same column is int in
+            a chunk without nan values and float in a chunk with them),
+            unless they hold values too big to be exact floats
+        - -0.0 is hashed as 0.0 and all the nan values as the same nan,
+            whatever their bits (drop_duplicates() treats them as equal)
+        - all the missing values (None, nan) of a non-numeric column get
+            the same hash (drop_duplicates() of several columns merges them
+            too)
+        - the numbers of an object column are hashed like a float column
+            (1 and 1.0 are equal, like in drop_duplicates()) and the other
+            distinct values through their string representation and their
+            type, so 1 and '1' (or None and 'None') get different
+            fingerprints
+
+    Two different rows get the same fingerprint with probability about
+    2**-64 per pair of rows (see first_row_occurrences() to confirm the
+    matches within a dataframe).
+
+    Returns: numpy uint64 array of len(df)
+    '''
+    fingerprints = np.full(len(df), _SEED, dtype=np.uint64)
+    for i in range(df.shape[1]):
+        fingerprints ^= column_hash(df.iloc[:, i])
+        fingerprints *= _MULTIPLIER
+
+    return fingerprints
+
+
+def column_hash(col):
+    '''
+    64 bit hash of every value of a column, the same for equal values
+    whatever the dtype of the column (Eg: 1 in an int column and 1.0 in
+    a float one, 0.0 and -0.0) and for all the missing values
+
+    Returns: numpy uint64 array of len(col)
+    '''
+    dtype = col.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in 'iu':
+        values = col.to_numpy()
+        if len(values) == 0 or np.abs(values).max() <= _MAX_EXACT_INT:
+            values = values.astype(np.float64)
+        return hash_array(values)
+    if isinstance(dtype, np.dtype) and dtype.kind == 'f':
+        return hash_array(_canonical_floats(col.to_numpy()))
+    if isinstance(dtype, np.dtype) and dtype.kind in 'bmM':
+        return hash_array(col.to_numpy())
+
+    codes, uniques = pd.factorize(col)
+    unique_hashes = np.append(_object_hash(np.asarray(uniques, dtype=object)), _NA_HASH)
+    # code -1 (missing value) picks _NA_HASH
+    return unique_hashes[codes]
+
+
+def _canonical_floats(values):
+    '''
+    Returns: float copy of values with -0.0 as 0.0 and a single nan bit
+        pattern (0/0, -nan and nan are different bits)
+    '''
+    values = values + 0.0
+    values[np.isnan(values)] = np.nan
+    return values
+
+
+def first_row_occurrences(df):
+    '''
+    boolean numpy array which is True for the first occurrence of every
+    row of df, like ~df.duplicated(): the rows are matched by their
+    row_fingerprints() and every match is confirmed by comparing the
+    values of the rows, so a fingerprint collision never drops a row
+    (the rows are then compared by pandas.DataFrame.duplicated())
+    '''
+    fingerprints = row_fingerprints(df)
+    codes, _ = pd.factorize(fingerprints)
+    keep = ~pd.Series(codes).duplicated().to_numpy()
+    duplicates = np.flatnonzero(~keep)
+    if len(duplicates) == 0:
+        return keep
+
+    # the first row with the same fingerprint as every duplicate
+    first_rows = np.flatnonzero(keep)[codes[duplicates]]
+    for i in range(df.shape[1]):
+        values = df.iloc[:, i].to_numpy()
+        duplicate_values, first_values = values[duplicates], values[first_rows]
+        is_equal = (duplicate_values == first_values) | (pd.isna(duplicate_values) & pd.isna(first_values))
+        if not is_equal.all():
+            return ~df.duplicated().to_numpy()
+    return keep
+
+
+def _object_hash(values):
+    '''
+    hashes of distinct non-missing values for column_hash()
+    '''
+    if len(values) == 0 or pd.api.types.infer_dtype(values, skipna=False) == 'string':
+        return hash_array(values)
+
+    hashes = np.empty(len(values), dtype=np.uint64)
+    is_number = np.fromiter((isinstance(value, (int, float, np.integer, np.floating))
+                             and not isinstance(value, (bool, np.bool_))
+                             and abs(value) <= _MAX_EXACT_INT
+                             for value in values), dtype=bool, count=len(values))
+    hashes[is_number] = hash_array(_canonical_floats(values[is_number].astype(np.float64)))
+
+    others = values[~is_number]
+    other_hashes = hash_array(np.array([str(value) for value in others], dtype=object))
+    # the type of the non-string values, so that str() collisions
+    # between types don't make their rows equal
+    is_str = np.fromiter((type(value) is str for value in others), dtype=bool, count=len(others))
+    type_names = np.array([type(value).__name__ for value in others[~is_str]], dtype=object)
+    other_hashes[~is_str] ^= hash_array(type_names) * _MULTIPLIER
+    hashes[~is_number] = other_hashes
+    return hashes
+
+
+class Deduplicator:
+    '''
+    removes the duplicate rows of a stream of dataframes (chunks of a
+    file, several files, batches...) by remembering the fingerprint of
+    every distinct row seen so far (see row_fingerprints()). The first
+    occurrence of a row is kept, like pandas.DataFrame.drop_duplicates().
+
+    methods:
+        'exact': the fingerprints are kept as sorted numpy arrays
+            (8 bytes per distinct row). The rows of different dataframes
+            are only compared by their 64 bit fingerprints, so a distinct
+            row is wrongly removed if its fingerprint collides with the
+            one of a row seen before: with probability about
+            n**2 / 2**65 for n distinct rows (3e-8 for a million rows;
+            within a single dataframe, see first_row_occurrences()).
+            With 'max_fingerprints', at most that many fingerprints are
+            held in memory and the rest are spilled to .npy files in 'spill_dir' that are memory mapped
+            for the lookups. Call close() (or use a with statement) to
+            delete the spilled files.
+        'bloom': the fingerprints are added to a Bloom filter sized for
+            'capacity' distinct rows with the given 'false_positive_rate'
+            (about 1.2 bytes per row for 1%). The memory is fixed, but a
+            distinct row is wrongly removed with probability at most
+            'false_positive_rate' (as long as at most 'capacity' distinct
+            rows are added). Duplicates are always removed.
+
+    Attributes:
+        rows_seen: number of rows checked so far
+        removed: number of rows removed so far
+
+    Args:
+        method: 'exact' or 'bloom'
+        max_fingerprints: 'exact' only, maximum number of fingerprints
+            to hold in memory before spilling them to disk (None: no limit)
+        spill_dir: 'exact' only, directory of the spilled files
+            (None: a new temporary directory)
+        capacity: 'bloom' only, expected number of distinct rows
+        false_positive_rate: 'bloom' only, probability of removing a
+            distinct row once 'capacity' distinct rows have been added
+    '''
+
+    def __init__(self, method='exact', max_fingerprints=None, spill_dir=None, capacity=None,
+                 false_positive_rate=0.001):
+        if method not in DEDUP_METHODS:
+            raise ValueError("'method' parameter must be one of {}".format(DEDUP_METHODS))
+        if method == 'bloom' and capacity is None:
+            raise ValueError("'capacity' parameter is required with method='bloom'")
+
+        self.method = method
+        self.rows_seen = 0
+        self.removed = 0
+
+        # exact
+        self.max_fingerprints = max_fingerprints
+        self.spill_dir = spill_dir
+        self._runs = []
+        self._spilled = []
+        # runs given to from_runs(), never merged nor deleted
+        self._frozen = []
+        self._spill_dir_created = None
+
+        # bloom
+        if method == 'bloom':
+            n_bits = int(np.ceil(-capacity * np.log(false_positive_rate) / np.log(2) ** 2))
+            self._n_bits = max(n_bits, 64)
+            self._n_hashes = max(int(round(self._n_bits / capacity * np.log(2))), 1)
+            self._bits = np.zeros((self._n_bits + 7) // 8, dtype=np.uint8)
+
+    def first_occurrences(self, df):
+        '''
+        returns a boolean numpy array which is True for the rows of df
+        that have not been seen before (neither in df nor in any of the
+        previous dataframes) and remembers them
+        '''
+        return self.first_fingerprint_occurrences(row_fingerprints(df))
+
+    def first_fingerprint_occurrences(self, fingerprints):
+        '''
+        same as first_occurrences() for rows that are already hashed
+        (Eg: by row_fingerprints() in other processes)
+
+        Args:
+            fingerprints: numpy uint64 array
+        '''
+        keep = ~pd.Series(fingerprints).duplicated().to_numpy()
+
+        new = fingerprints[keep]
+        if self.method == 'exact':
+            is_seen = self._contains(new)
+        else:
+            is_seen = self._bloom_contains(new)
+        keep[keep] = ~is_seen
+
+        new = new[~is_seen]
+        if self.method == 'exact':
+            self._add(new)
+        else:
+            self._bloom_add(new)
+
+        self.rows_seen += len(fingerprints)
+        self.removed += len(fingerprints) - int(np.count_nonzero(keep))
+
+        return keep
+
+    def drop_duplicates(self, df):
+        '''
+        Returns: df without the rows seen before
+        '''
+        return df[self.first_occurrences(df)]
+
+    def state(self):
+        '''
+        Returns: (params, array) where params is a json serializable
+            dictionary and array holds the sorted fingerprints ('exact',
+            the spilled ones are read back) or the bits of the Bloom
+            filter, see from_state()
+        '''
+        params = {'method': self.method, 'rows_seen': self.rows_seen, 'removed': self.removed}
+        if self.method == 'bloom':
+            params.update(n_bits=self._n_bits, n_hashes=self._n_hashes)
+            return params, self._bits.copy()
+        runs = self.sorted_runs()
+        return params, np.sort(np.concatenate(runs)) if runs else np.empty(0, dtype=np.uint64)
+
+    def sorted_runs(self):
+        '''
+        Returns: list of the sorted numpy arrays ('exact') that hold the
+            fingerprints seen so far (the arrays themselves, not copies),
+            see from_runs()
+        '''
+        return self._frozen + self._runs + self._spilled
+
+    @classmethod
+    def from_state(cls, params, array, max_fingerprints=None, spill_dir=None):
+        '''
+        Returns: Deduplicator rebuilt from the output of state(), which
+            remembers the same rows
+
+        Args:
+            max_fingerprints, spill_dir: see Deduplicator ('exact' only)
+        '''
+        if params['method'] == 'bloom':
+            deduplicator = cls('bloom', capacity=1)
+            deduplicator._n_bits, deduplicator._n_hashes = params['n_bits'], params['n_hashes']
+            deduplicator._bits = np.array(array, dtype=np.uint8)
+        else:
+            deduplicator = cls('exact', max_fingerprints, spill_dir)
+            deduplicator._add(np.asarray(array, dtype=np.uint64))
+
+        deduplicator.rows_seen, deduplicator.removed = params['rows_seen'], params['removed']
+        return deduplicator
+
+    @classmethod
+    def from_runs(cls, params, runs, max_fingerprints=None, spill_dir=None):
+        '''
+        'exact' Deduplicator that remembers the fingerprints of already
+        sorted runs (Eg: memory mapped .npy files) without merging or
+        copying them; the runs are never modified (unlike from_state(),
+        which sorts all the fingerprints again)
+
+        Args:
+            params: params of state()
+            runs: list of sorted numpy uint64 arrays
+            max_fingerprints, spill_dir: see Deduplicator (for the new
+                fingerprints)
+        '''
+        deduplicator = cls('exact', max_fingerprints, spill_dir)
+        deduplicator._frozen = list(runs)
+        deduplicator.rows_seen, deduplicator.removed = params['rows_seen'], params['removed']
+        return deduplicator
+
+    # exact: a few sorted runs of fingerprints, merged when a run gets
+    # as big as the previous one so there are O(log(n)) runs to search
+
+    def _contains(self, fingerprints):
+        is_seen = np.zeros(len(fingerprints), dtype=bool)
+        for run in self.sorted_runs():
+            if len(run) == 0:
+                continue
+            positions = np.searchsorted(run, fingerprints)
+            positions[positions == len(run)] = 0
+            is_seen |= run[positions] == fingerprints
+        return is_seen
+
+    def _add(self, fingerprints):
+        if len(fingerprints) == 0:
+            return
+
+        self._runs.append(np.sort(fingerprints))
+        while len(self._runs) > 1 and len(self._runs[-2]) <= 2 * len(self._runs[-1]):
+            last = self._runs.pop()
+            self._runs[-1] = np.sort(np.concatenate([self._runs[-1], last]), kind='stable')
+
+        if self.max_fingerprints is not None and sum(map(len, self._runs)) > self.max_fingerprints:
+            self._spill()
+
+    def _spill(self):
+        if self.spill_dir is None and self._spill_dir_created is None:
+            import tempfile
+
+            self._spill_dir_created = tempfile.mkdtemp(prefix='dfcleaner_dedup_')
+        spill_dir = self.spill_dir if self.spill_dir is not None else self._spill_dir_created
+
+        run = np.sort(np.concatenate(self._runs))
+        path = os.path.join(spill_dir, 'fingerprints_{}_{}.npy'.format(id(self), len(self._spilled)))
+        np.save(path, run)
+
+        self._spilled.append(np.load(path, mmap_mode='r'))
+        self._runs = []
+
+    # bloom: double hashing of the 64 bit fingerprint (Kirsch and
+    # Mitzenmacher 2006), h1 + i * h2 for i in range(n_hashes)
+
+    def _bit_positions(self, fingerprints):
+        h1 = fingerprints & np.uint64(0xffffffff)
+        h2 = (fingerprints >> np.uint64(32)) | np.uint64(1)
+        i = np.arange(self._n_hashes, dtype=np.uint64)
+        return (h1[:, None] + i * h2[:, None]) % np.uint64(self._n_bits)
+
+    def _bloom_contains(self, fingerprints):
+        positions = self._bit_positions(fingerprints)
+        is_set = (self._bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return is_set.all(axis=1)
+
+    def _bloom_add(self, fingerprints):
+        positions = self._bit_positions(fingerprints).ravel()
+        np.bitwise_or.at(self._bits, positions >> np.uint64(3),
+                         (1 << (positions & np.uint64(7))).astype(np.uint8))
+
+    def close(self):
+        '''
+        deletes the spilled fingerprint files
+        '''
+        spilled, self._spilled = self._spilled, []
+        for run in spilled:
+            path = run.filename
+            del run
+            os.remove(path)
+        if self._spill_dir_created is not None:
+            import shutil
+
+            shutil.rmtree(self._spill_dir_created, ignore_errors=True)
+            self._spill_dir_created = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
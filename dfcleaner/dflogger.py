@@ -1,31 +1,265 @@
-import pandas as pd
+import functools
 import os
+import numpy as np
+import pandas as pd
+
+LOG_FORMATS = ['csv', 'npz']
+
+
+class LogConfig:
+    '''
+    logging settings that change_logger() reads on every call, so they
+    can be changed after the functions are decorated. Checking them costs
+    a single dictionary lookup per call when logging is disabled.
+
+    The settings are kept in the 'namespace' dictionary under the keys
+    ENABLE_LOGGING, LOG_DIR and LOG_FORMAT; with the globals() of a module
+    (like cleaner.LOG_CONFIG), setting the module attributes or the
+    attributes of the config is the same thing.
+
+    Args:
+        enabled: whether the changes are logged
+        log_dir: directory to write the log files into
+        log_format: 'csv' or 'npz'
+        namespace: (optional) dictionary holding the settings; the
+            settings already in it are kept
+    '''
+
+    def __init__(self, enabled=False, log_dir='.', log_format='csv', namespace=None):
+        self._namespace = {} if namespace is None else namespace
+        self._namespace.setdefault('ENABLE_LOGGING', enabled)
+        self._namespace.setdefault('LOG_DIR', log_dir)
+        self._namespace.setdefault('LOG_FORMAT', log_format)
+
+    @property
+    def enabled(self):
+        return self._namespace['ENABLE_LOGGING']
+
+    @enabled.setter
+    def enabled(self, enabled):
+        self._namespace['ENABLE_LOGGING'] = enabled
+
+    @property
+    def log_dir(self):
+        return self._namespace['LOG_DIR']
+
+    @log_dir.setter
+    def log_dir(self, log_dir):
+        self._namespace['LOG_DIR'] = log_dir
+
+    @property
+    def log_format(self):
+        return self._namespace['LOG_FORMAT']
+
+    @log_format.setter
+    def log_format(self, log_format):
+        self._namespace['LOG_FORMAT'] = log_format
+
+    def __repr__(self):
+        return 'LogConfig(enabled={!r}, log_dir={!r}, log_format={!r})'.format(
+            self.enabled, self.log_dir, self.log_format)
 
 
-def change_logger(enable_logging, log_dir=''):
+def change_logger(enable_logging, log_dir='', log_format='csv'):
+    '''
+    decorator that logs all the changes a function makes to the
+    dataframe it gets as first argument into
+    '<log_dir>/<function name>_log.<log_format>'
+
+    Before calling the function a snapshot of the dataframe is kept (see
+    snapshot()). Afterwards, the columns that still hold the very same
+    data are skipped and every other column is compared one at a time,
+    keeping only the changed cells as sparse (row, old, new) arrays.
+    With copy on write (pandas >= 3, the version in requirements.txt, or
+    the 'mode.copy_on_write' option) the snapshot is shallow and the
+    extra memory is proportional to the number of changed cells (plus one
+    column while it is compared, and the blocks the function writes into
+    in place). With older pandas the snapshot is a deep copy of the
+    dataframe.
+
+    log formats:
+        'csv': one row per changed cell with the row index and column
+            name as index and the old and new values as columns
+        'npz': numpy archive with the changed cells of every column as
+            separate arrays, see load_changes()
+
+    Args:
+        enable_logging: LogConfig read on every call, or a fixed setting:
+            if False, the function is returned untouched
+        log_dir: directory to write the log files into (fixed setting)
+        log_format: 'csv' or 'npz' (fixed setting)
+    '''
+    if isinstance(enable_logging, LogConfig):
+        config = enable_logging
+    else:
+        _check_log_format(log_format)
+        config = LogConfig(enable_logging, log_dir, log_format)
+
     def decorator(function):
-        if not enable_logging:
+        if not isinstance(enable_logging, LogConfig) and not enable_logging:
             return function
 
+        settings = config._namespace
+
+        @functools.wraps(function)
         def wrapper(df, *args, **kwargs):
-            old_df = df.copy(deep=True)
-            df = function(df, *args, **kwargs)
+            if not settings['ENABLE_LOGGING']:
+                return function(df, *args, **kwargs)
+            return _logged_call(function, settings['LOG_DIR'], settings['LOG_FORMAT'], df, args, kwargs)
+        return wrapper
+    return decorator
 
-            change_df = _df_diff(old_df, df)
 
-            log_filepath = os.path.join(log_dir,
-                                        '{}_log.csv'.format(function.__name__))
+def _check_log_format(log_format):
+    if log_format not in LOG_FORMATS:
+        raise ValueError("'log_format' parameter must be one of {}".format(LOG_FORMATS))
 
-            change_df.to_csv(log_filepath)
 
-            return df
-        return wrapper
-    return decorator
+def _logged_call(function, log_dir, log_format, df, args, kwargs):
+    _check_log_format(log_format)
+
+    old_df = snapshot(df)
+    df = function(df, *args, **kwargs)
+
+    changes, dropped_rows = column_changes(old_df, df)
+    rows = df.index.to_numpy()
+
+    log_filepath = os.path.join(log_dir, '{}_log.{}'.format(
+        function.__name__, log_format))
+
+    if log_format == 'csv':
+        _changes_to_frame(changes, rows).to_csv(log_filepath)
+    else:
+        _save_npz(log_filepath, changes, rows, dropped_rows)
+
+    return df
 
 
-def _df_diff(oldFrame, newFrame):
-    dfBool = (oldFrame != newFrame).stack()
-    diff = pd.concat([oldFrame.stack()[dfBool],
-                      newFrame.stack()[dfBool]], axis=1)
-    diff.columns = ["old", "new"]
+def snapshot(df):
+    '''
+    copy of df that keeps its current values whatever is written into
+    df afterwards (and the other way around).
+
+    With copy on write (pandas >= 3, or the 'mode.copy_on_write' option)
+    this is a shallow copy: pandas copies a block only the first time one
+    of the dataframes writes into it. Otherwise it is a deep copy.
+    '''
+    return df.copy(deep=not _copy_on_write())
+
+
+def _copy_on_write():
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    try:
+        return pd.get_option('mode.copy_on_write') is True
+    except KeyError:
+        return False
+
+
+def column_changes(old_df, new_df):
+    '''
+    compares the common columns of both dataframes on the rows that are
+    still present in new_df
+
+    Returns: (changes, dropped_rows)
+        changes: dictionary with the changed column names as keys and
+            (positions, old_values, new_values) numpy array tuples as
+            values, positions being the row positions in new_df
+        dropped_rows: index labels of the rows of old_df that are not
+            in new_df
+    '''
+    if old_df.index.equals(new_df.index):
+        positions = None
+        dropped_rows = np.empty(0, dtype=old_df.index.dtype)
+    else:
+        positions = old_df.index.get_indexer(new_df.index)
+        dropped_rows = old_df.index.difference(new_df.index).to_numpy()
+
+    changes = {}
+    for col_name in new_df.columns:
+        if col_name not in old_df.columns:
+            continue
+
+        old_values = old_df[col_name].to_numpy()
+        new_values = new_df[col_name].to_numpy()
+
+        # the function didn't touch this column
+        if positions is None and np.may_share_memory(old_values, new_values):
+            continue
+
+        if positions is not None:
+            old_values = old_values[positions]
+
+        changed = _changed_mask(old_values, new_values)
+        if changed.any():
+            changes[col_name] = (np.flatnonzero(changed),
+                                 old_values[changed], new_values[changed])
+
+    return changes, dropped_rows
+
+
+def _changed_mask(old_values, new_values):
+    '''
+    True where the values differ (two nan values are not a change)
+    '''
+    if old_values.dtype != new_values.dtype:
+        old_values = old_values.astype(object)
+        new_values = new_values.astype(object)
+
+    changed = np.asarray(old_values != new_values, dtype=bool)
+    changed &= ~(pd.isna(old_values) & pd.isna(new_values))
+
+    return changed
+
+
+def _changes_to_frame(changes, rows):
+    '''
+    long format dataframe of the changes; (row, column) as index and
+    'old' and 'new' as columns
+    '''
+    frames = [pd.DataFrame({'position': positions, 'order': col_order,
+                            'row': rows[positions], 'column': [col_name] * len(positions),
+                            'old': old, 'new': new})
+              for col_order, (col_name, (positions, old, new)) in enumerate(changes.items())]
+
+    if not frames:
+        return pd.DataFrame({'old': [], 'new': []},
+                            index=pd.MultiIndex.from_tuples([], names=[None, None]))
+
+    diff = pd.concat(frames, ignore_index=True)
+    diff = diff.sort_values(['position', 'order'], kind='stable')
+    diff = diff.set_index(['row', 'column'])[['old', 'new']]
+    diff.index.names = [None, None]
+
     return diff
+
+
+def _save_npz(path, changes, rows, dropped_rows):
+    arrays = {'columns': np.array(list(changes), dtype=object),
+              'dropped_rows': dropped_rows}
+    for i, (positions, old, new) in enumerate(changes.values()):
+        arrays['rows_{}'.format(i)] = rows[positions]
+        arrays['old_{}'.format(i)] = old
+        arrays['new_{}'.format(i)] = new
+
+    np.savez(path, **arrays)
+
+
+def load_changes(path):
+    '''
+    loads a log file written with log_format='npz'
+
+    Returns: (changes, dropped_rows)
+        changes: dictionary with the changed column names as keys and
+            pandas.DataFrame objects with the 'old' and 'new' values of
+            the changed rows as values
+        dropped_rows: numpy array of the index labels of the dropped rows
+    '''
+    with np.load(path, allow_pickle=True) as arrays:
+        changes = {}
+        for i, col_name in enumerate(arrays['columns']):
+            changes[col_name] = pd.DataFrame({'old': arrays['old_{}'.format(i)],
+                                              'new': arrays['new_{}'.format(i)]},
+                                             index=arrays['rows_{}'.format(i)])
+
+        return changes, arrays['dropped_rows']
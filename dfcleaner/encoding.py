@@ -0,0 +1,233 @@
+import numpy as np
+import pandas as pd
+
+SCALE_METHODS = ['standard', 'minmax']
+
+# name of the column of the rare (and unknown) levels of an encoded column
+_OTHER_LEVEL = 'other'
+# number of values scale_values() scales at once in float64
+_SCALE_BLOCK_ROWS = 1 << 16
+
+
+class OneHotEncoder:
+    '''
+    one-hot encoding of categorical columns (see cleaner.one_hot_encode())
+    straight from the category codes, without pandas.get_dummies()
+
+    fit() counts the levels of every column with np.bincount() over its
+    category codes (or the codes of pandas.factorize() for other dtypes)
+    and keeps the levels seen at least 'min_frequency' times, at most the
+    'max_levels' most frequent ones. The other levels of a column, and
+    the levels transform() sees for the first time, all go into a single
+    '<column>_other' column, so the width of the output is capped
+    whatever the cardinality of the data. Null values get no column
+    (a row of zeros), like in pandas.get_dummies().
+
+    transform() maps the codes of every column to the output columns
+    with a single lookup per distinct value and builds
+        - to_csr(): a scipy.sparse.csr_matrix (int8, one stored value per
+            encoded column and row); needs scipy
+        - to_array(): a dense int8 numpy array (rows x features)
+    so no intermediate dataframe per level is ever created.
+
+    Attributes (after fit()):
+        levels: dictionary with the encoded columns as keys and the list
+            of their kept levels as values
+        other: dictionary with the encoded columns as keys and whether
+            they have an '<column>_other' column as values
+        feature_names: names of the output columns, in order
+
+    Args:
+        columns: (optional) list of the columns to encode
+            (default: all the 'category' columns of the fitted dataframe)
+        max_levels: (optional) maximum number of levels kept per column
+        min_frequency: minimum number of rows of a kept level
+    '''
+
+    def __init__(self, columns=None, max_levels=None, min_frequency=1):
+        self.columns = columns
+        self.max_levels = max_levels
+        self.min_frequency = min_frequency
+
+        # fitted levels
+        self.levels = None
+        self.other = None
+
+    @property
+    def is_fitted(self):
+        return self.levels is not None
+
+    @property
+    def feature_names(self):
+        self._check_fitted()
+        names = []
+        for col_name, levels in self.levels.items():
+            names.extend('{}_{}'.format(col_name, level) for level in levels)
+            if self.other[col_name]:
+                names.append('{}_{}'.format(col_name, _OTHER_LEVEL))
+        return names
+
+    def fit(self, df):
+        '''
+        learns the levels of the encoded columns of df
+
+        Returns: self
+        '''
+        columns = self.columns
+        if columns is None:
+            columns = [col_name for col_name in df.columns
+                       if isinstance(df[col_name].dtype, pd.CategoricalDtype)]
+
+        self.levels = {}
+        self.other = {}
+        for col_name in columns:
+            codes, uniques = _codes(df[col_name])
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+
+            keep = counts >= self.min_frequency
+            if self.max_levels is not None and keep.sum() > self.max_levels:
+                # the most frequent ones (the first ones on ties)
+                order = np.argsort(-counts, kind='stable')[:self.max_levels]
+                keep = np.zeros(len(uniques), dtype=bool)
+                keep[order] = True
+
+            self.levels[col_name] = uniques[keep].tolist()
+            self.other[col_name] = bool(counts[~keep].any())
+        return self
+
+    def to_csr(self, df):
+        '''
+        Returns: scipy.sparse.csr_matrix (int8) with a row per row of df
+            and a column per feature_names
+        '''
+        try:
+            from scipy import sparse
+        except ImportError:
+            raise ImportError("scipy is required for sparse one-hot encoding (pip install scipy)")
+
+        positions = self._positions(df)
+        is_set = positions >= 0
+        indptr = np.zeros(len(df) + 1, dtype=np.int64)
+        np.cumsum(is_set.sum(axis=1), out=indptr[1:])
+        # row by row and, within a row, in increasing column order
+        indices = positions[is_set]
+        data = np.ones(len(indices), dtype=np.int8)
+        return sparse.csr_matrix((data, indices, indptr), shape=(len(df), len(self.feature_names)))
+
+    def to_array(self, df):
+        '''
+        Returns: dense int8 numpy array with a row per row of df and a
+            column per feature_names
+        '''
+        positions = self._positions(df)
+        rows, cols = np.nonzero(positions >= 0)
+        encoded = np.zeros((len(df), len(self.feature_names)), dtype=np.int8)
+        encoded[rows, positions[rows, cols]] = 1
+        return encoded
+
+    def _positions(self, df):
+        '''
+        Returns: int32 numpy array (rows x encoded columns) with the
+            output column of every value (-1 for no column)
+        '''
+        self._check_fitted()
+        positions = np.full((len(df), len(self.levels)), -1, dtype=np.int32)
+        offset = 0
+        for i, (col_name, levels) in enumerate(self.levels.items()):
+            codes, uniques = _codes(df[col_name])
+            # output column of every distinct value
+            lookup = pd.Index(levels, dtype=object).get_indexer(pd.Index(uniques, dtype=object))
+            if self.other[col_name]:
+                lookup[lookup < 0] = len(levels)
+            lookup = np.where(lookup >= 0, lookup + offset, -1)
+
+            is_present = codes >= 0
+            positions[is_present, i] = lookup[codes[is_present]]
+            offset += len(levels) + self.other[col_name]
+        return positions
+
+    def _check_fitted(self):
+        if not self.is_fitted:
+            raise ValueError("this OneHotEncoder is not fitted yet, call fit() first")
+
+    def to_dict(self):
+        '''
+        Returns: json serializable dictionary of the parameters and the
+            fitted levels
+        '''
+        self._check_fitted()
+        return {
+            'max_levels': self.max_levels,
+            'min_frequency': self.min_frequency,
+            'levels': [[col_name, levels, self.other[col_name]]
+                       for col_name, levels in self.levels.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, params):
+        '''
+        Returns: fitted OneHotEncoder built from the output of to_dict()
+        '''
+        encoder = cls([col_name for col_name, _, _ in params['levels']],
+                      params['max_levels'], params['min_frequency'])
+        encoder.levels = {col_name: levels for col_name, levels, _ in params['levels']}
+        encoder.other = {col_name: other for col_name, _, other in params['levels']}
+        return encoder
+
+
+def _codes(col):
+    '''
+    Returns: (codes, uniques) of the values of a column, -1 for null
+        values (the category codes of a 'category' column)
+    '''
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        return col.cat.codes.to_numpy(), col.cat.categories
+    try:
+        return pd.factorize(col, sort=True)
+    except TypeError:
+        # mixed types that can't be sorted
+        return pd.factorize(col)
+
+
+def scale_values(values, center, spread, dtype=np.float32, inplace=False):
+    '''
+    (values - center) / spread as a 'dtype' array (a spread of 0 or nan
+    only centers the values)
+
+    The values are scaled block by block in float64 and only the scaled
+    values are cast to dtype, so a float32 result keeps the precision of
+    the scaled values even when the column has a large offset (Eg: unix
+    timestamps). The memory is the 'dtype' result (a float32 copy of a
+    float64 column is half its size) plus a float64 block. With
+    inplace=True, values itself is scaled when it already has that dtype
+    and is writable.
+
+    Returns: the scaled numpy array
+    '''
+    if inplace and values.dtype == dtype and values.flags.writeable:
+        scaled = values
+    else:
+        scaled = np.empty(values.shape, dtype=dtype)
+
+    block = np.empty(min(len(values), _SCALE_BLOCK_ROWS), dtype=np.float64)
+    for start in range(0, len(values), _SCALE_BLOCK_ROWS):
+        values_block = values[start:start + _SCALE_BLOCK_ROWS]
+        block_values = block[:len(values_block)]
+        np.subtract(values_block, center, out=block_values, dtype=np.float64, casting='unsafe')
+        if spread == spread and spread != 0:
+            np.divide(block_values, spread, out=block_values)
+        scaled[start:start + len(values_block)] = block_values
+    return scaled
+
+
+def scale_parameters(method, stats):
+    '''
+    Returns: list of (center, spread) tuples, one per column
+
+    Args:
+        method: 'standard' (mean and std) or 'minmax' (min and max - min)
+        stats: stats.ColumnStats of the columns
+    '''
+    if method == 'standard':
+        return [(float(mean), float(std)) for mean, std in zip(stats.mean, stats.std)]
+    return [(float(minimum), float(maximum - minimum)) for minimum, maximum in zip(stats.min, stats.max)]
@@ -0,0 +1,272 @@
+import json
+import pandas as pd
+from dfcleaner.cleaner import change_dtypes, remove_outliers, fill_nan, suggest_conversion_dict
+from dfcleaner.cleaner import scale, one_hot_encode, drop_duplicates
+from dfcleaner.cleaner import FILL_NA_METHODS, _fill_and_scale_parameters, _one_hot_columns
+from dfcleaner.encoding import OneHotEncoder, SCALE_METHODS
+from dfcleaner.stats import column_stats
+
+
+class Cleaner:
+    '''
+    fit/transform version of cleaner.preprocess()
+
+    fit() runs the same steps as preprocess() on the given dataframe
+    and remembers
+        - the dtype conversions
+        - the mean and std of every numeric column (outlier bounds)
+        - the fill value (mean or median) of every numeric column
+        - (if scale_method is given) the scale parameters of every
+            numeric column of the cleaned data
+        - (if one_hot is given) the levels of the encoded columns
+            (encoding.OneHotEncoder, also usable on its own to get a
+            scipy.sparse matrix with encoder.to_csr())
+
+    transform() then changes the dtypes, replaces the outliers with
+    nan and fills the nan values of any other dataframe (Eg: small
+    batches of new data) with these statistics, without computing any
+    statistic of its own. This also means that every batch is cleaned
+    with the same thresholds.
+
+    Note: transform() doesn't drop any rows (duplicates or rows with
+        a null label) because every row of a batch usually needs an
+        output. fit_transform() returns exactly what preprocess() returns.
+
+    The fitted statistics can be saved to a json file with save() and
+    loaded back with Cleaner.load()
+
+    Args:
+        column_dtype_conversion_dictionary: dictionary having keys as the
+            column name and value as the desired dtype. If None, the one
+            suggested by cleaner.suggest_conversion_dict() is used
+        std_coeff, fill_na_method, label_col, quantile_error, scale_method,
+            one_hot, max_levels: same as in cleaner.preprocess()
+    '''
+
+    def __init__(self, column_dtype_conversion_dictionary=None, std_coeff=1.5,
+                 fill_na_method='median', label_col=None, quantile_error=0.01, scale_method=None,
+                 one_hot=None, max_levels=None):
+        if fill_na_method not in FILL_NA_METHODS:
+            raise ValueError("'fill_na_method' parameter must be one of {}".format(FILL_NA_METHODS))
+        if scale_method is not None and scale_method not in SCALE_METHODS:
+            raise ValueError("'scale_method' parameter must be one of {}".format(SCALE_METHODS))
+
+        self.column_dtype_conversion_dictionary = column_dtype_conversion_dictionary
+        self.std_coeff = std_coeff
+        self.fill_na_method = fill_na_method
+        self.label_col = label_col
+        self.quantile_error = quantile_error
+        self.scale_method = scale_method
+        self.one_hot = one_hot
+        self.max_levels = max_levels
+
+        # fitted statistics
+        self.conversion_dictionary = None
+        self.moments = None
+        self.fill_values = None
+        self.float_cols = None
+        self.scale_parameters = None
+        self.encoder = None
+
+    @property
+    def is_fitted(self):
+        return self.moments is not None
+
+    def fit(self, df):
+        '''
+        learns the dtype conversions, outlier bounds and fill values of df
+        (df itself is not modified)
+
+        Returns: self
+        '''
+        self._fit(df)
+        return self
+
+    def fit_transform(self, df):
+        '''
+        same as fit() but also returns the cleaned up dataframe, which is
+        exactly what cleaner.preprocess() returns
+
+        Returns: pandas.DataFrame
+        '''
+        return self._fit(df)
+
+    def _fit(self, df):
+        conversion_dictionary = self.column_dtype_conversion_dictionary
+        if conversion_dictionary is None:
+            conversion_dictionary = suggest_conversion_dict(df)
+
+        df = change_dtypes(df, conversion_dictionary)
+        df = drop_duplicates(df)
+
+        if self.label_col is not None:
+            df = df.dropna(subset=[self.label_col])
+
+        numeric_cols = [col_name for col_name in df.columns
+                        if df[col_name].dtype in [int, float]]
+
+        outlier_cols = [col_name for col_name in numeric_cols
+                        if col_name != self.label_col]
+        stats = column_stats([df[col_name].to_numpy() for col_name in outlier_cols])
+        moments = {col_name: (float(mean), float(std))
+                   for col_name, mean, std in zip(outlier_cols, stats.mean, stats.std)}
+        df = remove_outliers(df, self.std_coeff, moments=moments)
+
+        # the scaled columns once filled: the numeric ones (int columns
+        # with outliers became float) except the label column
+        scale_cols = []
+        if self.scale_method is not None:
+            scale_cols = [col_name for col_name in df.columns
+                          if col_name != self.label_col and df[col_name].dtype.kind in 'iuf']
+        fill_values, scale_parameters = _fill_and_scale_parameters(df, numeric_cols, scale_cols,
+                                                                   self.fill_na_method, self.scale_method,
+                                                                   self.quantile_error)
+        df = fill_nan(df, self.fill_na_method, fill_values=fill_values)
+
+        self.conversion_dictionary = dict(conversion_dictionary)
+        self.moments = moments
+        self.fill_values = fill_values
+        self.float_cols = [col_name for col_name in numeric_cols
+                           if df[col_name].dtype == float]
+
+        if self.scale_method is not None:
+            self.scale_parameters = scale_parameters
+            df = scale(df, self.scale_method, parameters=self.scale_parameters)
+        if self.one_hot is not None:
+            self.encoder = OneHotEncoder(_one_hot_columns(df, self.one_hot, self.label_col),
+                                         self.max_levels).fit(df)
+            df = one_hot_encode(df, encoder=self.encoder)
+
+        return df
+
+    def transform(self, df):
+        '''
+        changes the dtypes, replaces the outliers with nan and fills
+        the nan values of df using the fitted statistics, then scales and
+        one-hot encodes it if the Cleaner does (df itself is not modified)
+
+        Returns: pandas.DataFrame
+        '''
+        if not self.is_fitted:
+            raise ValueError("this Cleaner is not fitted yet, call fit() first")
+
+        df = change_dtypes(df, self.conversion_dictionary)
+
+        # give the batch the same dtypes as the fitted data
+        for col_name in self.float_cols:
+            if col_name in df.columns and df[col_name].dtype == int:
+                df[col_name] = df[col_name].astype(float)
+
+        df = remove_outliers(df, self.std_coeff, moments=self.moments)
+        df = fill_nan(df, self.fill_na_method, fill_values=self.fill_values)
+
+        if self.scale_parameters is not None:
+            df = scale(df, self.scale_method, parameters=self.scale_parameters)
+        if self.encoder is not None:
+            df = one_hot_encode(df, encoder=self.encoder)
+
+        return df
+
+    def to_dict(self):
+        '''
+        Returns: json serializable dictionary of the parameters and the
+            fitted statistics
+        '''
+        if not self.is_fitted:
+            raise ValueError("this Cleaner is not fitted yet, call fit() first")
+
+        return {
+            'std_coeff': self.std_coeff,
+            'fill_na_method': self.fill_na_method,
+            'label_col': self.label_col,
+            'quantile_error': self.quantile_error,
+            'conversion_dictionary': [[col_name] + _dtype_to_json(dtype)
+                                      for col_name, dtype in self.conversion_dictionary.items()],
+            'moments': [[col_name, mean, std]
+                        for col_name, (mean, std) in self.moments.items()],
+            'fill_values': [[col_name, value]
+                            for col_name, value in self.fill_values.items()],
+            'float_cols': list(self.float_cols),
+            'scale_method': self.scale_method,
+            'scale_parameters': None if self.scale_parameters is None else
+            [[col_name, center, spread] for col_name, (center, spread) in self.scale_parameters.items()],
+            'encoder': None if self.encoder is None else self.encoder.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, params):
+        '''
+        Returns: fitted Cleaner built from the output of to_dict()
+        '''
+        cleaner = cls(std_coeff=params['std_coeff'],
+                      fill_na_method=params['fill_na_method'],
+                      label_col=params['label_col'],
+                      quantile_error=params['quantile_error'])
+
+        cleaner.conversion_dictionary = {col_name: _dtype_from_json(kind, spec)
+                                         for col_name, kind, spec in params['conversion_dictionary']}
+        cleaner.column_dtype_conversion_dictionary = dict(cleaner.conversion_dictionary)
+        cleaner.moments = {col_name: (mean, std)
+                           for col_name, mean, std in params['moments']}
+        cleaner.fill_values = dict(
+            (col_name, value) for col_name, value in params['fill_values'])
+        cleaner.float_cols = list(params['float_cols'])
+        cleaner.scale_method = params['scale_method']
+        if params['scale_parameters'] is not None:
+            cleaner.scale_parameters = {col_name: (center, spread)
+                                        for col_name, center, spread in params['scale_parameters']}
+        if params['encoder'] is not None:
+            cleaner.encoder = OneHotEncoder.from_dict(params['encoder'])
+            cleaner.one_hot = list(cleaner.encoder.levels)
+            cleaner.max_levels = cleaner.encoder.max_levels
+
+        return cleaner
+
+    def save(self, path):
+        '''
+        saves the fitted statistics into a json file
+        '''
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        '''
+        Returns: fitted Cleaner loaded from a json file written by save()
+        '''
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+# change_dtypes() parses the values of the columns that should become
+# the python types int or float and uses astype() for everything else
+# (including the strings 'int' and 'float'), so the difference is kept
+_PARSED_DTYPES = {'int': int, 'float': float}
+
+
+def _dtype_to_json(dtype):
+    '''
+    Returns: json serializable [kind, spec] of a conversion dtype:
+        ['parse', 'int' or 'float'] for the parsed python types,
+        ['category', {'categories': list or None, 'ordered': bool}] for
+        categories, otherwise ['astype', pandas dtype name]
+        (Eg: np.float32 => 'float32')
+    '''
+    if dtype in [int, float]:
+        return ['parse', dtype.__name__]
+    dtype = pd.api.types.pandas_dtype(dtype)
+    if isinstance(dtype, pd.CategoricalDtype):
+        categories = None if dtype.categories is None else dtype.categories.tolist()
+        return ['category', {'categories': categories, 'ordered': bool(dtype.ordered)}]
+    return ['astype', dtype.name]
+
+
+def _dtype_from_json(kind, spec):
+    '''
+    Returns: the dtype of the output of _dtype_to_json()
+    '''
+    if kind == 'parse':
+        return _PARSED_DTYPES[spec]
+    if kind == 'category':
+        return pd.CategoricalDtype(spec['categories'], spec['ordered'])
+    return pd.api.types.pandas_dtype(spec)
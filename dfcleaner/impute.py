@@ -0,0 +1,175 @@
+import numpy as np
+import pandas as pd
+from dfcleaner.stats import column_stats
+
+# number of rows whose cross products are accumulated at once
+_PAIR_BLOCK_ROWS = 1 << 16
+
+
+def group_fill_values(df, cols, by, how='median'):
+    '''
+    values to fill the nan values of the given float columns with: the
+    mean or median of the column within the group of the row (rows with
+    the same values in the 'by' columns).
+
+    The statistics of all the groups and columns are computed by a
+    single pandas groupby().transform(). The rows whose group has no
+    value in the column (or whose group key is null) get the mean or
+    median of the whole column.
+
+    Returns: dictionary with the columns that have nan values as keys and
+        (is_nan, values) tuples as values, where is_nan is a boolean numpy
+        array which is True for the nan values and values holds the fill
+        value of every nan value
+
+    Args:
+        df: pandas.DataFrame
+        cols: list of float column names
+        by: column name or list of column names
+        how: 'median' or 'mean'
+    '''
+    cols = [col_name for col_name in cols if df[col_name].isna().any()]
+    if not cols:
+        return {}
+
+    group_values = df.groupby(by, sort=False)[cols].transform(how)
+    fallback = _fallback_values(df, cols, how)
+
+    fills = {}
+    for col_name in cols:
+        is_nan = np.isnan(df[col_name].to_numpy())
+        values = group_values[col_name].to_numpy(dtype=np.float64)[is_nan]
+        fills[col_name] = (is_nan, np.where(np.isnan(values), fallback[col_name], values))
+    return fills
+
+
+def regression_models(df, targets, predictors):
+    '''
+    simple linear regression of every target column on the predictor
+    column it is the most correlated with (highest absolute pearson
+    correlation).
+
+    The statistics of all the pairs of columns are computed together in
+    a single pass over the rows: the columns are centered (by their mean)
+    and the sums of the values, of their squares and of their cross
+    products over the rows where both columns of a pair have a value are
+    accumulated as matrix products, block by block. The correlation,
+    slope and intercept of every (target, predictor) pair then come out
+    of a few element wise operations on these matrices, so the cost is
+    linear in the number of rows.
+
+    Returns: pandas.DataFrame with the targets as index and the columns
+        predictor: name of the predictor column (None if no predictor has
+            at least 2 rows in common with the target and some variance)
+        correlation: correlation between the target and the predictor
+        slope, intercept: target = intercept + slope * predictor
+        rows: number of rows where both have a value
+
+    Args:
+        df: pandas.DataFrame
+        targets: list of numeric column names to predict
+        predictors: list of numeric column names to predict them from
+    '''
+    names = list(dict.fromkeys(list(targets) + list(predictors)))
+    columns = [df[col_name].to_numpy() for col_name in names]
+    means = column_stats(columns).mean
+    count, sums, squares, products = _pair_sums(columns, means)
+
+    # [i, j] is about column i over the rows where both i and j have a value
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pair_means = sums / count
+        pair_vars = squares / count - pair_means ** 2
+        covariances = products / count - pair_means * pair_means.T
+        correlations = covariances / np.sqrt(pair_vars * pair_vars.T)
+        # slopes[i, j]: slope of column i predicted from column j
+        slopes = covariances / pair_vars.T
+        intercepts = pair_means - slopes * pair_means.T
+
+    position = {col_name: i for i, col_name in enumerate(names)}
+    target_positions = [position[col_name] for col_name in targets]
+    predictor_positions = np.array([position[col_name] for col_name in predictors], dtype=np.intp)
+
+    rows = []
+    for col_name, i in zip(targets, target_positions):
+        candidates = predictor_positions[(predictor_positions != i)
+                                         & (count[i, predictor_positions] >= 2)
+                                         & (pair_vars[predictor_positions, i] > 0)
+                                         & np.isfinite(correlations[i, predictor_positions])]
+        if len(candidates) == 0:
+            rows.append([None, np.nan, np.nan, np.nan, 0])
+            continue
+
+        j = candidates[np.argmax(np.abs(correlations[i, candidates]))]
+        # back from the centered values to the original ones
+        intercept = intercepts[i, j] + means[i] - slopes[i, j] * means[j]
+        rows.append([names[j], correlations[i, j], slopes[i, j], intercept, int(count[i, j])])
+
+    return pd.DataFrame(rows, index=pd.Index(targets, dtype=object),
+                        columns=['predictor', 'correlation', 'slope', 'intercept', 'rows'])
+
+
+def _pair_sums(columns, means):
+    '''
+    Returns: (count, sums, squares, products) k x k numpy arrays where
+        [i, j] is computed over the rows where both column i and column
+        j have a value: number of rows, sum of column i, sum of the
+        squares of column i, sum of column i * column j (of the centered
+        values)
+    '''
+    k = len(columns)
+    count, sums, squares, products = (np.zeros((k, k)) for _ in range(4))
+    n_rows = len(columns[0]) if columns else 0
+
+    for start in range(0, n_rows, _PAIR_BLOCK_ROWS):
+        block = np.column_stack([col[start:start + _PAIR_BLOCK_ROWS] for col in columns]).astype(np.float64)
+        block -= means
+        is_present = ~np.isnan(block)
+        present = is_present.astype(np.float64)
+        block[~is_present] = 0.0
+
+        count += present.T @ present
+        sums += block.T @ present
+        squares += (block * block).T @ present
+        products += block.T @ block
+
+    return count, sums, squares, products
+
+
+def regression_fill_values(df, cols, predictors, how='median'):
+    '''
+    values to fill the nan values of the given float columns with,
+    predicted from the most correlated predictor column by
+    regression_models(). The rows where the predictor has no value
+    either (or columns without any usable predictor) get the mean or
+    median of the whole column.
+
+    Returns: same as group_fill_values()
+
+    Args:
+        df: pandas.DataFrame
+        cols: list of float column names
+        predictors: list of numeric column names the columns may be
+            predicted from
+        how: 'median' or 'mean' for the rows that can't be predicted
+    '''
+    cols = [col_name for col_name in cols if df[col_name].isna().any()]
+    if not cols:
+        return {}
+
+    models = regression_models(df, cols, predictors)
+    fallback = _fallback_values(df, cols, how)
+
+    fills = {}
+    for col_name, (predictor, _, slope, intercept, _) in models.iterrows():
+        is_nan = np.isnan(df[col_name].to_numpy())
+        values = np.full(np.count_nonzero(is_nan), np.nan)
+        if predictor is not None:
+            values = intercept + slope * df[predictor].to_numpy()[is_nan]
+        fills[col_name] = (is_nan, np.where(np.isnan(values), fallback[col_name], values))
+    return fills
+
+
+def _fallback_values(df, cols, how):
+    stats = column_stats([df[col_name].to_numpy() for col_name in cols],
+                         quantiles=[0.5] if how == 'median' else None)
+    return dict(zip(cols, stats.median if how == 'median' else stats.mean))
@@ -0,0 +1,369 @@
+import datetime
+import json
+import os
+import numpy as np
+from dfcleaner.cleaner import change_dtypes, remove_outliers, fill_nan, suggest_conversion_dict
+from dfcleaner.cleaner import FILL_NA_METHODS, _outlier_mask
+from dfcleaner.stats import Moments, QuantileSketch, column_stats, weighted_quantile
+from dfcleaner.dedup import Deduplicator, row_fingerprints
+from dfcleaner.estimator import _dtype_to_json, _dtype_from_json
+
+# version of the state file layout
+_STATE_VERSION = 2
+
+
+class IncrementalCleaner:
+    '''
+    incremental version of cleaner.preprocess() for tables that grow by
+    appended partitions (Eg: a partition per day). Every partition is
+    cleaned with the statistics of all the partitions cleaned so far
+    (itself included), which are kept in a small state file instead of
+    being recomputed over the whole history, so cleaning a partition
+    costs time proportional to the partition.
+
+    The state holds
+        - the dtype conversions (the given ones, or those suggested by
+            cleaner.suggest_conversion_dict() for the first partition)
+            and the columns that became float or non-numeric
+        - the running stats.Moments of every numeric column (outlier bounds)
+        - a stats.QuantileSketch of every numeric column (fill values)
+        - the fingerprints of the rows seen so far (dedup.Deduplicator,
+            8 bytes per distinct row in sorted run files next to the state
+            file, see commit(), or a Bloom filter of fixed size)
+
+        cleaner = IncrementalCleaner('state.npz', label_col='label')
+        for day in new_days:
+            df = cleaner.clean_partition(read(day), partition=day)
+            write(day, df)
+            cleaner.commit()
+
+    clean_partition() only changes the state in memory and commit()
+    writes it atomically (a temporary file replaces the state file), so
+    the state file always holds the state after the last committed
+    partition. If anything fails before commit(), create a new
+    IncrementalCleaner from the state file and clean the partition again;
+    the committed partitions are listed in 'partitions' and can't be
+    cleaned twice.
+
+    Tolerance: the previous partitions are never cleaned again, so a
+    partition is cleaned like the last partition of cleaner.preprocess()
+    of all the partitions concatenated, with
+        - the outlier bounds computed from merged statistics, which may
+            differ from the single frame ones in the last few bits
+        - the fill values ('mean', 'median' and 'approx_median') taken from
+            the quantile sketch without the values outside the current
+            bounds: exact while a column has less than about
+            1.65 / quantile_error values, otherwise a value whose rank is
+            within quantile_error * count of the median ('mean' is the
+            weighted mean of the sketch items)
+    and only the 'zscore' outlier method.
+
+    Args:
+        state_path: path of the state file (.npz); when it exists, the
+            state and the parameters saved in it are loaded and the other
+            arguments are ignored
+        column_dtype_conversion_dictionary: dictionary having keys as the
+            column name and value as the desired dtype. If None, the one
+            suggested for the first partition is used
+        std_coeff, fill_na_method, label_col: same as in cleaner.preprocess()
+        quantile_error: rank error of the quantile sketches
+        seed: seed of the quantile sketches
+        deduplicator: (optional) empty dedup.Deduplicator to use (Eg: a
+            Bloom filter to keep the state small)
+    '''
+
+    def __init__(self, state_path, column_dtype_conversion_dictionary=None, std_coeff=1.5,
+                 fill_na_method='median', label_col=None, quantile_error=0.01, seed=0,
+                 deduplicator=None):
+        if fill_na_method not in FILL_NA_METHODS:
+            raise ValueError("'fill_na_method' parameter must be one of {}".format(FILL_NA_METHODS))
+
+        self.state_path = state_path
+        self.conversion_dictionary = column_dtype_conversion_dictionary
+        self.std_coeff = std_coeff
+        self.fill_na_method = fill_na_method
+        self.label_col = label_col
+        self.quantile_error = quantile_error
+        self.seed = seed
+
+        self.partitions = []
+        self.rows_read = 0
+        self.rows_written = 0
+        self.moments = {}
+        self.sketches = {}
+        self.float_cols = set()
+        self.non_numeric_cols = set()
+        self.deduplicator = Deduplicator() if deduplicator is None else deduplicator
+        # committed fingerprint runs ([name, size]) and the new fingerprints
+        self._runs = []
+        self._next_run = 0
+        self._new_fingerprints = []
+
+        if os.path.exists(state_path):
+            self._load()
+
+    def clean_partition(self, df, partition=None):
+        '''
+        cleans a new partition and adds it to the state (in memory, see
+        commit()); df itself is not modified
+
+        Returns: the cleaned up partition (pandas.DataFrame)
+
+        Args:
+            df: pandas.DataFrame
+            partition: (optional) key of the partition, a str or an int;
+                dates (datetime.date, datetime.datetime, pandas.Timestamp)
+                are kept as their isoformat() string (Eg: '2020-01-02'), so
+                the keys read back from the state file are the same. A
+                ValueError is raised if it was already committed
+        '''
+        partition = _partition_key(partition)
+        if partition is not None and partition in self.partitions:
+            raise ValueError("partition {!r} is already in the state".format(partition))
+
+        if self.conversion_dictionary is None:
+            self.conversion_dictionary = suggest_conversion_dict(df)
+        df = change_dtypes(df, self.conversion_dictionary)
+        self.rows_read += len(df)
+
+        fingerprints = row_fingerprints(df)
+        keep = self.deduplicator.first_fingerprint_occurrences(fingerprints)
+        if self.deduplicator.method == 'exact':
+            self._new_fingerprints.append(fingerprints[keep])
+        if self.label_col is not None:
+            keep &= df[self.label_col].notna().to_numpy()
+        df = df[keep]
+
+        numeric_cols = []
+        for col_name in df.columns:
+            if df[col_name].dtype not in [int, float]:
+                self.non_numeric_cols.add(col_name)
+            elif col_name not in self.non_numeric_cols:
+                numeric_cols.append(col_name)
+                if df[col_name].dtype == float:
+                    self.float_cols.add(col_name)
+
+        columns = [df[col_name].to_numpy() for col_name in numeric_cols]
+        for col_name, values, col_moments in zip(numeric_cols, columns, column_stats(columns).to_moments()):
+            self.moments.setdefault(col_name, Moments()).merge(col_moments)
+            self.sketches.setdefault(col_name, QuantileSketch(self.quantile_error, self.seed)).update(values)
+
+        outlier_moments = {col_name: (self.moments[col_name].mean, self.moments[col_name].std)
+                           for col_name in numeric_cols if col_name != self.label_col}
+
+        # a column with outliers gets nan values and becomes float
+        # (in every partition, like in the whole table)
+        for col_name, (mean, std) in outlier_moments.items():
+            extremes = np.array([self.moments[col_name].min, self.moments[col_name].max])
+            if _outlier_mask(extremes, mean, std, self.std_coeff).any():
+                self.float_cols.add(col_name)
+        for col_name in numeric_cols:
+            if col_name in self.float_cols and df[col_name].dtype != float:
+                df[col_name] = df[col_name].astype(float)
+
+        df = remove_outliers(df, self.std_coeff, label_col=self.label_col, moments=outlier_moments,
+                             inplace=True)
+        fill_values = {col_name: self._fill_value(col_name, outlier_moments.get(col_name))
+                       for col_name in numeric_cols}
+        df = fill_nan(df, self.fill_na_method, label_col=self.label_col, fill_values=fill_values,
+                      inplace=True)
+
+        if partition is not None:
+            self.partitions.append(partition)
+        self.rows_written += len(df)
+        return df
+
+    def _fill_value(self, col_name, moments):
+        items, weights = self.sketches[col_name].items()
+        if moments is not None:
+            is_outlier = _outlier_mask(items, *moments, self.std_coeff)
+            items, weights = items[~is_outlier], weights[~is_outlier]
+
+        if len(items) == 0:
+            return np.nan
+        if self.fill_na_method == 'mean':
+            return float(np.average(items, weights=weights))
+        return float(weighted_quantile(items, weights, 0.5))
+
+    def commit(self):
+        '''
+        writes the state, atomically: the state file is either the
+        previous one or the new one, even if the process dies while
+        writing
+
+        The fingerprints of the rows ('exact' deduplicator) are not in the
+        state file but in immutable sorted runs next to it (in the
+        '<state_path>.runs' directory): only the fingerprints of the rows
+        cleaned since the last commit are written, as a new run, and a
+        run is merged with the previous one when it gets as big (at most
+        O(log(rows)) runs, each fingerprint is rewritten O(log(rows))
+        times overall). The state file lists the runs, so replacing it
+        commits the new run.
+        '''
+        names = sorted(self.moments, key=str)
+        sketch_params = []
+        arrays = {}
+        for i, col_name in enumerate(names):
+            params, arrays['items_{}'.format(i)], arrays['level_sizes_{}'.format(i)] = \
+                self.sketches[col_name].state()
+            sketch_params.append(params)
+
+        written = []
+        if self.deduplicator.method == 'exact':
+            dedup_params = {'method': 'exact', 'rows_seen': self.deduplicator.rows_seen,
+                            'removed': self.deduplicator.removed}
+            runs, written = self._write_runs()
+        else:
+            dedup_params, arrays['deduplicator'] = self.deduplicator.state()
+            runs = []
+
+        meta = {
+            'version': _STATE_VERSION,
+            'std_coeff': self.std_coeff,
+            'fill_na_method': self.fill_na_method,
+            'label_col': self.label_col,
+            'quantile_error': self.quantile_error,
+            'seed': self.seed,
+            'conversion_dictionary': None if self.conversion_dictionary is None else
+            [[col_name] + _dtype_to_json(dtype) for col_name, dtype in self.conversion_dictionary.items()],
+            'partitions': self.partitions,
+            'rows_read': self.rows_read,
+            'rows_written': self.rows_written,
+            'columns': [[col_name, moments.count, moments.mean, moments.m2, moments.min, moments.max]
+                        for col_name, moments in ((col_name, self.moments[col_name]) for col_name in names)],
+            'sketches': sketch_params,
+            'float_cols': sorted(self.float_cols, key=str),
+            'non_numeric_cols': sorted(self.non_numeric_cols, key=str),
+            'deduplicator': dedup_params,
+            'runs': runs,
+            'next_run': self._next_run,
+        }
+
+        # written next to the state file so that os.replace() doesn't cross
+        # file systems
+        tmp_path = '{}.{}.tmp'.format(self.state_path, os.getpid())
+        committed = False
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, meta=np.array(json.dumps(meta, default=_json_default)), **arrays)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.state_path)
+            committed = True
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            # the new runs of a failed commit are not listed anywhere
+            for name in ([] if committed else written):
+                os.remove(os.path.join(self._runs_dir, name))
+
+        # the runs merged into bigger ones
+        kept = {name for name, _ in runs}
+        for name in [name for name, _ in self._runs] + written:
+            if name not in kept:
+                os.remove(os.path.join(self._runs_dir, name))
+        self._runs = runs
+        self._new_fingerprints = []
+        if self.deduplicator.method == 'exact':
+            self.deduplicator = self._open_runs(dedup_params)
+
+    @property
+    def _runs_dir(self):
+        return self.state_path + '.runs'
+
+    def _write_runs(self):
+        '''
+        writes the fingerprints added since the last commit as a new run
+        and merges the last runs while a run is as big as the previous one
+
+        Returns: (runs, written) the list of [name, size] of the runs and
+            the names of the files written
+        '''
+        runs = list(self._runs)
+        written = []
+
+        def write(fingerprints):
+            name = 'run_{}.npy'.format(self._next_run)
+            self._next_run += 1
+            with open(os.path.join(self._runs_dir, name), 'wb') as f:
+                np.save(f, fingerprints)
+                f.flush()
+                os.fsync(f.fileno())
+            written.append(name)
+            runs.append([name, len(fingerprints)])
+
+        new = self._new_fingerprints
+        if new and sum(map(len, new)):
+            os.makedirs(self._runs_dir, exist_ok=True)
+            write(np.sort(np.concatenate(new)))
+            while len(runs) > 1 and runs[-2][1] <= 2 * runs[-1][1]:
+                last, previous = runs.pop(), runs.pop()
+                write(np.sort(np.concatenate([self._load_run(previous[0]), self._load_run(last[0])]),
+                              kind='stable'))
+        return runs, written
+
+    def _load_run(self, name):
+        return np.load(os.path.join(self._runs_dir, name), mmap_mode='r')
+
+    def _open_runs(self, dedup_params):
+        '''
+        Returns: 'exact' Deduplicator over the memory mapped runs
+        '''
+        return Deduplicator.from_runs(dedup_params, [self._load_run(name) for name, _ in self._runs],
+                                      self.deduplicator.max_fingerprints, self.deduplicator.spill_dir)
+
+    def _load(self):
+        with np.load(self.state_path, allow_pickle=False) as data:
+            meta = json.loads(str(data['meta']))
+            if meta['version'] != _STATE_VERSION:
+                raise ValueError("unsupported state file version {}".format(meta['version']))
+            arrays = {key: data[key] for key in data.files if key != 'meta'}
+
+        self.std_coeff = meta['std_coeff']
+        self.fill_na_method = meta['fill_na_method']
+        self.label_col = meta['label_col']
+        self.quantile_error = meta['quantile_error']
+        self.seed = meta['seed']
+        if meta['conversion_dictionary'] is not None:
+            self.conversion_dictionary = {col_name: _dtype_from_json(kind, spec)
+                                          for col_name, kind, spec in meta['conversion_dictionary']}
+
+        self.partitions = meta['partitions']
+        self.rows_read = meta['rows_read']
+        self.rows_written = meta['rows_written']
+        self.moments = {col_name: Moments(count, mean, m2, minimum, maximum)
+                        for col_name, count, mean, m2, minimum, maximum in meta['columns']}
+        self.sketches = {
+            col_name: QuantileSketch.from_state(params, arrays['items_{}'.format(i)],
+                                                arrays['level_sizes_{}'.format(i)])
+            for i, (col_name, params) in enumerate(zip(self.moments, meta['sketches']))}
+        self.float_cols = set(meta['float_cols'])
+        self.non_numeric_cols = set(meta['non_numeric_cols'])
+
+        self._runs = meta['runs']
+        self._next_run = meta['next_run']
+        if meta['deduplicator']['method'] == 'exact':
+            self.deduplicator = self._open_runs(meta['deduplicator'])
+        else:
+            self.deduplicator = Deduplicator.from_state(meta['deduplicator'], arrays['deduplicator'])
+
+
+def _partition_key(partition):
+    '''
+    Returns: the partition key as stored in the state file (a str or an
+        int, or None)
+    '''
+    if partition is None or isinstance(partition, str):
+        return partition
+    if isinstance(partition, (int, np.integer)) and not isinstance(partition, (bool, np.bool_)):
+        return int(partition)
+    if isinstance(partition, datetime.date):
+        return partition.isoformat()
+    raise ValueError("'partition' parameter must be a str, an int or a date, got {!r}".format(partition))
+
+
+def _json_default(value):
+    # numpy scalars in the statistics
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError('{!r} is not json serializable'.format(value))
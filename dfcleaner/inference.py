@@ -0,0 +1,200 @@
+import numpy as np
+import pandas as pd
+from dfcleaner.stats import HyperLogLog
+
+# number of rows of a column scanned at once
+_INFER_BLOCK_ROWS = 1 << 16
+# longer strings are parsed by pandas.to_numeric()
+_MAX_NUMBER_WIDTH = 64
+
+
+def _number_transitions():
+    '''
+    transition table (state, byte) -> state of the automaton behind
+    _is_number(), which accepts the strings matching
+        \\s*[+-]?(\\d+\\.?\\d*|\\.\\d+)([eE][+-]?\\d+)?\\s*
+    '''
+    start, sign, integer, dot, lone_dot, fraction, exponent, exponent_sign, \
+        exponent_digits, trailing_space, dead = range(11)
+
+    table = np.full((11, 256), dead, dtype=np.uint8)
+    # bytes arrays are padded with 0 bytes
+    table[:, 0] = np.arange(11)
+
+    digits = [ord(char) for char in '0123456789']
+    spaces = [ord(char) for char in ' \t\n\r\f\v']
+    signs = [ord('+'), ord('-')]
+    exponents = [ord('e'), ord('E')]
+
+    table[start, spaces] = start
+    table[start, signs] = sign
+    for state in [start, sign]:
+        table[state, digits] = integer
+        table[state, ord('.')] = lone_dot
+    table[integer, digits] = integer
+    table[integer, ord('.')] = dot
+    table[np.ix_([dot, lone_dot, fraction], digits)] = fraction
+    for state in [integer, dot, fraction]:
+        table[state, exponents] = exponent
+    table[exponent, signs] = exponent_sign
+    table[np.ix_([exponent, exponent_sign, exponent_digits], digits)] = exponent_digits
+    for state in [integer, dot, fraction, exponent_digits, trailing_space]:
+        table[state, spaces] = trailing_space
+
+    is_accepting = np.zeros(11, dtype=bool)
+    is_accepting[[integer, dot, fraction, exponent_digits, trailing_space]] = True
+    return table, is_accepting
+
+
+_NUMBER_TRANSITIONS, _IS_ACCEPTING = _number_transitions()
+
+
+def infer_types(df, float_ratio=2/3, category_ratio=0.01, precision=12):
+    '''
+    scans every column of df block by block (all the values of a block at
+    once) to decide which columns should change their dtype, see
+    cleaner.suggest_conversion_dict().
+
+    string (object, str or category) columns:
+        every value is checked by a byte level parser (numbers in
+        decimal or scientific notation with optional sign and surrounding
+        white space, Eg: '12.5', ' -7', '1e3'). The column should
+        be float when the parsed values and the null values are more than
+        'float_ratio' of the column (and at least one value is parsed)
+        Eg: numbers with a few '?' or 'null' placeholders
+    numeric (int or float) columns:
+        the distinct values are counted with a HyperLogLog sketch
+        (stats.HyperLogLog). The column should be category when there are
+        less than 'category_ratio' distinct values per value
+        Eg: a 'has_credit_card' column with 1 and 0 values
+
+    The scan of a column stops as soon as the remaining blocks can't change
+    its decision (Eg: once more than 'float_ratio' of the whole column is
+    parsed, or once the distinct count is clearly above the category ratio),
+    so the ratios are those of the 'rows_scanned' first rows. The result
+    only depends on the values, never on a random sample. Other columns
+    (bool, datetime, ...) are never converted.
+
+    Returns: pandas.DataFrame with a row per column of df and the columns
+        dtype: current dtype
+        rows_scanned: number of rows scanned before the decision
+        null_ratio: ratio of null values in the scanned rows
+        parse_ratio: ratio of the non-null scanned values that parse as
+            numbers (string columns, nan otherwise)
+        distinct: approximate number of distinct values in the scanned
+            rows (numeric columns, nan otherwise)
+        suggestion: float, 'category' or None
+
+    Args:
+        df: pandas.DataFrame
+        float_ratio: minimum ratio of parsed (or null) values of the string
+            columns that should be float
+        category_ratio: the numeric columns with less distinct values per
+            value than this should be category
+        precision: precision of the HyperLogLog sketches
+            (relative error 1.04 / sqrt(2**precision))
+    '''
+    rows = [_infer_column(df.iloc[:, i], float_ratio, category_ratio, precision)
+            for i in range(df.shape[1])]
+    report = pd.DataFrame(rows, columns=['dtype', 'rows_scanned', 'null_ratio', 'parse_ratio',
+                                         'distinct', 'suggestion'])
+    report.index = df.columns
+    return report
+
+
+def _is_string_dtype(dtype):
+    return dtype == object or isinstance(dtype, (pd.StringDtype, pd.CategoricalDtype))
+
+
+def _is_numeric_dtype(dtype):
+    return isinstance(dtype, np.dtype) and dtype.kind in 'iuf'
+
+
+def _infer_column(col, float_ratio, category_ratio, precision):
+    '''
+    Returns: row of the infer_types() report for a single column
+    '''
+    if _is_string_dtype(col.dtype):
+        return _infer_string_column(col, float_ratio)
+    if _is_numeric_dtype(col.dtype):
+        return _infer_numeric_column(col, category_ratio, precision)
+    return [col.dtype, 0, np.nan, np.nan, np.nan, None]
+
+
+def _infer_string_column(col, float_ratio):
+    n = len(col)
+    required = float_ratio * n
+    n_scanned = n_null = n_parsed = 0
+
+    for start in range(0, n, _INFER_BLOCK_ROWS):
+        block = col.iloc[start:start + _INFER_BLOCK_ROWS]
+        is_null = block.isna().to_numpy()
+        is_number = _is_number(block)
+
+        n_scanned += len(block)
+        n_null += int(np.count_nonzero(is_null))
+        n_parsed += int(np.count_nonzero(is_number & ~is_null))
+
+        # decided whatever the remaining rows hold
+        if (n_parsed + n_null > required and n_parsed > 0) or n_parsed + n_null + n - n_scanned <= required:
+            break
+
+    n_values = n_scanned - n_null
+    is_float = n_parsed + n_null > required and n_parsed > 0
+    return [col.dtype, n_scanned,
+            n_null / n_scanned if n_scanned else np.nan,
+            n_parsed / n_values if n_values else np.nan,
+            np.nan,
+            float if is_float else None]
+
+
+def _is_number(block):
+    '''
+    Returns: boolean numpy array, True where the value of the block is a
+        number written in decimal or scientific notation (what
+        pandas.to_numeric() parses)
+
+    The values are encoded into a fixed width bytes array and all of them
+    go through the automaton of _number_transitions() at once, one
+    character position at a time. Blocks with non ascii or very long
+    strings are handed over to pandas.to_numeric().
+    '''
+    try:
+        strings = block.to_numpy(dtype=object).astype(bytes)
+    except UnicodeEncodeError:
+        strings = None
+
+    if strings is None or strings.dtype.itemsize > _MAX_NUMBER_WIDTH:
+        return pd.to_numeric(block, errors='coerce').notna().to_numpy()
+
+    states = np.zeros(len(strings), dtype=np.uint8)
+    if strings.dtype.itemsize > 0:
+        for chars in strings.view(np.uint8).reshape(len(strings), -1).T:
+            states = _NUMBER_TRANSITIONS[states, chars]
+    return _IS_ACCEPTING[states]
+
+
+def _infer_numeric_column(col, category_ratio, precision):
+    n = len(col)
+    maximum = category_ratio * n
+    sketch = HyperLogLog(precision)
+    n_scanned = n_null = 0
+
+    distinct = 0.0
+    for start in range(0, n, _INFER_BLOCK_ROWS):
+        block = col.iloc[start:start + _INFER_BLOCK_ROWS]
+        sketch.update(block)
+        n_scanned += len(block)
+        n_null += int(np.count_nonzero(block.isna().to_numpy()))
+
+        # the distinct count only grows, stop once it is above the
+        # maximum by more than 3 standard errors
+        distinct = sketch.count()
+        if distinct >= maximum * (1 + 3 * sketch.relative_error):
+            break
+
+    return [col.dtype, n_scanned,
+            n_null / n_scanned if n_scanned else np.nan,
+            np.nan,
+            distinct,
+            'category' if n and distinct < maximum else None]
@@ -0,0 +1,329 @@
+import numpy as np
+from dfcleaner.cleaner import FILL_NA_METHODS, _map_columns, _is_parallel, _convert_column
+from dfcleaner.cleaner import _column_outliers, _column_nans, downcast_dtypes, remove_outliers, OUTLIER_METHODS
+from dfcleaner.dedup import first_row_occurrences
+from dfcleaner.stats import column_stats
+from dfcleaner.profiling import profiled
+
+
+class LazyFrame:
+    '''
+    lazy version of the cleaner functions: every method only records a
+    step of the plan and returns a new LazyFrame, nothing runs until
+    collect() is called.
+
+        cleaner.lazy(df).change_dtypes({'price': float}).dedup() \\
+            .dropna('label').remove_outliers(1.5, label_col='label') \\
+            .fill_nan('median').collect()
+
+    gives exactly what the same cleaner functions called one after the
+    other give, but the plan is optimized first
+        - consecutive change_dtypes() steps are merged so every column is
+            converted in a single task (the conversions of a column still
+            run in order) and the columns already of the right dtype
+            are skipped
+        - consecutive dedup() and dropna() steps are merged into a single
+            row mask, so the rows are taken only once
+        - remove_outliers() followed by fill_nan() is merged so that every
+            numeric column is written once, with the outliers and the nan
+            values replaced at the same time (not for the grouped
+            remove_outliers(by=...))
+        - dropna() doesn't check the columns whose dtype can't hold null
+            values (int, uint and bool), the rows are only taken when
+            some of them are dropped and the columns without nan values
+            are never filled
+
+    Use explain() to see the optimized plan.
+
+    Note: the input dataframe is never modified, and only the
+        downcast_dtypes() and grouped remove_outliers() steps are logged
+        by cleaner.ENABLE_LOGGING.
+
+    Args:
+        df: pandas.DataFrame object
+    '''
+
+    def __init__(self, df, steps=()):
+        self._df = df
+        self._steps = tuple(steps)
+
+    def _with_step(self, name, **params):
+        return LazyFrame(self._df, self._steps + ((name, params),))
+
+    def change_dtypes(self, conversion_dictionary):
+        '''
+        see cleaner.change_dtypes()
+        '''
+        return self._with_step('change_dtypes', conversion_dictionary=dict(conversion_dictionary))
+
+    def dedup(self, deduplicator=None):
+        '''
+        see cleaner.drop_duplicates()
+        '''
+        return self._with_step('dedup', deduplicator=deduplicator)
+
+    def dropna(self, subset):
+        '''
+        drops the rows where any of the given columns is null
+        (Eg: the target(label) column)
+
+        Args:
+            subset: column name or list of column names
+        '''
+        if isinstance(subset, str):
+            subset = [subset]
+        return self._with_step('dropna', subset=list(subset))
+
+    def remove_outliers(self, std_coeff=1.5, label_col=None, moments=None, method='zscore', by=None,
+                        clip=False):
+        '''
+        see cleaner.remove_outliers()
+        '''
+        if method not in OUTLIER_METHODS:
+            raise ValueError("'method' parameter must be one of {}".format(OUTLIER_METHODS))
+        if moments is not None and (method != 'zscore' or by is not None):
+            raise ValueError("'moments' parameter can only be used with method='zscore' and without 'by'")
+        return self._with_step('remove_outliers', std_coeff=std_coeff, label_col=label_col,
+                               moments=moments, method=method, by=by, clip=clip)
+
+    def fill_nan(self, how='median', fill_values=None, quantile_error=0.01):
+        '''
+        see cleaner.fill_nan()
+        '''
+        if fill_values is None and how not in FILL_NA_METHODS:
+            raise ValueError("'how' parameter must be one of {}".format(FILL_NA_METHODS))
+        return self._with_step('fill_nan', how=how, fill_values=fill_values,
+                               quantile_error=quantile_error)
+
+    def downcast_dtypes(self, category_threshold=0.5, nullable=True):
+        '''
+        see cleaner.downcast_dtypes()
+        '''
+        return self._with_step('downcast_dtypes', category_threshold=category_threshold,
+                               nullable=nullable)
+
+    def explain(self):
+        '''
+        Returns: string with the optimized plan, one stage per line
+        '''
+        stages = _optimize(self._steps)
+        lines = ['{} step(s) => {} stage(s)'.format(len(self._steps), len(stages))]
+        for i, (name, params) in enumerate(stages, start=1):
+            lines.append('  {}. {}'.format(i, _describe(name, params)))
+        return '\n'.join(lines)
+
+    def collect(self, n_jobs=None, executor=None):
+        '''
+        runs the optimized plan
+
+        Returns: the cleaned up pandas.DataFrame
+
+        Args:
+            n_jobs, executor: (optional) to run the per column work in
+                parallel, see cleaner.change_dtypes()
+        '''
+        df = self._df.copy(deep=False)
+        for name, params in _optimize(self._steps):
+            df = _STAGES[name](df, n_jobs=n_jobs, executor=executor, **params)
+        return df
+
+    def __repr__(self):
+        return 'LazyFrame({} rows x {} columns)\n{}'.format(
+            self._df.shape[0], self._df.shape[1], self.explain())
+
+
+def _optimize(steps):
+    '''
+    merges the steps into stages, see LazyFrame
+    '''
+    stages = []
+    for name, params in steps:
+        last_name, last_params = stages[-1] if stages else (None, None)
+
+        if name == 'change_dtypes':
+            conversions = dict(last_params['conversions']) if last_name == 'convert' else {}
+            for col_name, dtype in params['conversion_dictionary'].items():
+                conversions[col_name] = conversions.get(col_name, ()) + (dtype,)
+            stage, merge = ('convert', {'conversions': conversions}), last_name == 'convert'
+
+        elif name in ['dedup', 'dropna']:
+            filters = list(last_params['filters']) if last_name == 'filter_rows' else []
+            stage, merge = ('filter_rows', {'filters': filters + [(name, params)]}), last_name == 'filter_rows'
+
+        elif name == 'fill_nan' and last_name == 'clean_numeric' and last_params['fill'] is None:
+            stage, merge = ('clean_numeric', dict(last_params, fill=params)), True
+
+        elif name == 'remove_outliers' and params['by'] is not None:
+            # grouped thresholds need the group keys, run as is
+            stage, merge = (name, params), False
+
+        elif name == 'remove_outliers':
+            stage, merge = ('clean_numeric', {'outliers': params, 'fill': None}), False
+
+        elif name == 'fill_nan':
+            stage, merge = ('clean_numeric', {'outliers': None, 'fill': params}), False
+
+        else:
+            stage, merge = (name, params), False
+
+        if merge:
+            stages[-1] = stage
+        else:
+            stages.append(stage)
+
+    return stages
+
+
+def _describe(name, params):
+    if name == 'convert':
+        return 'change_dtypes: {}'.format(', '.join(
+            '{} -> {}'.format(col_name, ' -> '.join(map(_dtype_name, dtypes)))
+            for col_name, dtypes in params['conversions'].items()))
+
+    if name == 'filter_rows':
+        filters = ['drop_duplicates' if filter_name == 'dedup' else 'dropna({})'.format(filter_params['subset'])
+                   for filter_name, filter_params in params['filters']]
+        return 'filter rows ({}) with a single row mask'.format(' & '.join(filters))
+
+    if name == 'clean_numeric':
+        parts = []
+        if params['outliers'] is not None:
+            method = params['outliers']['method']
+            parts.append('remove_outliers({}std_coeff={})'.format(
+                '' if method == 'zscore' else 'method={}, '.format(method), params['outliers']['std_coeff']))
+        if params['fill'] is not None:
+            parts.append('fill_nan({})'.format('fill_values' if params['fill']['fill_values'] is not None
+                                               else params['fill']['how']))
+        return '{} in a single write per numeric column'.format(' + '.join(parts))
+
+    return '{}({})'.format(name, ', '.join('{}={}'.format(key, value) for key, value in params.items()))
+
+
+def _dtype_name(dtype):
+    return getattr(dtype, '__name__', str(dtype))
+
+
+def _convert(df, conversions, n_jobs=None, executor=None):
+    # the columns already of the right dtype are skipped
+    conversions = {col_name: dtypes for col_name, dtypes in conversions.items()
+                   if not (len(dtypes) == 1 and dtypes[0] in [int, float]
+                           and df[col_name].dtype == dtypes[0])}
+
+    tasks = [(df[col_name], dtypes) for col_name, dtypes in conversions.items()]
+    converted = _map_columns(_convert_column_chain, tasks, n_jobs, executor, names=list(conversions))
+
+    for col_name, col in zip(conversions, converted):
+        df[col_name] = col
+
+    return df
+
+
+def _convert_column_chain(col, dtypes):
+    for dtype in dtypes:
+        col = _convert_column(col, dtype)
+    return col
+
+
+def _filter_rows(df, filters, n_jobs=None, executor=None):
+    keep = np.ones(len(df), dtype=bool)
+    for name, params in filters:
+        if name == 'dedup':
+            deduplicator = params['deduplicator']
+            if deduplicator is None:
+                keep &= first_row_occurrences(df)
+            else:
+                keep &= deduplicator.first_occurrences(df)
+        else:
+            for col_name in params['subset']:
+                dtype = df[col_name].dtype
+                # int, uint and bool numpy columns have no null values
+                if not (isinstance(dtype, np.dtype) and dtype.kind in 'biu'):
+                    keep &= df[col_name].notna().to_numpy()
+
+    if keep.all():
+        return df
+    return df[keep]
+
+
+def _clean_numeric(df, outliers, fill, n_jobs=None, executor=None):
+    '''
+    remove_outliers() and/or fill_nan() with a single task and a single
+    write per numeric column
+    '''
+    numeric_cols = [col_name for col_name in df.columns
+                    if df[col_name].dtype in [int, float]]
+
+    outlier_cols = []
+    moments = {}
+    if outliers is not None:
+        outlier_cols = [col_name for col_name in numeric_cols
+                        if col_name != outliers['label_col']
+                        and (outliers['moments'] is None or col_name in outliers['moments'])]
+        if outliers['moments'] is not None:
+            moments = outliers['moments']
+        elif outliers['method'] == 'zscore' and not _is_parallel(n_jobs, executor):
+            # mean and std of all the outlier columns in a single pass
+            stats = column_stats([df[col_name].to_numpy() for col_name in outlier_cols])
+            moments = dict(zip(outlier_cols, zip(stats.mean, stats.std)))
+
+    fill_cols = []
+    if fill is not None:
+        fill_cols = [col_name for col_name in numeric_cols
+                     if fill['fill_values'] is None or col_name in fill['fill_values']]
+
+    cols = [col_name for col_name in numeric_cols
+            if col_name in outlier_cols or col_name in fill_cols]
+    tasks = [(df[col_name].to_numpy(),
+              col_name in outlier_cols, moments.get(col_name),
+              None if outliers is None else outliers['std_coeff'],
+              None if outliers is None else outliers['method'],
+              outliers is not None and outliers['clip'],
+              col_name in fill_cols,
+              None if fill is None else fill['how'],
+              None if fill is None or fill['fill_values'] is None else fill['fill_values'][col_name],
+              None if fill is None else fill['quantile_error'])
+             for col_name in cols]
+    results = _map_columns(_clean_column, tasks, n_jobs, executor, names=cols)
+
+    for col_name, values in zip(cols, results):
+        if values is not None:
+            df[col_name] = values
+
+    return df
+
+
+def _clean_column(values, check_outliers, moments, std_coeff, method, clip, fill, how, fill_value,
+                  quantile_error):
+    '''
+    replaces the outliers and then fills the nan values of a single
+    column for _clean_numeric()
+
+    Returns: new numpy array or None if nothing changed
+    '''
+    changed = None
+    if check_outliers:
+        outliers = _column_outliers(values, moments, std_coeff, method, clip=clip)
+        if outliers is not None:
+            is_outlier, replacement = outliers
+            changed = values = values.astype(np.float64)
+            values[is_outlier] = replacement
+
+    # int columns can't have nan values
+    if fill and values.dtype == float:
+        nans = _column_nans(values, how, fill_value, quantile_error)
+        if nans is not None:
+            if changed is None:
+                changed = values = values.copy()
+            np.putmask(values, *nans)
+
+    return changed
+
+
+# the stages are profiled like the cleaner functions (see profiling.Profiler)
+_STAGES = {
+    'convert': profiled(_convert, name='convert'),
+    'filter_rows': profiled(_filter_rows, name='filter_rows'),
+    'clean_numeric': profiled(_clean_numeric, name='clean_numeric'),
+    'remove_outliers': remove_outliers,
+    'downcast_dtypes': downcast_dtypes,
+}
@@ -0,0 +1,280 @@
+import glob
+import os
+import numpy as np
+import pandas as pd
+from dfcleaner.cleaner import change_dtypes, remove_outliers, fill_nan, _outlier_mask, _map_columns
+from dfcleaner.cleaner import FILL_NA_METHODS
+from dfcleaner.stats import Moments, QuantileSketch, column_stats, weighted_quantile
+from dfcleaner.dedup import Deduplicator, row_fingerprints
+from dfcleaner.streaming import _file_format, _import_parquet, _ChunkWriter
+
+BACKENDS = ['processes', 'dask']
+
+
+def preprocess_partitions(input_paths, output_dir, column_dtype_conversion_dictionary={}, std_coeff=1.5,
+                          fill_na_method='median', label_col=None, n_jobs=-1, executor=None,
+                          backend='processes', quantile_error=0.01, seed=0, deduplicator=None):
+    '''
+    partitioned version of cleaner.preprocess() for datasets split into
+    several csv or parquet files (Eg: a partitioned parquet dataset) that
+    are too big for a single pandas.DataFrame. The partitions are cleaned
+    in parallel in a local process pool (or with dask, if installed) and
+    every cleaned partition is written to a file of the same name in
+    output_dir (so the input files must have different names).
+
+    Every pass maps a function over the partitions (each worker reads
+    its own partition and changes its dtypes) and the partition results
+    are merged (reduced) in this process:
+        1. the 64 bit fingerprints of the rows (see dedup.row_fingerprints())
+            and the null labels => the rows to keep in every partition
+            (the first occurrence of a row in the partition order)
+        2. the count, mean, std, min and max (stats.Moments) and a
+            quantile sketch (stats.QuantileSketch) of every numeric column
+            of the kept rows => outlier bounds, the dtype of every column
+            in the whole dataset and, from the sketch items that are not
+            outliers, the fill values
+        3. drops the rows, removes the outliers, fills the nan values and
+            writes the partition
+    Only the fingerprints (8 bytes per row), one bit per row and a few
+    statistics per column travel between the processes.
+
+    Tolerance: the result is the cleaner.preprocess() result of all the
+    partitions concatenated, with
+        - the outlier bounds computed from merged statistics, which may
+            differ from the single frame ones in the last few bits
+        - the fill values taken from the merged quantile sketches: exact
+            (up to the last few bits of the 'mean') for columns with less
+            than about 1.65 / quantile_error values, otherwise the
+            weighted mean of the sketch items ('mean') or a value whose
+            rank is within quantile_error * count of the median
+        - 'category' conversions done per partition (every partition
+            gets its own categories)
+    and the index is not written to the output files.
+
+    Returns: dictionary with the number of rows read, written and
+        removed as duplicates and the list of 'output_paths'
+
+    Args:
+        input_paths: list of paths of .csv or .parquet files, or the path
+            of a directory holding them (read in sorted order)
+        output_dir: directory to write the cleaned partitions into
+            (created if needed, the files are overwritten)
+        column_dtype_conversion_dictionary, std_coeff, fill_na_method,
+            label_col: same as in cleaner.preprocess()
+        n_jobs: number of processes (-1 means one per cpu)
+        executor: (optional) concurrent.futures executor to use instead
+            of a new process pool (backend='processes' only)
+        backend: 'processes' or 'dask' (needs dask, runs on the local
+            processes scheduler, no cluster)
+        quantile_error: rank error of the quantile sketches
+        seed: seed of the quantile sketches (the sketch of the i-th
+            partition gets seed + i)
+        deduplicator: (optional) dedup.Deduplicator to detect the duplicate
+            rows with (Eg: with bounded memory or shared with other calls)
+    '''
+    if fill_na_method not in FILL_NA_METHODS:
+        raise ValueError("'fill_na_method' parameter must be one of {}".format(FILL_NA_METHODS))
+    if backend not in BACKENDS:
+        raise ValueError("'backend' parameter must be one of {}".format(BACKENDS))
+
+    input_paths = _partition_paths(input_paths)
+    output_paths = [os.path.join(output_dir, os.path.basename(path)) for path in input_paths]
+    if len(set(output_paths)) < len(output_paths):
+        raise ValueError("the input files must have different names, they are written to output_dir "
+                         "under the same name")
+    os.makedirs(output_dir, exist_ok=True)
+    conversions = dict(column_dtype_conversion_dictionary)
+
+    if backend == 'dask':
+        run = _dask_runner(n_jobs)
+        return _preprocess_partitions(run, input_paths, output_paths, conversions, std_coeff,
+                                      fill_na_method, label_col, quantile_error, seed, deduplicator)
+
+    if executor is not None:
+        run = _executor_runner(executor)
+        return _preprocess_partitions(run, input_paths, output_paths, conversions, std_coeff,
+                                      fill_na_method, label_col, quantile_error, seed, deduplicator)
+
+    # multiprocessing is only imported when the pool is needed
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(_n_processes(n_jobs)) as pool:
+        run = _executor_runner(pool)
+        return _preprocess_partitions(run, input_paths, output_paths, conversions, std_coeff,
+                                      fill_na_method, label_col, quantile_error, seed, deduplicator)
+
+
+def _preprocess_partitions(run, input_paths, output_paths, conversions, std_coeff, fill_na_method,
+                           label_col, quantile_error, seed, deduplicator):
+    # 1. rows to keep
+    scans = run(_scan_partition, [(path, conversions, label_col) for path in input_paths])
+
+    if deduplicator is None:
+        deduplicator = Deduplicator()
+    removed_before = deduplicator.removed
+    rows_to_keep = []
+    for fingerprints, has_label in scans:
+        keep = deduplicator.first_fingerprint_occurrences(fingerprints) & has_label
+        rows_to_keep.append(np.packbits(keep))
+    rows_read = sum(len(fingerprints) for fingerprints, _ in scans)
+    del scans
+
+    # 2. outlier bounds, dtypes and fill values of the whole dataset
+    tasks = [(path, conversions, packed_keep, quantile_error, seed + i)
+             for i, (path, packed_keep) in enumerate(zip(input_paths, rows_to_keep))]
+    moments = {}
+    sketches = {}
+    float_cols = set()
+    non_numeric_cols = set()
+    for col_moments, col_sketches, col_floats, col_non_numeric in run(_partition_stats, tasks):
+        for col_name, partition_col_moments in col_moments.items():
+            moments.setdefault(col_name, Moments()).merge(partition_col_moments)
+        for col_name, sketch in col_sketches.items():
+            if col_name in sketches:
+                sketches[col_name].merge(sketch)
+            else:
+                sketches[col_name] = sketch
+        float_cols |= col_floats
+        non_numeric_cols |= col_non_numeric
+
+    numeric_cols = [col_name for col_name in moments if col_name not in non_numeric_cols]
+    outlier_moments = {col_name: (moments[col_name].mean, moments[col_name].std)
+                       for col_name in numeric_cols if col_name != label_col}
+
+    # a column with outliers gets nan values and becomes float
+    for col_name, (mean, std) in outlier_moments.items():
+        extremes = np.array([moments[col_name].min, moments[col_name].max])
+        if _outlier_mask(extremes, mean, std, std_coeff).any():
+            float_cols.add(col_name)
+    float_cols = [col_name for col_name in numeric_cols if col_name in float_cols]
+
+    fill_values = {}
+    for col_name in float_cols:
+        items, weights = sketches[col_name].items()
+        if col_name in outlier_moments:
+            is_outlier = _outlier_mask(items, *outlier_moments[col_name], std_coeff)
+            items, weights = items[~is_outlier], weights[~is_outlier]
+
+        if len(items) == 0:
+            fill_values[col_name] = np.nan
+        elif fill_na_method == 'mean':
+            fill_values[col_name] = float(np.average(items, weights=weights))
+        else:
+            fill_values[col_name] = float(weighted_quantile(items, weights, 0.5))
+    del sketches
+
+    # 3. cleaning
+    tasks = [(path, output_path, conversions, packed_keep, float_cols, sorted(non_numeric_cols),
+              outlier_moments, std_coeff, fill_na_method, fill_values, label_col)
+             for path, output_path, packed_keep in zip(input_paths, output_paths, rows_to_keep)]
+    rows_written = sum(run(_clean_partition, tasks))
+
+    return {'rows_read': rows_read, 'rows_written': rows_written,
+            'duplicates_removed': deduplicator.removed - removed_before,
+            'output_paths': output_paths}
+
+
+def _partition_paths(input_paths):
+    if isinstance(input_paths, str):
+        if not os.path.isdir(input_paths):
+            return [input_paths]
+        paths = sorted(glob.glob(os.path.join(input_paths, '*')))
+        return [path for path in paths
+                if os.path.splitext(path)[1].lower() in ['.csv', '.parquet', '.pq']]
+    return list(input_paths)
+
+
+def _n_processes(n_jobs):
+    if n_jobs is None or n_jobs < 0:
+        return os.cpu_count() or 1
+    return n_jobs
+
+
+def _executor_runner(executor):
+    def run(function, tasks):
+        return _map_columns(function, tasks, executor=executor)
+    return run
+
+
+def _dask_runner(n_jobs):
+    try:
+        import dask
+    except ImportError:
+        raise ImportError("dask is required for backend='dask' (pip install dask)")
+
+    def run(function, tasks):
+        delayed = [dask.delayed(function)(*task) for task in tasks]
+        return list(dask.compute(*delayed, scheduler='processes', num_workers=_n_processes(n_jobs)))
+    return run
+
+
+# the functions below run in the worker processes, on a single partition
+
+def _read_partition(path, conversions):
+    if _file_format(path) == 'csv':
+        df = pd.read_csv(path)
+    else:
+        df = _import_parquet().read_table(path).to_pandas()
+    return change_dtypes(df, conversions, inplace=True)
+
+
+def _unpack(packed_keep, n_rows):
+    return np.unpackbits(packed_keep, count=n_rows).astype(bool)
+
+
+def _scan_partition(path, conversions, label_col):
+    '''
+    Returns: (fingerprints of the rows, boolean numpy array which is
+        True where the label is not null)
+    '''
+    df = _read_partition(path, conversions)
+    has_label = np.ones(len(df), dtype=bool)
+    if label_col is not None:
+        has_label = df[label_col].notna().to_numpy()
+    return row_fingerprints(df), has_label
+
+
+def _partition_stats(path, conversions, packed_keep, quantile_error, seed):
+    '''
+    Returns: (dictionary with the numeric column names as keys and the
+        stats.Moments of their kept values as values, the same with the
+        stats.QuantileSketch of their kept values, set of the float
+        columns, set of the non-numeric columns)
+    '''
+    df = _read_partition(path, conversions)
+    keep = _unpack(packed_keep, len(df))
+
+    numeric_cols = [col_name for col_name in df.columns if df[col_name].dtype in [int, float]]
+    float_cols = {col_name for col_name in numeric_cols if df[col_name].dtype == float}
+    non_numeric_cols = set(df.columns) - set(numeric_cols)
+
+    columns = [df[col_name].to_numpy()[keep] for col_name in numeric_cols]
+    sketches = {}
+    for col_name, values in zip(numeric_cols, columns):
+        sketches[col_name] = QuantileSketch(quantile_error, seed)
+        sketches[col_name].update(values)
+    return (dict(zip(numeric_cols, column_stats(columns).to_moments())), sketches,
+            float_cols, non_numeric_cols)
+
+
+def _clean_partition(path, output_path, conversions, packed_keep, float_cols, non_numeric_cols,
+                     outlier_moments, std_coeff, fill_na_method, fill_values, label_col):
+    '''
+    Returns: number of rows written
+    '''
+    df = _read_partition(path, conversions)
+    df = df[_unpack(packed_keep, len(df))]
+
+    # give every partition the dtypes the whole dataset would have
+    for col_name in float_cols:
+        df[col_name] = df[col_name].astype(float)
+    for col_name in non_numeric_cols:
+        if df[col_name].dtype in [int, float]:
+            df[col_name] = df[col_name].astype(object)
+
+    df = remove_outliers(df, std_coeff, label_col=label_col, moments=outlier_moments, inplace=True)
+    df = fill_nan(df, fill_na_method, label_col=label_col, fill_values=fill_values, inplace=True)
+
+    with _ChunkWriter(output_path) as writer:
+        writer.write(df)
+    return len(df)
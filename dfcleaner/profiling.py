@@ -0,0 +1,276 @@
+import functools
+import json
+import threading
+import time
+import pandas as pd
+from dfcleaner.dflogger import snapshot, column_changes
+
+# profilers of the enclosing 'with Profiler()' blocks and, per thread,
+# the steps being run (threads that clean different frames at the same
+# time each get their own stack); the cleaner functions do nothing more
+# than checking that _profilers is empty while no profiler is active
+_profilers = []
+_local = threading.local()
+
+
+def _frames():
+    '''
+    Returns: the stack of the steps being run by the calling thread
+    '''
+    try:
+        return _local.frames
+    except AttributeError:
+        _local.frames = []
+        return _local.frames
+
+
+class Profiler:
+    '''
+    context manager that records the cost of every cleaner function
+    (step) run inside it, including the steps run by other steps
+    (Eg: the change_dtypes() run by preprocess()) and by
+    streaming.preprocess_file(), lazy.LazyFrame.collect() and
+    estimator.Cleaner.
+
+        with profiling.Profiler() as profiler:
+            df = cleaner.preprocess(df, conversion_dict)
+        profiler.to_json_lines('profile.jsonl')
+
+    Every step gives a record (dictionary) with
+        step: name of the function
+        path: names of the enclosing steps and the step, joined by '/'
+            Eg: 'preprocess/remove_outliers'
+        column: None
+        wall_time, cpu_time: seconds (cpu time of all the threads)
+        rows_in, rows_out: number of rows of the input and output dataframe
+        cells_changed: number of cells the step changed (None when
+            count_changes is False)
+        peak_memory: peak memory allocated during the step above the
+            memory allocated when it started, in bytes (None when memory
+            is False)
+
+    followed by one record per column the step worked on with the same
+    'step' and 'path', the 'column' name, its 'wall_time' and 'cpu_time'
+    (time spent on that column alone, by the thread or process that
+    worked on it), the 'rows_in' and 'rows_out' of the step (the rows
+    of the column before and after it), 'cells_changed' and
+    'peak_memory' (peak memory allocated while working on that column
+    above the memory allocated when it started; None when memory is
+    False, for the columns that were not timed on their own and for the
+    columns worked on in other processes).
+
+    Note: counting the changed cells compares the changed columns before
+        and after every step and tracing the memory slows the allocations
+        down, so both can be turned off for lower overhead. When no
+        profiler is active, the cleaner functions only check an empty list.
+        tracemalloc has a single peak per process, so when the columns
+        of a step run in parallel threads the peak of a column also counts
+        the allocations of the columns running at the same time.
+
+    Args:
+        callback: (optional) function called with every record as soon as
+            it is made (Eg: to send it to a metrics client)
+        memory: whether to trace the memory with tracemalloc
+        count_changes: whether to count the changed cells
+    '''
+
+    def __init__(self, callback=None, memory=True, count_changes=True):
+        self.callback = callback
+        self.memory = memory
+        self.count_changes = count_changes
+        self.records = []
+        self._started_tracing = False
+
+    def __enter__(self):
+        import tracemalloc
+
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        _profilers.append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        _profilers.remove(self)
+        if self._started_tracing:
+            import tracemalloc
+
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _emit(self, record):
+        self.records.append(record)
+        if self.callback is not None:
+            self.callback(record)
+
+    def to_dicts(self):
+        '''
+        Returns: list of the records (copies)
+        '''
+        return [dict(record) for record in self.records]
+
+    def to_json_lines(self, path_or_file):
+        '''
+        writes the records as json lines (one json object per line)
+
+        Args:
+            path_or_file: path of the file (overwritten) or a file object
+                opened for writing text
+        '''
+        if isinstance(path_or_file, str):
+            with open(path_or_file, 'w') as f:
+                return self.to_json_lines(f)
+
+        for record in self.records:
+            path_or_file.write(json.dumps(record, default=_to_json) + '\n')
+
+
+def _to_json(value):
+    # numpy scalars and column names that are not strings
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def is_profiling():
+    return bool(_profilers)
+
+
+def profiled(function=None, name=None):
+    '''
+    decorator that records the cost of a function taking a dataframe as
+    first argument (and returning one) in the active profilers, see
+    Profiler. Without any active profiler, the function is called
+    right away.
+
+    Args:
+        name: name of the step (default: the name of the function)
+    '''
+    if function is None:
+        return functools.partial(profiled, name=name)
+
+    step_name = name or function.__name__
+
+    @functools.wraps(function)
+    def wrapper(df, *args, **kwargs):
+        if not _profilers:
+            return function(df, *args, **kwargs)
+        return _run_step(step_name, function, df, args, kwargs)
+    return wrapper
+
+
+class _Frame:
+    def __init__(self, path):
+        self.path = path
+        self.columns = {}
+        self.peak = 0
+
+
+def _run_step(step_name, function, df, args, kwargs):
+    # only imported once a profiler is used
+    import tracemalloc
+
+    profilers = list(_profilers)
+    count_changes = any(profiler.count_changes for profiler in profilers)
+    tracing = tracemalloc.is_tracing()
+
+    frames = _frames()
+    parent = frames[-1] if frames else None
+    frame = _Frame(step_name if parent is None else parent.path + '/' + step_name)
+
+    if tracing:
+        current, peak = tracemalloc.get_traced_memory()
+        if parent is not None:
+            parent.peak = max(parent.peak, peak)
+        tracemalloc.reset_peak()
+        start_memory = current
+
+    old_df = snapshot(df) if count_changes and isinstance(df, pd.DataFrame) else None
+    rows_in = len(df) if isinstance(df, pd.DataFrame) else None
+
+    frames.append(frame)
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    try:
+        result = function(df, *args, **kwargs)
+    finally:
+        wall_time, cpu_time = time.perf_counter() - start_wall, time.process_time() - start_cpu
+        frames.pop()
+
+    peak_memory = None
+    if tracing:
+        frame.peak = max(frame.peak, tracemalloc.get_traced_memory()[1])
+        peak_memory = frame.peak - start_memory
+        if parent is not None:
+            parent.peak = max(parent.peak, frame.peak)
+
+    changed = None
+    if old_df is not None and isinstance(result, pd.DataFrame):
+        changes, _ = column_changes(old_df, result)
+        changed = {col_name: len(positions) for col_name, (positions, _, _) in changes.items()}
+
+    record = {'step': step_name, 'path': frame.path, 'column': None,
+              'wall_time': wall_time, 'cpu_time': cpu_time,
+              'rows_in': rows_in,
+              'rows_out': len(result) if isinstance(result, pd.DataFrame) else None,
+              'cells_changed': None if changed is None else sum(changed.values()),
+              'peak_memory': peak_memory}
+
+    column_records = []
+    for col_name in list(frame.columns) + [col for col in changed or {} if col not in frame.columns]:
+        column_wall, column_cpu, column_peak = frame.columns.get(col_name, (None, None, None))
+        column_records.append({'step': step_name, 'path': frame.path, 'column': col_name,
+                               'wall_time': column_wall, 'cpu_time': column_cpu,
+                               'rows_in': record['rows_in'], 'rows_out': record['rows_out'],
+                               'cells_changed': None if changed is None else changed.get(col_name, 0),
+                               'peak_memory': column_peak})
+
+    for profiler in profilers:
+        count = profiler.count_changes
+        profiler._emit(record if count else dict(record, cells_changed=None))
+        for column_record in column_records:
+            profiler._emit(column_record if count else dict(column_record, cells_changed=None))
+
+    return result
+
+
+def timed_call(function, *args):
+    '''
+    calls function(*args) for the per column work of a step
+
+    Returns: (result, wall time, cpu time of the calling thread, peak
+        memory before the call, peak memory of the call above the memory
+        allocated when it started), both peaks None when tracemalloc is
+        not tracing (Eg: in a worker process)
+    '''
+    import tracemalloc
+
+    peak_before = peak_memory = None
+    if tracemalloc.is_tracing():
+        start_memory, peak_before = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+
+    start_wall, start_cpu = time.perf_counter(), time.thread_time()
+    result = function(*args)
+    wall_time, cpu_time = time.perf_counter() - start_wall, time.thread_time() - start_cpu
+
+    if peak_before is not None:
+        peak_memory = tracemalloc.get_traced_memory()[1] - start_memory
+    return result, wall_time, cpu_time, peak_before, peak_memory
+
+
+def record_columns(names, timings):
+    '''
+    adds the (wall time, cpu time, peak memory before, peak memory) of
+    timed_call() of the columns of the running step
+    '''
+    frames = _frames()
+    if not frames:
+        return
+    frame = frames[-1]
+    for col_name, (wall_time, cpu_time, peak_before, peak_memory) in zip(names, timings):
+        old_wall, old_cpu, old_peak = frame.columns.get(col_name, (0.0, 0.0, None))
+        if peak_memory is not None:
+            # timed_call() reset the peak of the step
+            frame.peak = max(frame.peak, peak_before)
+            old_peak = peak_memory if old_peak is None else max(old_peak, peak_memory)
+        frame.columns[col_name] = (old_wall + wall_time, old_cpu + cpu_time, old_peak)
@@ -0,0 +1,170 @@
+import functools
+import re
+import pandas as pd
+from dfcleaner.stats import HyperLogLog
+
+# patterns matched against the lowercased column names
+NAME_RULES = {
+    'name': r'name\b',
+    'id': r'(\b|[ _])id\b',
+    'timestamp': (r'(\b|_)(timestamp|datetime|ts)\b'
+                  r'|(created|updated|modified|deleted|inserted|loaded)_?(at|on|date|time)\b'),
+    'free_text': r'(\b|_)(description|desc|comments?|notes?|remarks?|text|message|body)\b',
+}
+# rules checked on the values of the columns
+CONTENT_RULES = ['constant', 'near_unique']
+
+# number of rows hashed at once by the near_unique rule
+_UNIQUE_BLOCK_ROWS = 1 << 16
+
+
+class RuleSet:
+    '''
+    rules that spot the columns which are irrelevant for a model
+    (see cleaner.spot_irrelevant_columns())
+
+    name rules: all the patterns are compiled into a single alternation
+        regex (one named group per rule), so a column name is searched
+        once whatever the number of rules, and the results are cached per
+        lowercased name since the same names (id, name, created_at, ...)
+        come back in most tables. When several rules match, the one
+        matching the leftmost position (then the first one given) wins.
+    content rules (only when the values are given):
+        constant: no or a single distinct non-null value (zero variance)
+        near_unique: non-float columns where at least 'unique_ratio' of the
+            non-null values are distinct (Eg: identifiers, emails),
+            counted with a stats.HyperLogLog sketch, block by block, so
+            the scan stops as soon as the column can't reach the ratio
+
+    Args:
+        rules: dictionary with the rule names as keys and regex patterns
+            (matched against the lowercased column names) as values or
+            list of names of NAME_RULES (default: all NAME_RULES)
+        content_rules: list of names of CONTENT_RULES to check
+        unique_ratio: minimum ratio of distinct values of near_unique columns
+        min_rows: columns with less non-null values are never near_unique
+        precision: precision of the HyperLogLog sketches
+    '''
+
+    def __init__(self, rules=None, content_rules=CONTENT_RULES, unique_ratio=0.95, min_rows=100,
+                 precision=12):
+        if rules is None:
+            rules = NAME_RULES
+        if not isinstance(rules, dict):
+            unknown = [rule for rule in rules if rule not in NAME_RULES]
+            if unknown:
+                raise ValueError("'rules' must be a dictionary or a list of rules of {}".format(
+                    list(NAME_RULES)))
+            rules = {rule: NAME_RULES[rule] for rule in rules}
+        if any(rule not in CONTENT_RULES for rule in content_rules):
+            raise ValueError("'content_rules' must be a list of rules of {}".format(CONTENT_RULES))
+
+        self.rules = dict(rules)
+        self.content_rules = list(content_rules)
+        self.unique_ratio = unique_ratio
+        self.min_rows = min_rows
+        self.precision = precision
+
+        self._rule_names = list(self.rules)
+        # the rule names may not be valid group names
+        self._regex = re.compile('|'.join('(?P<rule{}>{})'.format(i, pattern)
+                                          for i, pattern in enumerate(self.rules.values())))
+        self._match = functools.lru_cache(maxsize=1 << 16)(self._match_name)
+
+    def _match_name(self, col_name):
+        if not self.rules:
+            return None
+        match = self._regex.search(col_name)
+        if match is None:
+            return None
+        group = next(group for group, value in match.groupdict().items() if value is not None)
+        return self._rule_names[int(group[len('rule'):])]
+
+    def match(self, col_name):
+        '''
+        Returns: name of the rule the column name matches or None
+        '''
+        return self._match(str(col_name).lower())
+
+    def check(self, df):
+        '''
+        Returns: dictionary with the irrelevant columns as keys and the
+            rule they match as values, in the order of the columns
+
+        Args:
+            df: pandas.DataFrame (name and content rules) or list of
+                column names (name rules only)
+        '''
+        if not isinstance(df, pd.DataFrame):
+            return {col_name: rule for col_name, rule in zip(df, map(self.match, df))
+                    if rule is not None}
+
+        found = {}
+        for i, col_name in enumerate(df.columns):
+            rule = self.match(col_name)
+            if rule is None:
+                rule = self._check_values(df.iloc[:, i])
+            if rule is not None:
+                found[col_name] = rule
+        return found
+
+    def check_catalog(self, catalog):
+        '''
+        checks all the tables of a catalog in a single call; the name
+        rules run once per distinct column name of the whole catalog
+
+        Returns: pandas.DataFrame with a row per irrelevant column and the
+            columns 'table', 'column' and 'rule'
+
+        Args:
+            catalog: dictionary with the table names as keys and, as
+                values, the lists of column names of the tables (schemas)
+                or pandas.DataFrames (to check the content rules too)
+        '''
+        rows = []
+        for table, df in catalog.items():
+            rows.extend((table, col_name, rule) for col_name, rule in self.check(df).items())
+        return pd.DataFrame(rows, columns=['table', 'column', 'rule'])
+
+    def _check_values(self, col):
+        '''
+        Returns: name of the content rule the column matches or None
+        '''
+        if not self.content_rules:
+            return None
+        values = col[col.notna().to_numpy()]
+
+        if 'constant' in self.content_rules and _is_constant(values):
+            return 'constant'
+        if 'near_unique' in self.content_rules and len(values) >= self.min_rows \
+                and not pd.api.types.is_float_dtype(values.dtype) \
+                and not pd.api.types.is_bool_dtype(values.dtype) \
+                and self._is_near_unique(values):
+            return 'near_unique'
+        return None
+
+    def _is_near_unique(self, values):
+        n = len(values)
+        required = self.unique_ratio * n
+        sketch = HyperLogLog(self.precision)
+
+        for start in range(0, n, _UNIQUE_BLOCK_ROWS):
+            sketch.update(values.iloc[start:start + _UNIQUE_BLOCK_ROWS])
+            # even if every remaining value is new, there are not enough
+            # of them (3 standard errors of margin)
+            scanned = min(start + _UNIQUE_BLOCK_ROWS, n)
+            if sketch.count() * (1 + 3 * sketch.relative_error) + n - scanned < required:
+                return False
+        return sketch.count() >= required
+
+
+def _is_constant(values):
+    '''
+    Returns: True if all the (non-null) values are equal
+    '''
+    if len(values) == 0:
+        return True
+    array = values.to_numpy()
+    if array.dtype.kind in 'biuf':
+        return array.min() == array.max()
+    return bool((values == values.iloc[0]).all())
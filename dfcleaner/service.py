@@ -0,0 +1,232 @@
+import asyncio
+import collections
+import time
+import numpy as np
+import pandas as pd
+
+# number of latencies kept for the percentiles of metrics()
+_LATENCY_WINDOW = 10000
+
+
+class BatchCleaner:
+    '''
+    asyncio front end of a fitted estimator.Cleaner for services that
+    clean many small dataframes (Eg: the rows of feature requests).
+
+    The frames given to clean() by concurrent callers are collected into
+    micro-batches: a batch is started as soon as it holds 'max_batch_rows'
+    rows or its oldest frame has waited 'max_latency' seconds. The
+    frames of a batch (with the same columns) are concatenated, cleaned by
+    a single Cleaner.transform() call in an executor, so the event loop is
+    never blocked, and the result is split back out to every caller. Only
+    the fitted statistics are used, nothing is recomputed per batch.
+
+        service = BatchCleaner(Cleaner(...).fit(history), max_latency=0.005)
+        async with service:
+            cleaned = await service.clean(request_df)
+
+    Note: transform() keeps every row (see estimator.Cleaner), so each
+        caller gets exactly its own rows back, with its own index.
+
+    Args:
+        cleaner: fitted estimator.Cleaner
+        max_batch_rows: a batch is started once it has this many rows
+        max_latency: seconds the oldest frame of a batch waits at most
+            before the batch is started (the cleaning itself comes on top)
+        executor: (optional) concurrent.futures executor to run the
+            cleaning in (default: the default executor of the event loop)
+    '''
+
+    def __init__(self, cleaner, max_batch_rows=10000, max_latency=0.005, executor=None):
+        if not cleaner.is_fitted:
+            raise ValueError("the Cleaner is not fitted yet, call fit() first")
+
+        self.cleaner = cleaner
+        self.max_batch_rows = max_batch_rows
+        self.max_latency = max_latency
+        self.executor = executor
+
+        self._pending = collections.deque()
+        self._pending_rows = 0
+        self._wakeup = None
+        self._worker = None
+        self._closing = False
+
+        self._frames = 0
+        self._rows = 0
+        self._batches = 0
+        self._errors = 0
+        self._latencies = collections.deque(maxlen=_LATENCY_WINDOW)
+
+    async def clean(self, df):
+        '''
+        Returns: df cleaned by the fitted Cleaner (as part of a batch)
+        '''
+        if self._closing:
+            raise RuntimeError('this BatchCleaner is closed')
+        loop = asyncio.get_running_loop()
+        if self._worker is None:
+            self._wakeup = asyncio.Event()
+            self._worker = loop.create_task(self._run())
+
+        future = loop.create_future()
+        self._pending.append((df, future, loop.time()))
+        self._pending_rows += len(df)
+        self._wakeup.set()
+        return await future
+
+    async def close(self):
+        '''
+        cleans the frames already submitted and stops the batching task
+        '''
+        self._closing = True
+        if self._worker is not None:
+            self._wakeup.set()
+            await self._worker
+            self._worker = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def metrics(self):
+        '''
+        Returns: dictionary with
+            queue_depth: number of frames waiting for a batch
+            frames, rows, batches: number of frames, rows and batches
+                cleaned so far
+            errors: number of frames whose cleaning raised an error
+                (given to their caller)
+            mean_batch_frames: mean number of frames per batch
+            latency_mean, latency_p50, latency_p99, latency_max: seconds
+                between clean() and its result (last 10000 frames)
+        '''
+        latencies = np.array(self._latencies, dtype=np.float64)
+        has_latencies = len(latencies) > 0
+        return {
+            'queue_depth': len(self._pending),
+            'frames': self._frames,
+            'rows': self._rows,
+            'batches': self._batches,
+            'errors': self._errors,
+            'mean_batch_frames': self._frames / self._batches if self._batches else np.nan,
+            'latency_mean': float(latencies.mean()) if has_latencies else np.nan,
+            'latency_p50': float(np.quantile(latencies, 0.5)) if has_latencies else np.nan,
+            'latency_p99': float(np.quantile(latencies, 0.99)) if has_latencies else np.nan,
+            'latency_max': float(latencies.max()) if has_latencies else np.nan,
+        }
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while self._pending or not self._closing:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            # wait for more frames until the batch is full or the oldest
+            # frame is out of time
+            deadline = self._pending[0][2] + self.max_latency
+            while self._pending_rows < self.max_batch_rows and not self._closing:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            batch = [self._pending.popleft()]
+            batch_rows = len(batch[0][0])
+            while self._pending and batch_rows + len(self._pending[0][0]) <= self.max_batch_rows:
+                batch.append(self._pending.popleft())
+                batch_rows += len(batch[-1][0])
+            self._pending_rows -= batch_rows
+
+            try:
+                await self._clean_batch(loop, batch)
+            except Exception as error:
+                # never let a batch stop the worker, the other callers
+                # would wait forever
+                for _, future, _ in batch:
+                    if not future.done():
+                        self._errors += 1
+                        future.set_exception(error)
+
+    async def _clean_batch(self, loop, batch):
+        # frames with other columns can't be concatenated with each other
+        groups = collections.defaultdict(list)
+        for item in batch:
+            groups[tuple(item[0].columns)].append(item)
+
+        work = list(groups.values())
+        while work:
+            items = work.pop()
+            try:
+                cleaned = await loop.run_in_executor(self.executor, _transform, self.cleaner,
+                                                     [df for df, _, _ in items])
+            except Exception as error:
+                if len(items) > 1:
+                    # the halves are cleaned again (down to single frames)
+                    # so only the callers with bad frames get the error
+                    work.extend([items[:len(items) // 2], items[len(items) // 2:]])
+                elif not items[0][1].done():
+                    self._errors += 1
+                    items[0][1].set_exception(error)
+                continue
+
+            now = loop.time()
+            for (df, future, submitted), cleaned_df in zip(items, cleaned):
+                # the caller may have been cancelled meanwhile
+                if future.done():
+                    continue
+                future.set_result(cleaned_df)
+                self._latencies.append(now - submitted)
+                self._frames += 1
+                self._rows += len(df)
+        self._batches += 1
+
+
+def _transform(cleaner, frames):
+    '''
+    Returns: list of the cleaned frames, cleaned with a single
+        cleaner.transform() call
+    '''
+    if len(frames) == 1:
+        return [cleaner.transform(frames[0])]
+
+    cleaned = cleaner.transform(pd.concat(frames))
+    bounds = np.cumsum([0] + [len(df) for df in frames])
+    return [cleaned.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+async def generate_load(service, frames, concurrency=64, interval=0.0):
+    '''
+    local in-process load generator: 'concurrency' simulated clients
+    send the frames to service.clean() one after the other, each
+    waiting 'interval' seconds between its requests
+
+    Returns: (results, seconds) where results holds the cleaned frames
+        in the order of 'frames' and seconds is the wall time of the run
+
+    Args:
+        service: BatchCleaner
+        frames: list of pandas.DataFrame
+        concurrency: number of concurrent clients
+        interval: seconds a client waits between two requests
+    '''
+    results = [None] * len(frames)
+    next_frame = iter(range(len(frames)))
+
+    async def client():
+        for i in next_frame:
+            results[i] = await service.clean(frames[i])
+            if interval:
+                await asyncio.sleep(interval)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    return results, time.perf_counter() - start
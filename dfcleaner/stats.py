@@ -0,0 +1,511 @@
+import warnings
+import numpy as np
+import pandas as pd
+from dfcleaner.dedup import column_hash
+
+# size of the blocks column_stats() works on (8MB of float64 at most)
+_BLOCK_ROWS = 1 << 15
+_BLOCK_COLS = 32
+
+
+class Moments:
+    '''
+    running count, mean, sum of squared deviations from the mean (M2),
+    min and max of a numeric column.
+
+    Moments of different chunks (or partitions) of a column can be
+    merged together with merge() to get the moments of the whole column
+    without ever holding the whole column in memory.
+
+    Note: mean and std of a single chunk are computed exactly like
+        pandas does it, the merged values may differ from the pandas
+        values of the whole column in the last few bits.
+    '''
+
+    def __init__(self, count=0, mean=np.nan, m2=np.nan, minimum=np.nan, maximum=np.nan):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = minimum
+        self.max = maximum
+
+    @classmethod
+    def from_array(cls, values):
+        '''
+        computes the moments of the given values (nan values are skipped)
+
+        Args:
+            values: 1-D numpy array
+        '''
+        return column_stats([values]).to_moments()[0]
+
+    def merge(self, other):
+        '''
+        merges the moments of another chunk into this one
+        (Chan et al. parallel algorithm)
+
+        Returns: self
+        '''
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return self
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+
+        self.mean = self.mean + delta * other.count / count
+        self.m2 = self.m2 + other.m2 + delta ** 2 * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+        return self
+
+    @property
+    def var(self):
+        ''' sample variance (ddof=1) like pandas.Series.var() '''
+        if self.count < 2:
+            return np.nan
+        return self.m2 / (self.count - 1)
+
+    @property
+    def std(self):
+        ''' sample standard deviation (ddof=1) like pandas.Series.std() '''
+        return np.sqrt(self.var)
+
+
+class Reservoir:
+    '''
+    fixed size uniform random sample of the values of a column
+    that arrive chunk by chunk (reservoir sampling, algorithm R).
+
+    As long as the number of values seen is smaller than the size of
+    the reservoir, it just holds all of them in their original order.
+
+    Args:
+        size: maximum number of values to keep
+        seed: seed of the random number generator
+    '''
+
+    def __init__(self, size, seed=None):
+        self.size = size
+        self.seen = 0
+        self._values = np.empty(0, dtype=np.float64)
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        '''
+        Args:
+            values: 1-D numpy array of new values (nan values are skipped)
+        '''
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+
+        n_free = max(self.size - len(self._values), 0)
+        if n_free > 0:
+            self._values = np.concatenate([self._values, values[:n_free]])
+            self.seen += min(n_free, len(values))
+            values = values[n_free:]
+
+        if len(values) == 0:
+            return
+
+        # the i-th value seen replaces a random slot with probability size/i
+        positions = self.seen + np.arange(len(values))
+        slots = (self._rng.random(len(values)) * (positions + 1)).astype(np.int64)
+        replace = slots < self.size
+
+        # when a slot is drawn more than once the latest value wins
+        slots, values = slots[replace][::-1], values[replace][::-1]
+        slots, first = np.unique(slots, return_index=True)
+        self._values[slots] = values[first]
+
+        self.seen += len(positions)
+
+    @property
+    def values(self):
+        return self._values
+
+
+class QuantileSketch:
+    '''
+    mergeable approximate quantile sketch of a numeric column
+    (KLL sketch, Karnin, Lang and Liberty 2016).
+
+    The values are kept in a few levels of sorted buffers where every
+    item of level h stands for 2**h values. When the buffers get full,
+    a level is compacted by keeping every other item (randomly the odd
+    or the even ones) on the next level. The memory used is about
+    3 * k items, whatever the number of values, and sketches of
+    different chunks or partitions can be merged with merge().
+
+    As long as nothing has been compacted (less than about k values),
+    the quantiles are exact.
+
+    Args:
+        error: rank error of the quantiles; the rank of the returned
+            value is within (q +/- error) * count with high probability
+            Eg: 0.01 (k = 165 items per level)
+        seed: seed of the random compactions
+    '''
+
+    def __init__(self, error=0.01, seed=0):
+        self.error = error
+        self.k = max(int(np.ceil(1.65 / error)), 8)
+        self.count = 0
+        self._levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, values):
+        '''
+        Args:
+            values: 1-D numpy array of new values (nan values are skipped)
+        '''
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+
+        self._levels[0] = np.concatenate([self._levels[0], values])
+        self.count += len(values)
+        self._compress()
+
+    def merge(self, other):
+        '''
+        merges the sketch of another chunk into this one
+
+        Returns: self
+        '''
+        while len(self._levels) < len(other._levels):
+            self._levels.append(np.empty(0))
+        for level, items in enumerate(other._levels):
+            self._levels[level] = np.concatenate([self._levels[level], items])
+
+        self.count += other.count
+        self._compress()
+        return self
+
+    def _capacity(self, level):
+        depth = len(self._levels) - level - 1
+        return max(int(np.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _compress(self):
+        while sum(map(len, self._levels)) > sum(map(self._capacity, range(len(self._levels)))):
+            level = next(level for level, items in enumerate(self._levels)
+                         if len(items) >= self._capacity(level))
+            if level + 1 == len(self._levels):
+                self._levels.append(np.empty(0))
+
+            items = np.sort(self._levels[level])
+            # an odd item out stays on this level
+            leftover = items[len(items) - len(items) % 2:]
+            items = items[:len(items) - len(items) % 2]
+
+            offset = self._rng.integers(2)
+            self._levels[level + 1] = np.concatenate([self._levels[level + 1], items[offset::2]])
+            self._levels[level] = leftover
+
+    def items(self):
+        '''
+        Returns: (items, weights) numpy arrays sorted by item; every item
+            stands for 'weight' values of the column
+        '''
+        items = np.concatenate(self._levels)
+        weights = np.concatenate([np.full(len(level_items), 2 ** level, dtype=np.int64)
+                                  for level, level_items in enumerate(self._levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], weights[order]
+
+    def quantile(self, q):
+        '''
+        Returns: approximate q-th quantile (nan if the sketch is empty)
+        '''
+        return weighted_quantile(*self.items(), q)
+
+    def state(self):
+        '''
+        Returns: (params, items, level_sizes) where params is a json
+            serializable dictionary (error, count and the state of the
+            random generator) and items holds the items of all the levels
+            one after the other, see from_state()
+        '''
+        params = {'error': self.error, 'count': self.count,
+                  'rng': self._rng.bit_generator.state}
+        level_sizes = np.array([len(items) for items in self._levels], dtype=np.int64)
+        return params, np.concatenate(self._levels), level_sizes
+
+    @classmethod
+    def from_state(cls, params, items, level_sizes):
+        '''
+        Returns: QuantileSketch rebuilt from the output of state(), which
+            goes on exactly like the saved one
+        '''
+        sketch = cls(params['error'])
+        sketch.count = params['count']
+        sketch._rng.bit_generator.state = params['rng']
+        sketch._levels = np.split(np.asarray(items, dtype=np.float64), np.cumsum(level_sizes)[:-1])
+        return sketch
+
+
+class HyperLogLog:
+    '''
+    mergeable approximate count of the distinct values of a column
+    (HyperLogLog, Flajolet et al. 2007, with linear counting for the
+    small counts).
+
+    Every value is hashed to 64 bits (like dedup.row_fingerprints(),
+    so 1 and 1.0 are the same value and all the missing values count
+    as a single one), the first 'precision' bits pick one of the
+    2**precision registers and the register keeps the longest run of
+    leading zeros seen in the other bits. The memory used is
+    2**precision bytes whatever the number of values, and the sketches
+    of different chunks or partitions can be merged with merge().
+
+    The relative error of count() is about 1.04 / sqrt(2**precision)
+    (1.6% for the default precision), small counts are nearly exact.
+
+    Args:
+        precision: number of bits of the register index (4 to 16)
+    '''
+
+    def __init__(self, precision=12):
+        if not 4 <= precision <= 16:
+            raise ValueError("'precision' parameter must be between 4 and 16")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    @property
+    def relative_error(self):
+        return 1.04 / np.sqrt(len(self.registers))
+
+    def update(self, values):
+        '''
+        Args:
+            values: 1-D numpy array or pandas.Series of new values
+        '''
+        if not isinstance(values, pd.Series):
+            values = pd.Series(values, copy=False)
+        self.update_hashes(column_hash(values))
+
+    def update_hashes(self, hashes):
+        '''
+        Args:
+            hashes: numpy uint64 array of already hashed values
+        '''
+        if len(hashes) == 0:
+            return
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.intp)
+        np.maximum.at(self.registers, index, _ranks(hashes, 64 - self.precision))
+
+    def merge(self, other):
+        '''
+        merges the sketch of another chunk into this one
+
+        Returns: self
+        '''
+        if other.precision != self.precision:
+            raise ValueError("can't merge sketches with different precisions")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        '''
+        Returns: approximate number of distinct values (float)
+        '''
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.ldexp(1.0, -self.registers.astype(np.int64)).sum()
+
+        n_zeros = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * m and n_zeros > 0:
+            return m * np.log(m / n_zeros)
+        return estimate
+
+
+def _ranks(hashes, n_bits):
+    '''
+    position of the first 1 bit (1 + number of leading zeros) in the
+    last n_bits bits of every hash, n_bits + 1 if they are all 0.
+
+    At most 53 bits are looked at so they convert to float exactly and
+    frexp() gives their bit length (more leading zeros would take more
+    than 2**53 distinct values to matter).
+    '''
+    n_used = min(n_bits, 53)
+    bits = (hashes >> np.uint64(n_bits - n_used)) & np.uint64((1 << n_used) - 1)
+    _, bit_length = np.frexp(bits.astype(np.float64))
+    return (n_used + 1 - bit_length).astype(np.uint8)
+
+
+def weighted_quantile(items, weights, q):
+    '''
+    q-th quantile of items where every item stands for 'weight' values.
+
+    When all the weights are 1, this is exactly np.quantile()
+    (and np.median() for q=0.5, like pandas.Series.median()).
+
+    Returns: the quantile (nan if there are no items)
+
+    Args:
+        items: sorted numpy array
+        weights: numpy array of the weights of the items
+        q: quantile between 0 and 1
+    '''
+    if len(items) == 0:
+        return np.nan
+    if (weights == 1).all():
+        return np.median(items) if q == 0.5 else np.quantile(items, q)
+
+    cumulative_weights = np.cumsum(weights)
+    position = np.searchsorted(cumulative_weights, q * cumulative_weights[-1])
+    return items[min(position, len(items) - 1)]
+
+
+class ColumnStats:
+    '''
+    statistics of several columns computed by column_stats().
+    Every attribute is a numpy array with one value per column and
+    'quantiles' is a dictionary with the quantile as key.
+    '''
+
+    def __init__(self, count, mean, m2, minimum, maximum, quantiles=None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = minimum
+        self.max = maximum
+        self.quantiles = quantiles if quantiles is not None else {}
+
+    @property
+    def var(self):
+        ''' sample variance (ddof=1) like pandas.DataFrame.var() '''
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(self.count < 2, np.nan, self.m2 / (self.count - 1))
+
+    @property
+    def std(self):
+        ''' sample standard deviation (ddof=1) like pandas.DataFrame.std() '''
+        return np.sqrt(self.var)
+
+    @property
+    def median(self):
+        return self.quantiles[0.5]
+
+    def to_moments(self):
+        '''
+        Returns: list of Moments objects, one per column
+        '''
+        return [Moments(*args) if args[0] > 0 else Moments()
+                for args in zip(self.count.tolist(), self.mean.tolist(), self.m2.tolist(),
+                                self.min.tolist(), self.max.tolist())]
+
+
+def column_stats(columns, quantiles=None, block_rows=_BLOCK_ROWS):
+    '''
+    computes the count, mean, M2 (sum of squared deviations from the
+    mean), min and max of all the given columns at once, skipping the
+    nan values.
+
+    The columns are walked over only once, in blocks of a fixed number
+    of rows and (at most) _BLOCK_COLS columns that fit in the cpu cache.
+    The statistics of every block are computed for all its columns
+    together with vectorized numpy operations and merged into the
+    running ones (Chan et al. parallel algorithm).
+    Since the rows are always split the same way, the statistics of
+    a column don't depend on the other columns it is computed with
+    (Eg: serial and parallel runs give exactly the same results).
+
+    Note: when all the rows fit in a single block, mean and std are
+        exactly the ones pandas computes. Otherwise the merged values
+        may differ from the pandas values in the last few bits.
+
+    Quantiles can't be merged like that, they are computed per column
+    with numpy (0.5 with np.nanmedian() like pandas.Series.median()).
+
+    Returns: ColumnStats object
+
+    Args:
+        columns: 2-D numpy array (rows x columns) or a list of 1-D
+            arrays (Eg: the columns of a dataframe)
+        quantiles: (optional) list of quantiles to compute Eg: [0.5]
+        block_rows: number of rows per block
+    '''
+    if isinstance(columns, np.ndarray) and columns.ndim == 2:
+        columns = list(columns.T)
+    columns = [np.asarray(col) for col in columns]
+
+    group_stats = [_block_stats(columns[start:start + _BLOCK_COLS], block_rows)
+                   for start in range(0, len(columns), _BLOCK_COLS)]
+    if group_stats:
+        count, mean, m2, minimum, maximum = map(np.concatenate, zip(*group_stats))
+    else:
+        count = np.zeros(0, dtype=np.int64)
+        mean, m2, minimum, maximum = (np.zeros(0) for _ in range(4))
+
+    computed_quantiles = {}
+    with warnings.catch_warnings():
+        # all nan columns just give nan
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for q in quantiles or []:
+            if q == 0.5:
+                computed_quantiles[q] = np.array([np.nanmedian(col) for col in columns])
+            else:
+                computed_quantiles[q] = np.array([np.nanquantile(col, q) for col in columns])
+
+    return ColumnStats(count, mean, m2, minimum, maximum, computed_quantiles)
+
+
+def _block_stats(columns, block_rows):
+    '''
+    statistics of a group of columns for column_stats()
+
+    Returns: (count, mean, m2, min, max) numpy arrays
+    '''
+    n_cols = len(columns)
+    n_rows = len(columns[0])
+
+    count = np.zeros(n_cols, dtype=np.int64)
+    mean = np.full(n_cols, np.nan)
+    m2 = np.full(n_cols, np.nan)
+    minimum = np.full(n_cols, np.inf)
+    maximum = np.full(n_cols, -np.inf)
+
+    # fortran order keeps every column of a block contiguous, so that
+    # the sums along the rows are the same (pairwise) sums as pandas'
+    block = np.empty((min(block_rows, n_rows), n_cols), dtype=np.float64, order='F')
+
+    for start in range(0, n_rows, block_rows):
+        stop = min(start + block_rows, n_rows)
+        values = block[:stop - start]
+        for j, col in enumerate(columns):
+            values[:, j] = col[start:stop]
+
+        is_nan = np.isnan(values)
+        block_count = len(values) - is_nan.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            block_mean = np.where(is_nan, 0.0, values).sum(axis=0) / block_count
+        deviations = block_mean - values
+        deviations[is_nan] = 0.0
+        block_m2 = (deviations ** 2).sum(axis=0)
+
+        minimum = np.fmin(minimum, np.where(is_nan, np.inf, values).min(axis=0))
+        maximum = np.fmax(maximum, np.where(is_nan, -np.inf, values).max(axis=0))
+
+        total = count + block_count
+        with np.errstate(divide='ignore', invalid='ignore'):
+            delta = block_mean - mean
+            merged_mean = mean + delta * block_count / total
+            merged_m2 = m2 + block_m2 + delta ** 2 * count * block_count / total
+
+        mean = np.where(count == 0, block_mean, np.where(block_count == 0, mean, merged_mean))
+        m2 = np.where(count == 0, block_m2, np.where(block_count == 0, m2, merged_m2))
+        count = total
+
+    is_empty = count == 0
+    mean[is_empty] = np.nan
+    m2[is_empty] = np.nan
+    minimum[is_empty] = np.nan
+    maximum[is_empty] = np.nan
+
+    return count, mean, m2, minimum, maximum
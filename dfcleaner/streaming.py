@@ -0,0 +1,228 @@
+import os
+import numpy as np
+import pandas as pd
+from dfcleaner.cleaner import change_dtypes, remove_outliers, fill_nan, _outlier_mask, FILL_NA_METHODS
+from dfcleaner.stats import Moments, Reservoir, QuantileSketch, column_stats, weighted_quantile
+from dfcleaner.dedup import Deduplicator
+
+
+def preprocess_file(input_path, output_path, column_dtype_conversion_dictionary={}, std_coeff=1.5,
+                    fill_na_method='median', label_col=None, chunksize=100000, sample_size=100000, seed=0,
+                    quantile_error=0.01, deduplicator=None):
+    '''
+    streaming version of cleaner.preprocess() for csv or parquet
+    files that don't fit in memory. The file is read in chunks twice
+        - first pass: changes the dtypes of each chunk, finds the
+            duplicate rows (and the rows where the label column is null)
+            and collects the statistics of the remaining rows of every
+            numeric column (count, mean, std, min, max and a random
+            sample of at most 'sample_size' values, or a quantile sketch
+            with fill_na_method='approx_median')
+        - second pass: changes the dtypes of each chunk again, drops the
+            rows found in the first pass, removes the outliers, fills the
+            nan values using the statistics of the whole file and appends
+            the cleaned chunk to the output file
+
+    Only one chunk is held in memory at any time. Apart from that, the
+    memory used grows with the number of rows only through the duplicate
+    detection (one 64 bit fingerprint per distinct row, unless the
+    'deduplicator' spills them to disk or is a Bloom filter, and one bit
+    per row for the rows to keep) and stays bounded per column
+    ('sample_size' values).
+
+    Note: the outlier bounds are computed from the exact mean and std of
+        every column. The 'mean' and 'median' fill values are computed from
+        the random sample, which means they are exact as long as the column
+        has at most 'sample_size' values and approximate otherwise.
+        The 'approx_median' fill values come from a stats.QuantileSketch
+        and their rank error is bounded by 'quantile_error'.
+        The index is not written to the output file.
+
+    Returns: dictionary with the number of rows read, written and
+        removed as duplicates
+
+    Args:
+        input_path: path of a .csv or .parquet file
+        output_path: path of the .csv or .parquet file to write the
+            cleaned data into (it is overwritten if it already exists)
+        column_dtype_conversion_dictionary, std_coeff, fill_na_method,
+            label_col: same as in cleaner.preprocess()
+        chunksize: number of rows to read at once
+        sample_size: maximum number of values per column used to
+            compute the fill values
+        seed: seed of the random sampling
+        quantile_error: rank error of the 'approx_median' fill_na_method
+        deduplicator: (optional) dedup.Deduplicator to detect the duplicate
+            rows with (Eg: with bounded memory). Sharing one between calls
+            also removes the rows already seen in the previous files
+    '''
+    if fill_na_method not in FILL_NA_METHODS:
+        raise ValueError("'fill_na_method' parameter must be one of {}".format(FILL_NA_METHODS))
+
+    # first pass
+    if deduplicator is None:
+        deduplicator = Deduplicator()
+    removed_before = deduplicator.removed
+    rows_to_keep = []
+    moments = {}
+    samples = {}
+    float_cols = set()
+    non_numeric_cols = set()
+    rows_read = 0
+
+    for chunk in _read_chunks(input_path, chunksize):
+        chunk = change_dtypes(chunk, column_dtype_conversion_dictionary, inplace=True)
+        rows_read += len(chunk)
+
+        keep = deduplicator.first_occurrences(chunk)
+        if label_col is not None:
+            keep &= chunk[label_col].notna().to_numpy()
+        rows_to_keep.append(np.packbits(keep))
+
+        chunk_numeric_cols = []
+        for col_name in chunk.columns:
+            if chunk[col_name].dtype not in [int, float]:
+                non_numeric_cols.add(col_name)
+                continue
+            if chunk[col_name].dtype == float:
+                float_cols.add(col_name)
+            chunk_numeric_cols.append(col_name)
+
+        columns = [chunk[col_name].to_numpy()[keep] for col_name in chunk_numeric_cols]
+        chunk_moments = column_stats(columns).to_moments()
+
+        for col_name, values, col_moments in zip(chunk_numeric_cols, columns, chunk_moments):
+            moments.setdefault(col_name, Moments()).merge(col_moments)
+            if col_name not in samples:
+                samples[col_name] = (QuantileSketch(quantile_error, seed)
+                                     if fill_na_method == 'approx_median'
+                                     else Reservoir(sample_size, seed))
+            samples[col_name].update(values)
+
+    numeric_cols = [col for col in moments if col not in non_numeric_cols]
+
+    outlier_cols = [col for col in numeric_cols if col != label_col]
+    outlier_moments = {col: (moments[col].mean, moments[col].std)
+                       for col in outlier_cols}
+
+    fill_values = {}
+    for col_name in numeric_cols:
+        if fill_na_method == 'approx_median':
+            sample, weights = samples[col_name].items()
+        else:
+            sample = samples[col_name].values
+            weights = np.ones(len(sample), dtype=np.int64)
+
+        if col_name in outlier_moments:
+            mean, std = outlier_moments[col_name]
+            is_outlier = _outlier_mask(sample, mean, std, std_coeff)
+            sample, weights = sample[~is_outlier], weights[~is_outlier]
+
+            # the column has outliers => they are replaced with nan
+            # and the whole column becomes float
+            extremes = np.array([moments[col_name].min, moments[col_name].max])
+            if _outlier_mask(extremes, mean, std, std_coeff).any():
+                float_cols.add(col_name)
+
+        if len(sample) == 0:
+            fill_values[col_name] = np.nan
+        elif fill_na_method == 'mean':
+            fill_values[col_name] = np.mean(sample)
+        else:
+            order = np.argsort(sample, kind='stable')
+            fill_values[col_name] = weighted_quantile(sample[order], weights[order], 0.5)
+
+    # second pass
+    rows_written = 0
+    with _ChunkWriter(output_path) as writer:
+        chunks = _read_chunks(input_path, chunksize)
+        for chunk, packed_keep in zip(chunks, rows_to_keep):
+            chunk = change_dtypes(chunk, column_dtype_conversion_dictionary, inplace=True)
+            keep = np.unpackbits(packed_keep, count=len(chunk)).astype(bool)
+            chunk = chunk[keep]
+
+            # give every chunk the dtypes the whole file would have
+            for col_name in float_cols.intersection(numeric_cols):
+                chunk[col_name] = chunk[col_name].astype(float)
+            for col_name in non_numeric_cols:
+                if chunk[col_name].dtype in [int, float]:
+                    chunk[col_name] = chunk[col_name].astype(object)
+
+            chunk = remove_outliers(chunk, std_coeff, label_col=label_col,
+                                    moments=outlier_moments, inplace=True)
+            chunk = fill_nan(chunk, fill_na_method, label_col=label_col,
+                             fill_values=fill_values, inplace=True)
+
+            writer.write(chunk)
+            rows_written += len(chunk)
+
+    return {'rows_read': rows_read, 'rows_written': rows_written,
+            'duplicates_removed': deduplicator.removed - removed_before}
+
+
+def _file_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ['.parquet', '.pq']:
+        return 'parquet'
+    raise ValueError("only .csv and .parquet files are supported, got '{}'".format(path))
+
+
+def _import_parquet():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("pyarrow is required to read and write parquet files "
+                          "(pip install pyarrow)")
+    return pq
+
+
+def _read_chunks(path, chunksize):
+    '''
+    yields the rows of a csv or parquet file as pandas.DataFrame chunks
+    '''
+    if _file_format(path) == 'csv':
+        yield from pd.read_csv(path, chunksize=chunksize)
+    else:
+        pq = _import_parquet()
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+
+
+class _ChunkWriter:
+    '''
+    appends pandas.DataFrame chunks to a csv or parquet file
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.format = _file_format(path)
+        self._parquet_writer = None
+        self._schema = None
+        self._header = True
+
+    def write(self, chunk):
+        if self.format == 'csv':
+            chunk.to_csv(self.path, mode='w' if self._header else 'a',
+                         header=self._header, index=False)
+            self._header = False
+            return
+
+        import pyarrow as pa
+        pq = _import_parquet()
+        if self._parquet_writer is None:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            self._schema = table.schema
+            self._parquet_writer = pq.ParquetWriter(self.path, self._schema)
+        else:
+            table = pa.Table.from_pandas(chunk, schema=self._schema,
+                                         preserve_index=False)
+        self._parquet_writer.write_table(table)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
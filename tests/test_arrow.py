@@ -0,0 +1,77 @@
+import unittest
+from unittest import mock
+import pandas as pd
+import numpy as np
+from dfcleaner import arrow, cleaner
+from dfcleaner.cleaner import sanitize, change_dtypes, _filter_characters_vectorized
+
+
+class TestArrow(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = cleaner.STRING_ENGINE
+
+    def tearDown(self):
+        cleaner.STRING_ENGINE = self.engine
+
+    def _both_engines(self, function, *args):
+        results = []
+        for engine in ['python', 'arrow']:
+            cleaner.STRING_ENGINE = engine
+            try:
+                results.append(function(*args))
+            except ValueError as error:
+                results.append(str(error))
+        return results
+
+    def test_filter_characters(self):
+        strings = ['$ 5,000.00', '?', None, '12', '5.', '.5', '007', '', '1' * 30,
+                   '$29,347.32', '1.2.3', '.']
+        for values in [strings[:-2], strings[:-1], strings]:
+            for dtype in [object, 'str']:
+                # sliced, with a non default index
+                col = pd.Series(['x'] + values, dtype=dtype, index=np.arange(len(values) + 1) * 3)[1:]
+                for target in [float, int]:
+                    python, arrow_result = self._both_engines(_filter_characters_vectorized, target, col)
+                    if isinstance(python, str):
+                        self.assertEqual(arrow_result, python)
+                    else:
+                        pd.testing.assert_series_equal(arrow_result, python)
+
+        # what only the python version handles
+        self.assertIsNone(arrow.filter_characters(float, pd.Series(['٣4', '5'])))
+        self.assertIsNone(arrow.filter_characters(float, pd.Series(['12', -6])))
+        self.assertIsNone(arrow.filter_characters(float, pd.Series(['12', None], dtype=object)))
+        self.assertIsNone(arrow.filter_characters(float, pd.Series(['1.2.3'])))
+
+        chunked = pd.concat([pd.Series(['$ 1', 'a']), pd.Series(['2.5'])], ignore_index=True)
+        pd.testing.assert_series_equal(arrow.filter_characters(float, chunked),
+                                       pd.Series([1.0, np.nan, 2.5]))
+
+        # several blocks of rows, missing values in the last one only
+        with mock.patch('dfcleaner.arrow._BLOCK_ROWS', 4):
+            col = pd.Series(['$ 1', '22', '3x', '4', '5', '6', '7', '8', '9', None], dtype='str')
+            python, arrow_result = self._both_engines(_filter_characters_vectorized, int, col)
+            pd.testing.assert_series_equal(arrow_result, python)
+            python, arrow_result = self._both_engines(_filter_characters_vectorized, float, col[:-1])
+            pd.testing.assert_series_equal(arrow_result, python)
+            self.assertIsNone(arrow.filter_characters(float, pd.Series(['1', '2', '3', '4', '5', '٣'])))
+
+        cleaner.STRING_ENGINE = 'arrow'
+        df = change_dtypes(pd.DataFrame({'price': ['$ 1,000', '$ 20']}), {'price': int})
+        self.assertEqual(df['price'].tolist(), [1000, 20])
+        self.assertEqual(df['price'].dtype, np.int64)
+
+    def test_sanitize(self):
+        names = pd.Series(['Hello  World!', 'getHTTPResponse', '  A__b ', 'Été Ça va?',
+                           'fooBar_Baz', 'RightClick', '%%'] * 10)
+        python, arrow_result = self._both_engines(sanitize, names)
+        self.assertListEqual(arrow_result, python)
+        self.assertEqual(python[:3], ['hello_world', 'get_http_response', 'a_b'])
+
+    def test_engine(self):
+        cleaner.STRING_ENGINE = 'rust'
+        with self.assertRaises(ValueError):
+            sanitize(pd.Series(['a']))
+        self.assertFalse(arrow.use_arrow('python'))
+        self.assertTrue(arrow.use_arrow('auto'))
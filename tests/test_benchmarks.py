@@ -0,0 +1,24 @@
+import unittest
+import numpy as np
+from benchmarks.data import make_dirty_frame
+from benchmarks.suite import measure, compare
+
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_make_dirty_frame(self):
+        df, conversion_dictionary = make_dirty_frame(1000, duplicate_ratio=0.1)
+        self.assertEqual(len(df), 1000)
+        self.assertEqual(len(df.drop_duplicates()), 900)
+        self.assertTrue(set(conversion_dictionary) <= set(df.columns))
+
+    def test_measure_and_compare(self):
+        metrics = measure(lambda: np.ones(1 << 20), repeat=1)
+        self.assertGreaterEqual(metrics['peak_memory'], 8 << 20)
+
+        baseline = {'case': {'time': 1.0, 'peak_memory': 100}}
+        self.assertEqual(compare({'case': {'time': 1.2, 'peak_memory': 105}}, baseline), [])
+        self.assertEqual(compare({'case': {'time': 2.0, 'peak_memory': 200}}, baseline),
+                         [('case', 'time', 1.0, 2.0), ('case', 'peak_memory', 100, 200)])
+        # new cases are not compared
+        self.assertEqual(compare({'other': {'time': 2.0, 'peak_memory': 200}}, baseline), [])
@@ -0,0 +1,122 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import pandas as pd
+import numpy as np
+from dfcleaner.cache import PreprocessCache
+from dfcleaner.cleaner import preprocess
+
+
+def _is_memory_mapped(array):
+    while array is not None:
+        if isinstance(array, np.memmap):
+            return True
+        array = array.base
+    return False
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.df = pd.DataFrame({
+            'a': rng.normal(0, 1, 200).round(2),
+            'b': rng.integers(0, 10, 200),
+            'name': rng.choice(['x', 'y', 'z'], 200),
+            'label': rng.integers(0, 2, 200).astype(float),
+        })
+        self.df.iloc[::17, 0] = np.nan
+        self.df.iloc[5, 0] = 40
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_hit(self):
+        cache = PreprocessCache(self.tmp_dir)
+        expected = preprocess(self.df, {'b': float}, label_col='label')
+        first = cache.preprocess(self.df, {'b': float}, label_col='label')
+        cached = cache.preprocess(self.df.copy(), {'b': float}, label_col='label', n_jobs=2)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        pd.testing.assert_frame_equal(first, expected)
+        pd.testing.assert_frame_equal(cached, expected)
+
+        # numeric columns are memory mapped, copy on write
+        self.assertTrue(_is_memory_mapped(cached['a'].to_numpy()))
+        cached.loc[cached.index[0], 'a'] = -1.0
+        pd.testing.assert_frame_equal(cache.preprocess(self.df, {'b': float}, label_col='label'), expected)
+
+        # an index and categories go through Arrow
+        df = pd.DataFrame({'c': pd.Categorical(['u', 'v', 'u']), 'd': [1.5, None, 2.5]},
+                          index=pd.Index(['p', 'q', 'r'], name='key'))
+        cache.put('custom', df)
+        pd.testing.assert_frame_equal(cache.get('custom'), df)
+        self.assertIsNone(cache.get('missing'))
+
+    def test_key(self):
+        cache = PreprocessCache(self.tmp_dir)
+        key = cache.key(self.df, {'a': float, 'b': int})
+        self.assertEqual(key, cache.key(self.df.copy(), {'b': int, 'a': float}, n_jobs=2))
+        self.assertNotEqual(key, cache.key(self.df, {'a': float, 'b': float}))
+        self.assertNotEqual(key, cache.key(self.df, {'a': float, 'b': int}, std_coeff=2))
+
+        changed = self.df.copy()
+        changed.iloc[10, 1] += 1
+        self.assertNotEqual(key, cache.key(changed, {'a': float, 'b': int}))
+        self.assertNotEqual(key, cache.key(self.df.set_axis(self.df.index + 1), {'a': float, 'b': int}))
+        self.assertNotEqual(key, cache.key(self.df.rename(columns={'b': 'c'}), {'a': float, 'b': int}))
+
+        # a hit couldn't change df like a miss does, on both paths df is left untouched
+        cache.preprocess(self.df, {'a': float, 'b': int})
+        original = self.df.copy()
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                cache.preprocess(self.df, {'a': float, 'b': int}, inplace=True)
+            with self.assertRaises(ValueError):
+                cache.preprocess(self.df.iloc[:100], inplace=True)
+        pd.testing.assert_frame_equal(self.df, original)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+
+    def test_mixed_types(self):
+        cache = PreprocessCache(self.tmp_dir)
+        ints = pd.DataFrame({'a': pd.Series([1, 2, 3], dtype=object), 'b': [1.0, 2.0, 3.0]})
+        strings = pd.DataFrame({'a': pd.Series(['1', '2', '3'], dtype=object), 'b': [1.0, 2.0, 3.0]})
+        self.assertNotEqual(cache.key(ints), cache.key(strings))
+
+        cache.preprocess(ints)
+        cleaned = cache.preprocess(strings)
+        self.assertEqual((cache.hits, cache.misses), (0, 2))
+        self.assertListEqual(cleaned['a'].tolist(), ['1', '2', '3'])
+
+        # 1 and 1.0 are not the same input either
+        floats = pd.DataFrame({'a': pd.Series([1.0, 2, 3], dtype=object), 'b': [1.0, 2.0, 3.0]})
+        self.assertNotEqual(cache.key(ints), cache.key(floats))
+        # nor are the same categories in another order
+        categories = pd.DataFrame({'a': pd.Categorical(['x', 'y'], categories=['y', 'x'])})
+        self.assertNotEqual(cache.key(categories), cache.key(pd.DataFrame({'a': pd.Categorical(['x', 'y'])})))
+
+    def test_eviction(self):
+        cache = PreprocessCache(self.tmp_dir)
+        for i in range(3):
+            cache.put('entry{}'.format(i), self.df.iloc[i * 50:(i + 1) * 50])
+            time.sleep(0.01)
+        entry_bytes = cache.size() // 3
+        self.assertGreater(entry_bytes, 0)
+
+        # entry0 is used again, so entry1 is the least recently used
+        self.assertIsNotNone(cache.get('entry0'))
+        cache.max_bytes = 3 * entry_bytes
+        cache.put('entry3', self.df.iloc[150:200])
+        self.assertIsNone(cache.get('entry1'))
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ['entry0', 'entry2', 'entry3'])
+        self.assertLessEqual(cache.size(), cache.max_bytes)
+
+        # the same result put by two processes
+        cache.put('entry3', self.df.iloc[:10])
+        self.assertEqual(len(cache.get('entry3')), 50)
+
+        cache.clear()
+        self.assertEqual(cache.size(), 0)
+        self.assertEqual(os.listdir(self.tmp_dir), [])
@@ -2,9 +2,16 @@
 # python3 -m unittest tests.test_cleaner
 
 import unittest
+import tracemalloc
+from unittest import mock
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
+from dfcleaner.cleaner import OUTLIER_METHODS
 from dfcleaner.cleaner import sanitize, change_dtypes, remove_outliers, fill_nan, preprocess, suggest_conversion_dict, spot_irrelevant_columns
+from dfcleaner.cleaner import _filter_characters, _filter_characters_vectorized, _parse_digits
+from dfcleaner.cleaner import downcast_dtypes, memory_savings, drop_duplicates
+from dfcleaner.cleaner import scale, one_hot_encode
 
 
 class TestDataCleaner(unittest.TestCase):
@@ -135,6 +142,16 @@ class TestDataCleaner(unittest.TestCase):
             ]
         )
 
+    def test_sanitize_series(self):
+        expected = sanitize(self.sanitize_arr)
+        repeated = pd.Series(self.sanitize_arr * 100)
+
+        self.assertListEqual(sanitize(repeated), expected * 100)
+        self.assertListEqual(sanitize(pd.Index(self.sanitize_arr)), expected)
+
+        with self.assertRaises(TypeError):
+            sanitize(pd.Series(['a', np.nan]))
+
     def test_change_dtypes(self):
         self.df_change_dtypes = change_dtypes(
             self.df_change_dtypes,
@@ -155,6 +172,29 @@ class TestDataCleaner(unittest.TestCase):
         self.assertEqual(self.df_change_dtypes['e'].dtype, float)
         self.assertEqual(self.df_change_dtypes['g'].dtype, 'category')
 
+    def test_filter_characters_vectorized(self):
+        dirty_col = pd.Series(['$ 5,000.00', '?', np.nan, '12', -6, '٣4',
+                               '1.5', '0.1234567890123456789012345', '',
+                               None, '$29,347.32', 7.25])
+
+        for dtype in [float, int]:
+            col = dirty_col if dtype is float else dirty_col.drop([0, 6, 7, 10])
+            expected = col.apply(lambda x: _filter_characters(dtype, x))
+            pd.testing.assert_series_equal(
+                _filter_characters_vectorized(dtype, col), expected)
+
+        with self.assertRaises(ValueError):
+            _filter_characters_vectorized(int, dirty_col)
+
+        # a very long cell in a mixed column (Arrow declines it) is parsed on its own:
+        # the other cells are not padded to its width
+        long_col = pd.Series(['$ {}'.format(i) for i in range(20000)] + ['1' * 20000, 3.5], dtype=object)
+        with mock.patch('dfcleaner.cleaner._parse_digits', wraps=_parse_digits) as parse:
+            parsed = _filter_characters_vectorized(float, long_col)
+        widest = max(max(map(len, call.args[0]), default=0) for call in parse.call_args_list)
+        self.assertLessEqual(widest, 64)
+        pd.testing.assert_series_equal(parsed, long_col.apply(lambda x: _filter_characters(float, x)))
+
     def test_remove_outliers(self):
         self.df_outlier_regression = remove_outliers(self.df_outlier_regression,
                                                      label_col='label',
@@ -168,6 +208,39 @@ class TestDataCleaner(unittest.TestCase):
         np.testing.assert_array_equal(list(self.df_outlier_classification['a']),
                                       [5, 10, 7, 19, np.nan, 17])
 
+    def test_remove_outliers_methods(self):
+        df = pd.DataFrame({'a': [1.0, 2.0, 3.0, 4.0, 100.0, np.nan, 5.0],
+                           'b': [1, 1, 1, 1, 1, 1, 50]})
+
+        # b has no spread (iqr and mad are 0) so it has no outliers
+        result = remove_outliers(df, 1.5, method='iqr')
+        np.testing.assert_array_equal(result['a'], [1, 2, 3, 4, np.nan, np.nan, 5])
+        np.testing.assert_array_equal(result['b'], df['b'])
+
+        result = remove_outliers(df, 3, method='mad', clip=True)
+        upper = 3.5 + 3 * 1.4826 * 1.5
+        np.testing.assert_array_equal(result['a'], [1, 2, 3, 4, upper, np.nan, 5])
+
+        with self.assertRaises(ValueError):
+            remove_outliers(df, method='max')
+
+        # grouped thresholds are those of a loop over the groups
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({'group': rng.choice(['x', 'y', 'z', None], 3000),
+                           'a': rng.standard_t(3, 3000) * rng.choice([1, 10], 3000),
+                           'b': rng.integers(0, 100, 3000)})
+        df.loc[rng.random(3000) < 0.1, 'a'] = np.nan
+
+        for method in OUTLIER_METHODS:
+            result = remove_outliers(df, 1.5, method=method, by='group')
+
+            expected = df.copy()
+            for _, group in df.groupby('group'):
+                cleaned = remove_outliers(group, 1.5, method=method, label_col='group')
+                expected.loc[group.index, ['a', 'b']] = cleaned[['a', 'b']]
+            # rows without a group are never outliers
+            pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
     def test_fill_nan(self):
         self.df_fill_nan = fill_nan(self.df_fill_nan, 'mean')
         self.assertListEqual(list(self.df_fill_nan['a']),
@@ -186,10 +259,164 @@ class TestDataCleaner(unittest.TestCase):
         self.assertListEqual(list(self.df_fill_nan['b']),
                              [3.5, 2, 3, 4, 3.5, 6])
 
+        # small columns => the approximate median is the exact one
+        self.setUp()
+        self.df_fill_nan = fill_nan(self.df_fill_nan, 'approx_median')
+        self.assertListEqual(list(self.df_fill_nan['b']),
+                             [3.5, 2, 3, 4, 3.5, 6])
+
         with self.assertRaises(ValueError):
             fill_nan(self.df_fill_nan, 'asdf')
             fill_nan(self.df_fill_nan, 5.0)
 
+    def test_scale(self):
+        df = pd.DataFrame({'a': [1, 2, 3, 4], 'b': [2.0, 2.0, np.nan, 2.0], 'label': [0, 1, 0, 1]})
+        scaled = scale(df, label_col='label')
+        self.assertEqual(scaled['a'].dtype, np.float32)
+        np.testing.assert_allclose(scaled['a'], (df['a'] - df['a'].mean()) / df['a'].std(), rtol=1e-6)
+        # zero std => only centered
+        self.assertListEqual(scaled['b'].fillna(-1).tolist(), [0, 0, -1, 0])
+        self.assertListEqual(scaled['label'].tolist(), [0, 1, 0, 1])
+        self.assertEqual(df['a'].dtype, int)
+
+        scaled = scale(df, 'minmax', parameters={'a': (1, 2)}, dtype=np.float64)
+        self.assertListEqual(scaled['a'].tolist(), [0, 0.5, 1, 1.5])
+        self.assertListEqual(scaled['b'].fillna(-1).tolist(), [2, 2, -1, 2])
+
+        with self.assertRaises(ValueError):
+            scale(df, 'robust')
+
+        # unix timestamps keep their precision in float32
+        scaled = scale(pd.DataFrame({'t': 1.6e9 + np.arange(10)}))
+        np.testing.assert_allclose(scaled['t'], (np.arange(10) - 4.5) / np.arange(10).std(ddof=1), rtol=1e-6)
+
+        # preprocess() scales with the statistics of the fill step, adjusted for the filled values
+        df = pd.DataFrame({'a': [1.0, np.nan, 3.0, 7.0, np.nan], 'b': [1, 2, 3, 4, 5], 'label': [0, 1, 0, 1, 0]})
+        for how in ['mean', 'median', 'approx_median']:
+            expected = scale(preprocess(df, fill_na_method=how, label_col='label'), label_col='label')
+            pd.testing.assert_frame_equal(preprocess(df, fill_na_method=how, label_col='label',
+                                                     scale_method='standard'), expected)
+
+    def test_one_hot_encode(self):
+        df = pd.DataFrame({'a': [1.0, 2.0, 3.0, 4.0],
+                           'c': pd.Categorical(['x', 'y', 'x', 'z']),
+                           'd': ['u', 'v', 'u', 'u']})
+        expected = pd.get_dummies(df, columns=['c'], dtype=np.int8)
+        pd.testing.assert_frame_equal(one_hot_encode(df), expected)
+        self.assertListEqual(list(df.columns), ['a', 'c', 'd'])
+
+        encoded = one_hot_encode(df.copy(), columns=['c', 'd'], max_levels=1, sparse=True, inplace=True)
+        self.assertListEqual(list(encoded.columns), ['a', 'c_x', 'c_other', 'd_u', 'd_other'])
+        self.assertEqual(encoded['c_x'].dtype, pd.SparseDtype(np.int8, 0))
+        self.assertListEqual(encoded['c_other'].tolist(), [0, 1, 0, 1])
+
+        # 'c_x' is taken (in both modes), as is 'c_x_y' for two encoded columns
+        for inplace in [False, True]:
+            with self.assertRaises(ValueError):
+                one_hot_encode(df.assign(c_x=0), inplace=inplace)
+        with self.assertRaises(ValueError):
+            one_hot_encode(pd.DataFrame({'c': pd.Categorical(['x_y']), 'c_x': pd.Categorical(['y'])}))
+
+    def test_downcast_dtypes(self):
+        df = pd.DataFrame({
+            'small': [-1, 0, 100, 5],
+            'positive': [0, 70000, 3, 4],
+            'whole': [1.0, 2.0, 3.0, 4.0],
+            'whole_nan': [1.0, np.nan, 300.0, 4.0],
+            'halves': [0.5, 1.5, np.nan, 2.25],
+            'precise': [0.1, 0.2, 0.3, 0.4],
+            'repeated': ['a', 'b', 'a', 'a'],
+            'unique': ['a', 'b', 'c', 'd'],
+        })
+        old_df = df.copy()
+        df = downcast_dtypes(df)
+
+        self.assertDictEqual(df.dtypes.astype(str).to_dict(), {
+            'small': 'int8', 'positive': 'uint32', 'whole': 'uint8',
+            'whole_nan': 'UInt16', 'halves': 'float32', 'precise': 'float64',
+            'repeated': 'category', 'unique': 'str',
+        })
+        # no value is lost
+        for col_name in df.columns:
+            pd.testing.assert_series_equal(df[col_name].astype(old_df[col_name].dtype),
+                                           old_df[col_name])
+
+        savings = memory_savings(old_df, df)
+        self.assertEqual(savings.loc['small', 'saved'], 4 * 7)
+        self.assertEqual(savings.loc['precise', 'saved'], 0)
+
+        self.assertEqual(downcast_dtypes(old_df.copy(), nullable=False)['whole_nan'].dtype, np.float32)
+
+    def test_inplace_and_copy(self):
+        rng = np.random.default_rng(0)
+        n_rows = 1000
+        df = pd.DataFrame({'a': rng.normal(0, 1, n_rows), 'b': rng.normal(0, 1, n_rows),
+                           'price': rng.choice(['$ 1.5', '$ 2,000', '?'], n_rows)})
+        df.loc[rng.random(n_rows) < 0.1, 'a'] = np.nan
+        df.loc[0, 'b'] = 1000
+        df = pd.concat([df, df.iloc[:100]], ignore_index=True)
+        original = df.copy()
+
+        # copy mode: the input is left untouched
+        for function in [lambda df: change_dtypes(df, {'price': float, 'b': 'category'}),
+                         drop_duplicates,
+                         remove_outliers,
+                         lambda df: fill_nan(df, 'mean'),
+                         downcast_dtypes,
+                         lambda df: preprocess(df, {'price': float})]:
+            self.assertIsNot(function(df), df)
+            pd.testing.assert_frame_equal(df, original)
+
+        # in place mode: same results, written into df
+        df = fill_nan(remove_outliers(original.copy(), inplace=True), 'median', inplace=True)
+        pd.testing.assert_frame_equal(df, fill_nan(remove_outliers(original), 'median'))
+
+        df = original.copy()
+        self.assertIs(preprocess(df, {'price': float}, inplace=True), df)
+        pd.testing.assert_frame_equal(df, preprocess(original, {'price': float}))
+
+        # rows are dropped in place by label
+        with self.assertRaises(ValueError):
+            drop_duplicates(original.set_index(np.zeros(len(original))), inplace=True)
+
+        # float columns are written through their buffers (big enough for the
+        # fixed size blocks of the statistics to be small next to a column)
+        n_rows = 1 << 20
+        big = pd.DataFrame({'a': rng.normal(0, 1, n_rows), 'b': rng.normal(0, 1, n_rows)})
+        big.loc[rng.random(n_rows) < 0.1, 'a'] = np.nan
+        column_bytes = big['a'].to_numpy().nbytes
+
+        for function in [remove_outliers, lambda df, inplace: fill_nan(df, 'mean', inplace=inplace)]:
+            df = big.copy()
+            buffer = df['a'].to_numpy()
+
+            tracemalloc.start()
+            result = function(df, inplace=True)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            self.assertIs(result, df)
+            self.assertTrue(np.shares_memory(buffer, df['a'].to_numpy()))
+            self.assertLess(peak, column_bytes / 2)
+
+    def test_parallel(self):
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({'col_{}'.format(i): rng.normal(0, 1, 1000) for i in range(8)})
+        df.loc[rng.random(1000) < 0.1, 'col_0'] = np.nan
+        df['price'] = ['$ {:,.2f}'.format(x) for x in rng.uniform(0, 10000, 1000)]
+        df['label'] = rng.choice([0, 1, np.nan], 1000)
+
+        expected = preprocess(df.copy(), {'price': float}, label_col='label')
+
+        pd.testing.assert_frame_equal(
+            preprocess(df.copy(), {'price': float}, label_col='label', n_jobs=4),
+            expected)
+
+        with ProcessPoolExecutor(2) as executor:
+            pd.testing.assert_frame_equal(
+                preprocess(df.copy(), {'price': float}, label_col='label', executor=executor),
+                expected)
+
     def test_suggest_conversion_dict(self):
         suggested_conversion_dict = suggest_conversion_dict(
             self.df_suggest_conversion)
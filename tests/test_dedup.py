@@ -0,0 +1,97 @@
+import unittest
+from unittest import mock
+import pandas as pd
+import numpy as np
+from dfcleaner import cleaner
+from dfcleaner.dedup import Deduplicator, first_row_occurrences, row_fingerprints
+
+
+class TestDedup(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n_rows = 5000
+
+        self.df = pd.DataFrame({
+            'a': rng.integers(0, 20, n_rows),
+            'b': rng.choice([0.0, -0.0, 1.5, np.nan], n_rows),
+            'c': rng.choice(['x', 'y', None], n_rows),
+        })
+        self.chunks = [self.df.iloc[i:i + 700] for i in range(0, n_rows, 700)]
+        self.expected = self.df.drop_duplicates()
+
+    def test_row_fingerprints(self):
+        fingerprints = row_fingerprints(self.df)
+        self.assertEqual(fingerprints.dtype, np.uint64)
+        self.assertEqual(len(np.unique(fingerprints)), len(self.expected))
+
+        # same rows with an int column that became float in another chunk
+        as_float = self.df.astype({'a': float})
+        np.testing.assert_array_equal(row_fingerprints(as_float), fingerprints)
+
+        # the column order matters
+        self.assertFalse((row_fingerprints(as_float[['b', 'a', 'c']]) == fingerprints).all())
+
+    def test_mixed_object_values(self):
+        # the type counts, except between numbers (like drop_duplicates())
+        df = pd.DataFrame({'a': pd.Series([1, '1', 1.0, '1.0', None, 'None', (1,), '(1,)', 'x'], dtype=object),
+                           'b': 0})
+        fingerprints = row_fingerprints(df)
+        self.assertEqual(len(np.unique(fingerprints)), len(df.drop_duplicates()))
+        self.assertEqual(fingerprints[0], fingerprints[2])
+        self.assertNotEqual(fingerprints[0], fingerprints[1])
+        # same values, same fingerprints whatever the other values of the column
+        np.testing.assert_array_equal(fingerprints[[0, 8]],
+                                      row_fingerprints(pd.DataFrame({'a': [1, 'x'], 'b': 0})))
+        np.testing.assert_array_equal(fingerprints[[0]], row_fingerprints(pd.DataFrame({'a': [1], 'b': 0})))
+
+    def test_nan_bits(self):
+        # 0/0 is -nan on x86, np.nan has the sign bit clear
+        with np.errstate(invalid='ignore'):
+            nans = [np.float64(0.0) / np.float64(0.0), np.nan, -np.nan]
+        df = pd.DataFrame({'x': nans, 'y': [1, 1, 1]})
+        self.assertEqual(len(np.unique(row_fingerprints(df))), 1)
+        self.assertEqual(len(cleaner.drop_duplicates(df)), len(df.drop_duplicates()))
+
+        df = pd.DataFrame({'x': pd.Series(nans + ['a'], dtype=object), 'y': 1})
+        self.assertEqual(len(cleaner.drop_duplicates(df)), len(df.drop_duplicates()))
+
+    def test_first_row_occurrences(self):
+        np.testing.assert_array_equal(first_row_occurrences(self.df), ~self.df.duplicated().to_numpy())
+
+        # every row collides with every other one: the rows are compared
+        df = pd.DataFrame({'a': [1, 2, 1, 3, 2], 'b': ['x', 'y', 'x', 'x', 'z']})
+        with mock.patch('dfcleaner.dedup.row_fingerprints', lambda df: np.zeros(len(df), dtype=np.uint64)):
+            np.testing.assert_array_equal(first_row_occurrences(df), ~df.duplicated().to_numpy())
+            pd.testing.assert_frame_equal(cleaner.drop_duplicates(df), df.drop_duplicates())
+
+    def test_exact(self):
+        for max_fingerprints in [None, 10]:
+            with Deduplicator(max_fingerprints=max_fingerprints) as deduplicator:
+                output = pd.concat([deduplicator.drop_duplicates(chunk)
+                                    for chunk in self.chunks])
+
+                pd.testing.assert_frame_equal(output, self.expected)
+                self.assertEqual(deduplicator.rows_seen, len(self.df))
+                self.assertEqual(deduplicator.removed, len(self.df) - len(self.expected))
+
+    def test_bloom(self):
+        deduplicator = Deduplicator('bloom', capacity=1000, false_positive_rate=0.01)
+        output = pd.concat([deduplicator.drop_duplicates(chunk) for chunk in self.chunks])
+
+        # few distinct rows => no false positives
+        pd.testing.assert_frame_equal(output, self.expected)
+
+        # a rebuilt deduplicator remembers the same rows
+        for deduplicator in [Deduplicator('bloom', capacity=1000), Deduplicator(max_fingerprints=10)]:
+            with deduplicator:
+                deduplicator.drop_duplicates(self.chunks[0])
+                restored = Deduplicator.from_state(*deduplicator.state())
+                self.assertEqual(restored.rows_seen, len(self.chunks[0]))
+                pd.testing.assert_frame_equal(restored.drop_duplicates(self.df),
+                                              deduplicator.drop_duplicates(self.df))
+
+        with self.assertRaises(ValueError):
+            Deduplicator('bloom')
+        with self.assertRaises(ValueError):
+            Deduplicator('asdf')
@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+import numpy as np
+from dfcleaner import cleaner
+from dfcleaner.dflogger import change_logger, load_changes, LogConfig
+
+
+def _clean(df):
+    df['a'] = df['a'].mask(df['a'] > 5)
+    df['c'] = df['c'].astype(float)
+    return df.drop(index=[13])
+
+
+class TestChangeLogger(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'a': [1, 9, 3, 4],
+            'b': ['x', 'y', 'z', 'w'],
+            'c': ['1', '2', '3', '4'],
+        }, index=[10, 11, 12, 13])
+
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_disabled(self):
+        self.assertIs(change_logger(False, self.tmp_dir)(_clean), _clean)
+
+    def test_config_read_at_call_time(self):
+        config = LogConfig(log_dir=self.tmp_dir)
+        logged = change_logger(config)(_clean)
+        log_filepath = os.path.join(self.tmp_dir, '_clean_log.npz')
+
+        logged(self.df.copy())
+        self.assertFalse(os.path.exists(log_filepath))
+
+        config.enabled, config.log_format = True, 'npz'
+        logged(self.df.copy())
+        self.assertTrue(os.path.exists(log_filepath))
+
+        config.log_format = 'xlsx'
+        with self.assertRaises(ValueError):
+            logged(self.df.copy())
+
+        # the module attributes of cleaner are its config
+        try:
+            cleaner.ENABLE_LOGGING, cleaner.LOG_DIR = True, self.tmp_dir
+            self.assertTrue(cleaner.LOG_CONFIG.enabled)
+            cleaner.change_dtypes(self.df, {'c': float})
+            self.assertTrue(os.path.exists(os.path.join(self.tmp_dir, 'change_dtypes_log.csv')))
+        finally:
+            cleaner.ENABLE_LOGGING, cleaner.LOG_DIR = False, '.'
+
+    def test_csv_log(self):
+        change_logger(True, self.tmp_dir)(_clean)(self.df.copy())
+        log = pd.read_csv(os.path.join(self.tmp_dir, '_clean_log.csv'), index_col=[0, 1])
+
+        self.assertListEqual(list(log.index), [(10, 'c'), (11, 'a'), (11, 'c'), (12, 'c')])
+        self.assertListEqual(list(log['new'].drop((11, 'a'))), [1.0, 2.0, 3.0])
+        self.assertTrue(np.isnan(log.loc[(11, 'a'), 'new']))
+        self.assertEqual(log.loc[(11, 'a'), 'old'], 9)
+
+    def test_npz_log(self):
+        cleaned = change_logger(True, self.tmp_dir, 'npz')(_clean)(self.df.copy())
+        changes, dropped_rows = load_changes(os.path.join(self.tmp_dir, '_clean_log.npz'))
+
+        self.assertEqual(len(cleaned), 3)
+        # untouched columns are not in the log
+        self.assertListEqual(list(changes), ['a', 'c'])
+        self.assertListEqual(list(changes['a'].index), [11])
+        self.assertEqual(changes['a']['old'][11], 9)
+        self.assertTrue(np.isnan(changes['a']['new'][11]))
+        self.assertListEqual(list(changes['c'].index), [10, 11, 12])
+        self.assertListEqual(list(dropped_rows), [13])
+
+        with self.assertRaises(ValueError):
+            change_logger(True, self.tmp_dir, 'xlsx')
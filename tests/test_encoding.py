@@ -0,0 +1,70 @@
+import unittest
+from unittest import mock
+import pandas as pd
+import numpy as np
+from dfcleaner.encoding import OneHotEncoder, scale_values
+
+
+class TestEncoding(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'color': pd.Categorical(['red', 'blue', 'red', None, 'green', 'red', 'blue']),
+            'size': ['s', 'm', 's', 'l', None, 'xl', 's'],
+            'value': [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0],
+        })
+
+    def test_one_hot(self):
+        encoder = OneHotEncoder(['color', 'size']).fit(self.df)
+        expected = pd.get_dummies(self.df[['color', 'size']], dtype=np.int8)
+        self.assertListEqual(encoder.feature_names, list(expected.columns))
+        np.testing.assert_array_equal(encoder.to_array(self.df), expected.to_numpy())
+        csr = encoder.to_csr(self.df)
+        self.assertEqual(csr.dtype, np.int8)
+        self.assertEqual(csr.nnz, 12)
+        np.testing.assert_array_equal(csr.toarray(), expected.to_numpy())
+
+        # 'category' columns by default, unknown levels get no column
+        encoder = OneHotEncoder().fit(self.df)
+        self.assertListEqual(list(encoder.levels), ['color'])
+        batch = pd.DataFrame({'color': ['blue', 'purple', None]})
+        np.testing.assert_array_equal(encoder.to_array(batch), [[1, 0, 0], [0, 0, 0], [0, 0, 0]])
+
+    def test_rare_levels(self):
+        encoder = OneHotEncoder(['size'], max_levels=1).fit(self.df)
+        self.assertListEqual(encoder.feature_names, ['size_s', 'size_other'])
+        encoder = OneHotEncoder(['color', 'size'], min_frequency=2).fit(self.df)
+        self.assertListEqual(encoder.feature_names,
+                             ['color_blue', 'color_red', 'color_other', 'size_s', 'size_other'])
+
+        # unknown levels go into the '_other' column, nulls nowhere
+        batch = pd.DataFrame({'color': ['purple', 'red', None], 'size': ['xxl', None, 's']})
+        np.testing.assert_array_equal(encoder.to_csr(batch).toarray(),
+                                      [[0, 0, 1, 0, 1], [0, 1, 0, 0, 0], [0, 0, 0, 1, 0]])
+
+        loaded = OneHotEncoder.from_dict(encoder.to_dict())
+        self.assertListEqual(loaded.feature_names, encoder.feature_names)
+        np.testing.assert_array_equal(loaded.to_array(batch), encoder.to_array(batch))
+
+        with self.assertRaises(ValueError):
+            OneHotEncoder().to_array(self.df)
+
+    def test_scale_values(self):
+        values = np.array([1.0, 3.0, np.nan])
+        scaled = scale_values(values, 1.0, 2.0)
+        self.assertEqual(scaled.dtype, np.float32)
+        np.testing.assert_array_equal(scaled, [0.0, 1.0, np.nan])
+        np.testing.assert_array_equal(values, [1.0, 3.0, np.nan])
+
+        # a zero spread only centers, in place when the dtype matches
+        values = np.array([4, 4], dtype=np.float32)
+        self.assertIs(scale_values(values, 4.0, 0.0, inplace=True), values)
+        np.testing.assert_array_equal(values, [0, 0])
+
+        # a large offset is removed in float64, before the cast to float32
+        values = 1.6e9 + np.arange(10)
+        expected = (values - values.mean()) / values.std(ddof=1)
+        with mock.patch('dfcleaner.encoding._SCALE_BLOCK_ROWS', 3):
+            scaled = scale_values(values, values.mean(), values.std(ddof=1))
+        np.testing.assert_allclose(scaled, expected, rtol=1e-6)
+        self.assertAlmostEqual(float(scaled[0]), -1.486, places=3)
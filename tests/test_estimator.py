@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+import numpy as np
+from dfcleaner.cleaner import preprocess
+from dfcleaner.estimator import Cleaner
+
+
+class TestCleaner(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({
+            'a': [1, 2, 9000, 4, 5, 6, 4, np.nan],
+            'b': ['$ 1.5', '?', '$ 2.5', '$ 3', '$ 2', '$ 2', '$ 3', '$ 1'],
+            'c': ['x', 'y', 'x', 'y', 'x', 'x', 'y', 'x'],
+            'label': [1, 0, 1, 0, 1, 0, 0, np.nan],
+        })
+        self.conversion_dict = {'b': float, 'c': 'category'}
+
+        self.batch = pd.DataFrame({
+            'a': [3, -50000, np.nan],
+            'b': ['$ 2', '$ 1,000', '?'],
+            'c': ['y', 'x', 'x'],
+        })
+
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_fit_transform(self):
+        original = self.df.copy()
+        for fill_na_method in ['median', 'mean']:
+            cleaner = Cleaner(self.conversion_dict, fill_na_method=fill_na_method,
+                              label_col='label')
+            cleaned = cleaner.fit_transform(self.df)
+            expected = preprocess(self.df.copy(), self.conversion_dict,
+                                  fill_na_method=fill_na_method, label_col='label')
+
+            pd.testing.assert_frame_equal(cleaned, expected)
+            pd.testing.assert_frame_equal(self.df, original)
+
+    def test_mixed_object_column(self):
+        # 1 and '1' are different rows, like in preprocess()
+        df = pd.DataFrame({'a': [1.0, 1.0, 2.0, 3.0], 'b': pd.Series([1, '1', 1, 'x'], dtype=object)})
+        cleaned = Cleaner({}).fit_transform(df)
+        pd.testing.assert_frame_equal(cleaned, preprocess(df))
+        self.assertEqual(len(cleaned), 4)
+
+    def test_transform(self):
+        cleaner = Cleaner(self.conversion_dict, label_col='label').fit(self.df)
+        cleaned = cleaner.transform(self.batch)
+
+        # outliers and nan values are replaced with the fitted fill values
+        self.assertListEqual(list(cleaned['a']),
+                             [3, cleaner.fill_values['a'], cleaner.fill_values['a']])
+        self.assertListEqual(list(cleaned['b']),
+                             [2, cleaner.fill_values['b'], cleaner.fill_values['b']])
+        self.assertEqual(cleaned['c'].dtype, 'category')
+
+        with self.assertRaises(ValueError):
+            Cleaner().transform(self.batch)
+
+    def test_save_load(self):
+        cleaner = Cleaner(self.conversion_dict, label_col='label').fit(self.df)
+        path = os.path.join(self.tmp_dir, 'cleaner.json')
+        cleaner.save(path)
+
+        loaded = Cleaner.load(path)
+        self.assertEqual(loaded.conversion_dictionary, self.conversion_dict)
+        self.assertEqual(loaded.moments, cleaner.moments)
+        pd.testing.assert_frame_equal(loaded.transform(self.batch),
+                                      cleaner.transform(self.batch))
+
+    def test_save_load_dtypes(self):
+        # numpy type objects and categories with a given order
+        conversion_dict = {'a': np.float32, 'b': float, 'label': np.int8,
+                           'c': pd.CategoricalDtype(['y', 'x'], ordered=True)}
+        df = self.df.dropna()
+        cleaner = Cleaner(conversion_dict).fit(df)
+        path = os.path.join(self.tmp_dir, 'cleaner.json')
+        cleaner.save(path)
+
+        loaded = Cleaner.load(path)
+        self.assertEqual(loaded.conversion_dictionary['c'], conversion_dict['c'])
+        transformed = loaded.transform(self.batch.assign(label=[1, 0, 1]))
+        pd.testing.assert_frame_equal(transformed, cleaner.transform(self.batch.assign(label=[1, 0, 1])))
+        self.assertEqual(transformed['label'].dtype, np.int8)
+        self.assertListEqual(transformed['c'].cat.categories.tolist(), ['y', 'x'])
+
+    def test_scale_and_encode(self):
+        cleaner = Cleaner(self.conversion_dict, label_col='label', scale_method='minmax', one_hot=True)
+        cleaned = cleaner.fit_transform(self.df)
+        expected = preprocess(self.df, self.conversion_dict, label_col='label', scale_method='minmax',
+                              one_hot=True)
+        pd.testing.assert_frame_equal(cleaned, expected)
+        self.assertListEqual(list(cleaned.columns), ['a', 'b', 'label', 'c_x', 'c_y'])
+        self.assertEqual(cleaned['a'].dtype, np.float32)
+
+        path = os.path.join(self.tmp_dir, 'cleaner.json')
+        cleaner.save(path)
+        batch = Cleaner.load(path).transform(self.batch)
+        pd.testing.assert_frame_equal(batch, cleaner.transform(self.batch))
+        # scaled with the fitted min and max, 'c' encoded with the fitted levels
+        self.assertAlmostEqual(batch['b'].tolist()[0], (2 - 1.5) / (3 - 1.5), places=6)
+        self.assertListEqual(batch['c_y'].tolist(), [1, 0, 0])
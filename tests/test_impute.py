@@ -0,0 +1,68 @@
+import unittest
+import pandas as pd
+import numpy as np
+from dfcleaner import impute
+from dfcleaner.cleaner import fill_nan
+
+
+class TestImpute(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n_rows = 5000
+
+        x = rng.normal(0, 1, n_rows)
+        self.df = pd.DataFrame({
+            'group': rng.choice(['a', 'b', 'c', None], n_rows),
+            'x': x,
+            'y': 3 * x + 5 + rng.normal(0, 0.1, n_rows),
+            'z': rng.normal(0, 1, n_rows),
+            'n': rng.integers(0, 100, n_rows),
+            'label': 2 * x,
+        })
+        for col_name in ['x', 'y', 'z']:
+            self.df.loc[rng.random(n_rows) < 0.1, col_name] = np.nan
+
+    def test_regression_models(self):
+        cols = ['x', 'y', 'z', 'n']
+        models = impute.regression_models(self.df, cols, cols)
+
+        self.assertEqual(models.loc['x', 'predictor'], 'y')
+        self.assertEqual(models.loc['y', 'predictor'], 'x')
+        self.assertAlmostEqual(models.loc['y', 'slope'], 3, places=2)
+        self.assertAlmostEqual(models.loc['y', 'intercept'], 5, places=2)
+
+        # same as the pairwise correlations of pandas
+        correlations = self.df[cols].corr()
+        for target, (predictor, correlation) in models[['predictor', 'correlation']].iterrows():
+            self.assertAlmostEqual(correlation, correlations.loc[target, predictor])
+            self.assertEqual(models.loc[target, 'rows'],
+                             self.df[[target, predictor]].notna().all(axis=1).sum())
+
+    def test_fill_nan_regression(self):
+        original = self.df.copy()
+        df = fill_nan(self.df, 'regression', label_col='label')
+        pd.testing.assert_frame_equal(self.df, original)
+
+        self.assertFalse(df[['x', 'y', 'z']].isna().any().any())
+        # predicted from x where x has a value, else the median of y
+        predicted = self.df['y'].isna() & self.df['x'].notna()
+        np.testing.assert_allclose(df.loc[predicted, 'y'], 3 * self.df.loc[predicted, 'x'] + 5, atol=0.05)
+        not_predicted = self.df['y'].isna() & self.df['x'].isna()
+        self.assertTrue((df.loc[not_predicted, 'y'] == self.df['y'].median()).all())
+        # the label is never used as predictor
+        self.assertNotEqual(df['x'].tolist(), (self.df['label'] / 2).tolist())
+
+    def test_fill_nan_by_group(self):
+        for how in ['median', 'mean']:
+            df = fill_nan(self.df, how, by='group')
+
+            expected = self.df.copy()
+            for col_name in ['x', 'y', 'z']:
+                group_values = self.df.groupby('group')[col_name].transform(how)
+                expected[col_name] = self.df[col_name].fillna(group_values).fillna(
+                    getattr(self.df[col_name], how)())
+            pd.testing.assert_frame_equal(df, expected)
+
+        with self.assertRaises(ValueError):
+            fill_nan(self.df, 'approx_median', by='group')
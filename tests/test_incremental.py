@@ -0,0 +1,128 @@
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+import numpy as np
+from dfcleaner.cleaner import preprocess
+from dfcleaner.dedup import Deduplicator
+from dfcleaner.incremental import IncrementalCleaner
+
+
+class TestIncremental(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.partitions = []
+        for i in range(3):
+            df = pd.DataFrame({
+                'a': rng.normal(0, 1, 40).round(1),
+                'b': rng.integers(0, 10, 40),
+                'price': ['$ {}'.format(value) for value in rng.integers(1, 100, 40)],
+                'label': rng.integers(0, 2, 40).astype(float),
+            }, index=np.arange(40) + 100 * i)
+            df.iloc[rng.choice(40, 5, replace=False), 0] = np.nan
+            df.iloc[3, 3] = np.nan
+            self.partitions.append(df)
+
+        # an int column with an outlier in the first partition only
+        self.partitions[0].iloc[7, 1] = 1000
+        # a row of the first partition again and an outlier
+        self.partitions[2].iloc[5] = self.partitions[0].iloc[8]
+        self.partitions[2].iloc[9, 0] = 50
+
+        self.tmp_dir = tempfile.mkdtemp()
+        self.state_path = os.path.join(self.tmp_dir, 'state.npz')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _clean_all(self, **kwargs):
+        cleaned = []
+        for i, df in enumerate(self.partitions):
+            # a new process for every partition
+            cleaner = IncrementalCleaner(self.state_path, {'price': float}, label_col='label', **kwargs)
+            cleaned.append(cleaner.clean_partition(df, partition='day{}'.format(i)))
+            cleaner.commit()
+        return cleaner, cleaned
+
+    def test_clean_partitions(self):
+        cleaner, cleaned = self._clean_all()
+
+        # small columns: the sketches are exact
+        expected = preprocess(pd.concat(self.partitions), {'price': float}, label_col='label')
+        pd.testing.assert_frame_equal(cleaned[-1], expected.loc[200:])
+        self.assertEqual(cleaned[-1]['b'].dtype, float)
+
+        self.assertEqual(cleaner.partitions, ['day0', 'day1', 'day2'])
+        self.assertEqual(cleaner.rows_read, 120)
+        self.assertEqual(cleaner.rows_written, sum(map(len, cleaned)))
+        self.assertEqual(cleaner.deduplicator.removed, 1)
+
+        with self.assertRaises(ValueError):
+            cleaner.clean_partition(self.partitions[2], partition='day2')
+
+    def test_fingerprint_runs(self):
+        cleaner = IncrementalCleaner(self.state_path, {'price': float}, label_col='label')
+        runs_dir = self.state_path + '.runs'
+        sizes = []
+        for i, n_rows in enumerate([40, 10, 5, 30]):
+            df = self.partitions[0].assign(b=i)
+            cleaner.clean_partition(df.iloc[:n_rows], partition=i)
+            cleaner.commit()
+            sizes.append(sorted(len(np.load(os.path.join(runs_dir, name))) for name in os.listdir(runs_dir)))
+        # a new run per commit, merged when it is as big as the previous one
+        self.assertListEqual(sizes, [[40], [10, 40], [15, 40], [85]])
+
+        # the committed rows are remembered from the memory mapped runs
+        resumed = IncrementalCleaner(self.state_path)
+        self.assertTrue(all(isinstance(run, np.memmap) for run in resumed.deduplicator.sorted_runs()))
+        resumed.clean_partition(pd.concat([self.partitions[0].assign(b=2).iloc[:5],
+                                           self.partitions[1].iloc[:5]]))
+        self.assertEqual(resumed.deduplicator.rows_seen, 95)
+        self.assertEqual(resumed.deduplicator.removed, 5)
+
+    def test_partition_keys(self):
+        cleaner = IncrementalCleaner(self.state_path, {'price': float}, label_col='label')
+        cleaner.clean_partition(self.partitions[0], partition=datetime.date(2020, 1, 2))
+        cleaner.clean_partition(self.partitions[1], partition=np.int64(7))
+        cleaner.commit()
+
+        # the keys read back are the stored ones, so they still match
+        resumed = IncrementalCleaner(self.state_path)
+        self.assertEqual(resumed.partitions, ['2020-01-02', 7])
+        for partition in [datetime.date(2020, 1, 2), '2020-01-02', 7]:
+            with self.assertRaises(ValueError):
+                resumed.clean_partition(self.partitions[2], partition=partition)
+        with self.assertRaises(ValueError):
+            resumed.clean_partition(self.partitions[2], partition=('day', 2))
+
+    def test_bloom_state(self):
+        deduplicator = Deduplicator('bloom', capacity=1000)
+        cleaner, cleaned = self._clean_all(deduplicator=deduplicator, fill_na_method='mean')
+
+        self.assertEqual(cleaner.deduplicator.method, 'bloom')
+        self.assertEqual(cleaner.fill_na_method, 'mean')
+        self.assertEqual(len(cleaned[-1]), 38)
+        self.assertFalse(cleaned[-1].isna().any().any())
+
+    def test_atomic_commit(self):
+        cleaner = IncrementalCleaner(self.state_path, {'price': float}, label_col='label')
+        cleaner.clean_partition(self.partitions[0], partition='day0')
+        cleaner.commit()
+
+        expected = cleaner.clean_partition(self.partitions[1], partition='day1')
+        with mock.patch('os.replace', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                cleaner.commit()
+
+        # the state file still holds the first partition only
+        self.assertEqual(sorted(os.listdir(self.tmp_dir)), ['state.npz', 'state.npz.runs'])
+        self.assertEqual(os.listdir(self.state_path + '.runs'), ['run_0.npy'])
+        resumed = IncrementalCleaner(self.state_path)
+        self.assertEqual(resumed.partitions, ['day0'])
+        self.assertEqual(resumed.label_col, 'label')
+        pd.testing.assert_frame_equal(resumed.clean_partition(self.partitions[1], partition='day1'),
+                                      expected)
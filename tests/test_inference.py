@@ -0,0 +1,58 @@
+import unittest
+import pandas as pd
+import numpy as np
+from dfcleaner import inference
+from dfcleaner.cleaner import suggest_conversion_dict
+
+
+class TestInference(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n_rows = 200000
+
+        numbers = rng.normal(0, 100, n_rows).round(2).astype(str).astype(object)
+        # 30% junk is still a float column, 40% is not
+        numbers_with_junk = numbers.copy()
+        numbers_with_junk[rng.random(n_rows) < 0.3] = '?'
+        mostly_junk = numbers.copy()
+        mostly_junk[rng.random(n_rows) < 0.4] = 'n/a'
+
+        self.df = pd.DataFrame({
+            'numbers': numbers_with_junk,
+            'mostly_junk': mostly_junk,
+            'names': 'some name',
+            'flag': rng.integers(0, 2, n_rows),
+            'amount': rng.normal(0, 1, n_rows),
+            'date': pd.Timestamp('2020-01-01'),
+        })
+
+    def test_infer_types(self):
+        report = inference.infer_types(self.df)
+
+        self.assertEqual(list(report.index), list(self.df.columns))
+        self.assertEqual(report['suggestion'].tolist(), [float, None, None, 'category', None, None])
+        self.assertAlmostEqual(report.loc['numbers', 'parse_ratio'], 0.7, places=2)
+        self.assertEqual(report.loc['flag', 'rows_scanned'], len(self.df))
+        self.assertEqual(round(report.loc['flag', 'distinct']), 2)
+
+        # the scan stops once the decision can't change
+        self.assertLess(report.loc['names', 'rows_scanned'], len(self.df))
+        self.assertLess(report.loc['amount', 'rows_scanned'], len(self.df))
+
+        # deterministic
+        pd.testing.assert_frame_equal(inference.infer_types(self.df), report)
+
+    def test_small_frames(self):
+        df = pd.DataFrame({'a': ['1', '?', '3', '4'], 'b': 1, 'c': None})
+        self.assertEqual(suggest_conversion_dict(df), {'a': float})
+        self.assertEqual(suggest_conversion_dict(df.iloc[:0]), {})
+
+    def test_parser(self):
+        values = ['1', ' -2.5 ', '.5', '+1e-3', '1E+10', '3.', '1e', '.', '-', '1.2.3',
+                  '$ 3', '?', '', '1 2', 6, 7.5, None, np.nan, '١٢', 'x' * 100]
+        col = pd.Series(values, dtype=object)
+        expected = pd.to_numeric(col, errors='coerce').notna().to_numpy()
+
+        np.testing.assert_array_equal(inference._is_number(col), expected)
+        np.testing.assert_array_equal(inference._is_number(col[:14]), expected[:14])
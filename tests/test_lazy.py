@@ -0,0 +1,86 @@
+import unittest
+import pandas as pd
+import numpy as np
+from dfcleaner import cleaner
+
+
+class TestLazy(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n_rows = 1000
+
+        self.df = pd.DataFrame({
+            'a': rng.normal(0, 1, n_rows),
+            'b': rng.integers(0, 10, n_rows),
+            'price': ['$ {:,.2f}'.format(x) for x in rng.uniform(0, 10000, n_rows)],
+            'label': rng.choice([0, 1, np.nan], n_rows),
+        })
+        self.df.loc[rng.random(n_rows) < 0.1, 'a'] = np.nan
+        self.df.loc[0, 'b'] = 10000
+        self.df = pd.concat([self.df, self.df.iloc[:100]], ignore_index=True)
+
+    def test_collect(self):
+        original = self.df.copy()
+
+        for how in ['median', 'mean']:
+            expected = cleaner.preprocess(self.df.copy(), {'price': float},
+                                          fill_na_method=how, label_col='label')
+
+            plan = (cleaner.lazy(self.df)
+                    .change_dtypes({'price': float})
+                    .dedup()
+                    .dropna('label')
+                    .remove_outliers(1.5, label_col='label')
+                    .fill_nan(how))
+
+            pd.testing.assert_frame_equal(plan.collect(), expected)
+            pd.testing.assert_frame_equal(plan.collect(n_jobs=2), expected)
+
+        # the input is not modified
+        pd.testing.assert_frame_equal(self.df, original)
+
+    def test_outlier_methods(self):
+        for method, by in [('iqr', None), ('mad', None), ('iqr', 'label')]:
+            expected = cleaner.fill_nan(cleaner.remove_outliers(self.df, 1.5, method=method, by=by,
+                                                                clip=by is None), 'mean')
+            plan = cleaner.lazy(self.df).remove_outliers(1.5, method=method, by=by, clip=by is None) \
+                .fill_nan('mean')
+            pd.testing.assert_frame_equal(plan.collect(), expected)
+
+        # the grouped thresholds are not merged with fill_nan()
+        self.assertTrue(plan.explain().startswith('2 step(s) => 2 stage(s)'))
+
+    def test_explain(self):
+        plan = (cleaner.lazy(self.df)
+                .change_dtypes({'price': float})
+                .change_dtypes({'b': float, 'price': int})
+                .dedup()
+                .dropna('label')
+                .remove_outliers()
+                .fill_nan('mean'))
+
+        self.assertEqual(plan.explain(), '\n'.join([
+            '6 step(s) => 3 stage(s)',
+            '  1. change_dtypes: price -> float -> int, b -> float',
+            "  2. filter rows (drop_duplicates & dropna(['label'])) with a single row mask",
+            '  3. remove_outliers(std_coeff=1.5) + fill_nan(mean) in a single write per numeric column',
+        ]))
+
+        # the conversions of a column still run in order
+        df = (cleaner.lazy(self.df)
+              .change_dtypes({'price': float})
+              .change_dtypes({'price': int})
+              .collect())
+        self.assertEqual(df['price'].dtype, int)
+
+        # an int column can't hold nulls, a float one can
+        pd.testing.assert_frame_equal(cleaner.lazy(self.df).dropna(['b', 'a']).collect(),
+                                      self.df.dropna(subset=['b', 'a']))
+
+        with self.assertRaises(ValueError):
+            cleaner.lazy(self.df).fill_nan('asdf')
+        # moments only go with the eager 'zscore' without 'by'
+        for params in [{'method': 'iqr'}, {'method': 'mad'}, {'by': 'label'}]:
+            with self.assertRaises(ValueError):
+                cleaner.lazy(self.df).remove_outliers(moments={'a': (0.0, 1.0)}, **params)
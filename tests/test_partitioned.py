@@ -0,0 +1,103 @@
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import numpy as np
+from dfcleaner.cleaner import preprocess
+from dfcleaner.partitioned import preprocess_partitions
+
+
+class TestPartitioned(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n_rows = 4000
+
+        self.df = pd.DataFrame({
+            'a': rng.normal(0, 1, n_rows).round(2),
+            'b': rng.integers(0, 100, n_rows),
+            'c': ['$ {:,.2f}'.format(x) for x in rng.uniform(0, 10000, n_rows)],
+            'd': rng.choice(['x', 'y', None], n_rows),
+            'label': rng.choice([0, 1, np.nan], n_rows, p=[0.45, 0.45, 0.1]),
+        })
+        self.df.loc[rng.random(n_rows) < 0.05, 'a'] = np.nan
+        self.df.loc[rng.random(n_rows) < 0.02, 'c'] = '?'
+        # outliers of the int column in a single partition
+        self.df.loc[10, 'b'] = 100000
+        # duplicate rows spread over different partitions
+        self.df = pd.concat([self.df, self.df.iloc[:300]], ignore_index=True)
+
+        self.tmp_dir = tempfile.mkdtemp()
+        self.input_dir = os.path.join(self.tmp_dir, 'input')
+        self.output_dir = os.path.join(self.tmp_dir, 'output')
+        os.makedirs(self.input_dir)
+        for i, rows in enumerate(np.array_split(np.arange(len(self.df)), 5)):
+            self.df.iloc[rows].to_csv(os.path.join(self.input_dir, 'part-{}.csv'.format(i)), index=False)
+        # what the files read back give
+        self.df = pd.concat([pd.read_csv(os.path.join(self.input_dir, 'part-{}.csv'.format(i)))
+                             for i in range(5)], ignore_index=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _read_output(self, result):
+        return pd.concat([pd.read_csv(path) for path in result['output_paths']], ignore_index=True)
+
+    def test_preprocess_partitions(self):
+        expected = preprocess(self.df, {'c': float}, fill_na_method='mean', label_col='label')
+        expected = expected.reset_index(drop=True)
+
+        # the sketches keep every value of these columns
+        result = preprocess_partitions(self.input_dir, self.output_dir, {'c': float},
+                                       fill_na_method='mean', label_col='label', n_jobs=2,
+                                       quantile_error=1e-4)
+
+        self.assertEqual(result['rows_read'], len(self.df))
+        self.assertEqual(result['rows_written'], len(expected))
+        self.assertEqual(result['duplicates_removed'], 300)
+        # csv files hold the floats with 17 significant digits
+        pd.testing.assert_frame_equal(self._read_output(result), expected, check_exact=False, rtol=1e-12)
+
+    def test_median_tolerance(self):
+        expected = preprocess(self.df, {'c': float}, label_col='label').reset_index(drop=True)
+
+        with ThreadPoolExecutor(2) as executor:
+            result = preprocess_partitions([os.path.join(self.input_dir, 'part-{}.csv'.format(i))
+                                            for i in range(5)],
+                                           self.output_dir, {'c': float}, label_col='label',
+                                           executor=executor, quantile_error=0.01)
+        df = self._read_output(result)
+
+        # b gets nan values too, where its outlier was
+        pd.testing.assert_frame_equal(df[['d', 'label']], expected[['d', 'label']])
+        for col_name in ['a', 'b', 'c']:
+            values = expected[col_name]
+            is_filled = (df[col_name] != values).to_numpy()
+            pd.testing.assert_series_equal(df.loc[~is_filled, col_name], values[~is_filled])
+            if not is_filled.any():
+                # the sketch gave the exact median
+                continue
+
+            # the median sketch gives a value within 1% (in rank) of the median
+            fill_value = df.loc[is_filled, col_name].iloc[0]
+            self.assertTrue((df.loc[is_filled, col_name] == fill_value).all())
+            values = values[~is_filled]
+            tolerance = 0.01 + 1 / len(values)
+            self.assertLessEqual((values < fill_value).mean(), 0.5 + tolerance)
+            self.assertGreaterEqual((values <= fill_value).mean(), 0.5 - tolerance)
+
+        with self.assertRaises(ValueError):
+            preprocess_partitions(self.input_dir, self.output_dir, backend='spark')
+
+    def test_output_names(self):
+        other_dir = os.path.join(self.tmp_dir, 'other')
+        os.makedirs(other_dir)
+        shutil.copy(os.path.join(self.input_dir, 'part-0.csv'), other_dir)
+
+        # both would be written to output_dir/part-0.csv
+        with self.assertRaises(ValueError):
+            preprocess_partitions([os.path.join(self.input_dir, 'part-0.csv'),
+                                   os.path.join(other_dir, 'part-0.csv')], self.output_dir)
+        self.assertFalse(os.path.exists(self.output_dir))
@@ -0,0 +1,97 @@
+import io
+import json
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+import numpy as np
+from dfcleaner import cleaner, profiling
+
+
+class TestProfiling(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n_rows = 1000
+
+        self.df = pd.DataFrame({
+            'a': rng.normal(0, 1, n_rows),
+            'price': ['$ {:,.2f}'.format(x) for x in rng.uniform(0, 10000, n_rows)],
+            'label': rng.choice([0, 1, np.nan], n_rows),
+        })
+        self.df.loc[rng.random(n_rows) < 0.1, 'a'] = np.nan
+        self.df.loc[0, 'a'] = 1000
+        self.df = pd.concat([self.df, self.df.iloc[:100]], ignore_index=True)
+
+    def test_profiler(self):
+        expected = cleaner.preprocess(self.df, {'price': float}, label_col='label')
+
+        received = []
+        with profiling.Profiler(callback=received.append) as profiler:
+            result = cleaner.preprocess(self.df, {'price': float}, label_col='label')
+        self.assertFalse(profiling.is_profiling())
+
+        # profiling doesn't change the results
+        pd.testing.assert_frame_equal(result, expected)
+        self.assertEqual(received, profiler.records)
+
+        steps = {record['path']: record for record in profiler.records if record['column'] is None}
+        self.assertEqual(list(steps), ['preprocess/change_dtypes', 'preprocess/drop_duplicates',
+                                       'preprocess/remove_outliers', 'preprocess/fill_nan', 'preprocess'])
+
+        self.assertEqual(steps['preprocess']['rows_in'], 1100)
+        self.assertEqual(steps['preprocess']['rows_out'], len(expected))
+        self.assertEqual(steps['preprocess/drop_duplicates']['rows_out'], 1000)
+        self.assertEqual(steps['preprocess/change_dtypes']['cells_changed'], 1100)
+        self.assertGreater(steps['preprocess']['peak_memory'], 0)
+        for record in steps.values():
+            self.assertGreaterEqual(record['wall_time'], 0)
+
+        # one record per column worked on
+        columns = {record['column']: record for record in profiler.records
+                   if record['path'] == 'preprocess/remove_outliers' and record['column'] is not None}
+        self.assertEqual(sorted(columns), ['a', 'price'])
+        self.assertEqual(sum(record['cells_changed'] for record in columns.values()),
+                         steps['preprocess/remove_outliers']['cells_changed'])
+        self.assertIsNotNone(columns['a']['wall_time'])
+        # the rows of the step and the memory of the column alone
+        for record in columns.values():
+            self.assertEqual((record['rows_in'], record['rows_out']),
+                             (steps['preprocess/remove_outliers']['rows_in'],
+                              steps['preprocess/remove_outliers']['rows_out']))
+        self.assertGreater(columns['a']['peak_memory'], 0)
+        self.assertLessEqual(columns['a']['peak_memory'], steps['preprocess/remove_outliers']['peak_memory'])
+
+        # json lines
+        f = io.StringIO()
+        profiler.to_json_lines(f)
+        self.assertEqual([json.loads(line) for line in f.getvalue().splitlines()], profiler.to_dicts())
+
+    def test_options(self):
+        with profiling.Profiler(memory=False, count_changes=False) as profiler:
+            cleaner.lazy(self.df).change_dtypes({'price': float}).dedup().fill_nan().collect(n_jobs=2)
+
+        steps = [record for record in profiler.records if record['column'] is None]
+        self.assertEqual([record['step'] for record in steps], ['convert', 'filter_rows', 'clean_numeric'])
+        self.assertTrue(all(record['peak_memory'] is None and record['cells_changed'] is None
+                            for record in steps))
+        self.assertIn('price', [record['column'] for record in profiler.records])
+        self.assertTrue(all(record['peak_memory'] is None for record in profiler.records))
+
+    def test_threads(self):
+        # both threads are inside their 'step' at the same time
+        barrier = threading.Barrier(2)
+
+        @profiling.profiled
+        def step(df):
+            barrier.wait(10)
+            return cleaner.drop_duplicates(df)
+
+        with profiling.Profiler(memory=False) as profiler:
+            with ThreadPoolExecutor(2) as executor:
+                results = list(executor.map(step, [self.df, self.df.iloc[:500]]))
+
+        self.assertEqual([len(result) for result in results], [1000, 500])
+        # every thread has its own stack of steps
+        paths = sorted(record['path'] for record in profiler.records if record['column'] is None)
+        self.assertEqual(paths, ['step', 'step', 'step/drop_duplicates', 'step/drop_duplicates'])
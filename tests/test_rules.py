@@ -0,0 +1,71 @@
+import unittest
+import pandas as pd
+import numpy as np
+from dfcleaner.rules import RuleSet
+from dfcleaner.cleaner import spot_irrelevant_columns
+
+
+class TestRules(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n_rows = 1000
+
+        self.df = pd.DataFrame({
+            'email': ['user{}@example.com'.format(i) for i in range(n_rows)],
+            'country': rng.choice(['fr', 'de', 'us'], n_rows),
+            'version': 3,
+            'empty': np.nan,
+            'amount': rng.normal(0, 1, n_rows),
+            'order_id': np.arange(n_rows),
+        })
+
+    def test_match(self):
+        rules = RuleSet()
+
+        self.assertEqual(rules.match('First_Name'), 'name')
+        self.assertEqual(rules.match('user id'), 'id')
+        self.assertEqual(rules.match('created_at'), 'timestamp')
+        self.assertEqual(rules.match('event_ts'), 'timestamp')
+        self.assertEqual(rules.match('Description'), 'free_text')
+        self.assertIsNone(rules.match('idea'))
+        self.assertIsNone(rules.match('amount'))
+
+        # leftmost match wins
+        self.assertEqual(rules.match('notes name'), 'free_text')
+
+        custom = RuleSet({'internal': r'^_', 'id': r'(\b|_)id\b'})
+        self.assertEqual(custom.match('_loaded'), 'internal')
+        self.assertIsNone(custom.match('surname'))
+
+        with self.assertRaises(ValueError):
+            RuleSet(['name', 'phone'])
+
+    def test_check(self):
+        self.assertEqual(RuleSet().check(self.df), {
+            'email': 'near_unique',
+            'version': 'constant',
+            'empty': 'constant',
+            'order_id': 'id',
+        })
+        self.assertEqual(RuleSet(content_rules=[]).check(self.df), {'order_id': 'id'})
+        self.assertEqual(RuleSet(min_rows=2000).check(self.df.drop(columns='order_id')),
+                         {'version': 'constant', 'empty': 'constant'})
+
+        # a column matching both rules is only reported once
+        self.assertEqual(spot_irrelevant_columns(['name_id', 'Name', 'price']), ['name_id', 'Name'])
+        self.assertEqual(spot_irrelevant_columns(self.df), ['email', 'version', 'empty', 'order_id'])
+
+    def test_check_catalog(self):
+        catalog = {
+            'orders': ['order_id', 'amount', 'created_at'],
+            'customers': self.df[['email', 'country']],
+            'empty': [],
+        }
+        report = RuleSet().check_catalog(catalog)
+
+        self.assertEqual(report.values.tolist(), [
+            ['orders', 'order_id', 'id'],
+            ['orders', 'created_at', 'timestamp'],
+            ['customers', 'email', 'near_unique'],
+        ])
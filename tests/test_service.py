@@ -0,0 +1,82 @@
+import asyncio
+import unittest
+import pandas as pd
+import numpy as np
+from dfcleaner.estimator import Cleaner
+from dfcleaner.service import BatchCleaner, generate_load
+
+
+class TestService(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        history = pd.DataFrame({
+            'a': rng.normal(0, 1, 1000),
+            'price': ['$ {}'.format(value) for value in rng.integers(1, 100, 1000)],
+            'label': rng.integers(0, 2, 1000),
+        })
+        self.cleaner = Cleaner({'price': float}, label_col='label').fit(history)
+
+        self.frames = []
+        for i in range(300):
+            df = history.sample(4, random_state=i).reset_index(drop=True)
+            # nan values and outliers to clean
+            df.loc[0, 'a'] = np.nan if i % 2 else 50.0
+            self.frames.append(df)
+
+    def test_micro_batches(self):
+        async def run():
+            async with BatchCleaner(self.cleaner, max_batch_rows=200, max_latency=0.01) as service:
+                results, _ = await generate_load(service, self.frames, concurrency=100)
+                return results, service.metrics()
+
+        results, metrics = asyncio.run(run())
+
+        for df, cleaned in zip(self.frames, results):
+            pd.testing.assert_frame_equal(cleaned, self.cleaner.transform(df))
+
+        self.assertEqual(metrics['frames'], 300)
+        self.assertEqual(metrics['rows'], 1200)
+        self.assertEqual(metrics['queue_depth'], 0)
+        # concurrent frames share batches of at most 200 rows
+        self.assertLess(metrics['batches'], 300)
+        self.assertGreaterEqual(metrics['batches'], 6)
+        self.assertGreater(metrics['latency_p99'], 0)
+
+    def test_errors(self):
+        bad = self.frames[1].assign(price='1.2.3')
+
+        async def run():
+            async with BatchCleaner(self.cleaner, max_latency=0.01) as service:
+                results = await asyncio.gather(*[service.clean(df) for df in self.frames[:20] + [bad]],
+                                               return_exceptions=True)
+                return results, service.metrics()
+
+        results, metrics = asyncio.run(run())
+
+        # only the caller with the bad frame gets the error
+        self.assertIsInstance(results[-1], ValueError)
+        self.assertTrue(all(isinstance(df, pd.DataFrame) for df in results[:-1]))
+        self.assertEqual(metrics['errors'], 1)
+        self.assertEqual(metrics['frames'], 20)
+
+        with self.assertRaises(ValueError):
+            BatchCleaner(Cleaner())
+
+    def test_cancelled_caller(self):
+        async def run():
+            async with BatchCleaner(self.cleaner, max_latency=0.05) as service:
+                cancelled = asyncio.ensure_future(service.clean(self.frames[0]))
+                batched = asyncio.ensure_future(service.clean(self.frames[1]))
+                await asyncio.sleep(0)
+                cancelled.cancel()
+                cleaned = await batched
+                # the worker is still alive
+                after = await asyncio.wait_for(service.clean(self.frames[2]), 5)
+                return cancelled, cleaned, after
+
+        # a dead worker would make the next caller wait forever
+        cancelled, cleaned, after = asyncio.run(asyncio.wait_for(run(), 10))
+        self.assertTrue(cancelled.cancelled())
+        pd.testing.assert_frame_equal(cleaned, self.cleaner.transform(self.frames[1]))
+        pd.testing.assert_frame_equal(after, self.cleaner.transform(self.frames[2]))
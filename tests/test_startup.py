@@ -0,0 +1,30 @@
+import subprocess
+import sys
+import unittest
+
+# seconds to import all the dfcleaner modules once pandas and numpy are loaded
+_IMPORT_BUDGET = 0.25
+
+_MEASURE_IMPORT = '''
+import sys, time
+import numpy, pandas
+before = set(sys.modules)
+start = time.perf_counter()
+import dfcleaner.cleaner, dfcleaner.lazy, dfcleaner.streaming, dfcleaner.partitioned, dfcleaner.estimator
+print(time.perf_counter() - start)
+print(' '.join(sorted(set(sys.modules) - before)))
+'''
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_import_budget(self):
+        # in a new interpreter, nothing is imported yet
+        output = subprocess.run([sys.executable, '-c', _MEASURE_IMPORT], capture_output=True,
+                                text=True, check=True).stdout.splitlines()
+        import_time, modules = float(output[0]), output[1].split()
+
+        self.assertLess(import_time, _IMPORT_BUDGET)
+        # the optional backends are imported on first use
+        for module in ['tracemalloc', 'tempfile', 'multiprocessing', 'dask']:
+            self.assertNotIn(module, modules)
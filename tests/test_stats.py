@@ -0,0 +1,120 @@
+import unittest
+import pandas as pd
+import numpy as np
+from dfcleaner.stats import Moments, Reservoir, QuantileSketch, HyperLogLog, column_stats
+
+
+class TestStats(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.values = rng.normal(10, 3, 1000)
+        self.values[rng.random(1000) < 0.1] = np.nan
+
+    def test_moments(self):
+        col = pd.Series(self.values)
+
+        moments = Moments.from_array(self.values)
+        self.assertEqual(moments.count, col.count())
+        self.assertEqual(moments.mean, col.mean())
+        self.assertEqual(moments.std, col.std())
+
+        merged = Moments()
+        for chunk in np.array_split(self.values, 7):
+            merged.merge(Moments.from_array(chunk))
+
+        self.assertEqual(merged.count, col.count())
+        self.assertAlmostEqual(merged.mean, col.mean(), places=12)
+        self.assertAlmostEqual(merged.std, col.std(), places=12)
+        self.assertEqual(merged.min, col.min())
+        self.assertEqual(merged.max, col.max())
+
+        self.assertTrue(np.isnan(Moments.from_array([np.nan]).mean))
+        self.assertTrue(np.isnan(Moments.from_array([1.0]).std))
+
+    def test_reservoir(self):
+        reservoir = Reservoir(2000, seed=0)
+        for chunk in np.array_split(self.values, 7):
+            reservoir.update(chunk)
+
+        # everything fits => all the values in their original order
+        np.testing.assert_array_equal(reservoir.values,
+                                      self.values[~np.isnan(self.values)])
+
+        reservoir = Reservoir(100, seed=0)
+        for chunk in np.array_split(self.values, 7):
+            reservoir.update(chunk)
+
+        self.assertEqual(len(reservoir.values), 100)
+        self.assertEqual(reservoir.seen, np.count_nonzero(~np.isnan(self.values)))
+        self.assertTrue(np.isin(reservoir.values, self.values).all())
+
+    def test_quantile_sketch(self):
+        # few values => nothing is compressed and the median is exact
+        sketch = QuantileSketch(0.01)
+        sketch.update(self.values[:100])
+        self.assertEqual(sketch.quantile(0.5), np.nanmedian(self.values[:100]))
+
+        rng = np.random.default_rng(1)
+        values = rng.lognormal(0, 1, 200000)
+        merged = QuantileSketch(0.01, seed=0)
+        for chunk in np.array_split(values, 9):
+            part = QuantileSketch(0.01, seed=0)
+            part.update(chunk)
+            merged.merge(part)
+
+        sorted_values = np.sort(values)
+        for q in [0.1, 0.5, 0.9]:
+            rank = np.searchsorted(sorted_values, merged.quantile(q)) / len(values)
+            self.assertLess(abs(rank - q), 0.01)
+
+        self.assertTrue(np.isnan(QuantileSketch().quantile(0.5)))
+
+        # a rebuilt sketch goes on exactly like the saved one
+        restored = QuantileSketch.from_state(*merged.state())
+        for sketch in [merged, restored]:
+            sketch.update(values[:5000])
+        self.assertEqual(restored.count, merged.count)
+        np.testing.assert_array_equal(restored.items()[0], merged.items()[0])
+
+    def test_hyperloglog(self):
+        # small counts are exact and ints and floats are the same values
+        sketch = HyperLogLog()
+        sketch.update(np.array([1, 2, 3, 3]))
+        sketch.update(np.array([1.0, 4.0, np.nan]))
+        sketch.update(pd.Series(['a', None, 'a']))
+        self.assertEqual(round(sketch.count()), 7)
+
+        merged = HyperLogLog()
+        for chunk in np.array_split(np.arange(300000) % 200000, 7):
+            part = HyperLogLog()
+            part.update(chunk)
+            merged.merge(part)
+        self.assertLess(abs(merged.count() / 200000 - 1), 3 * merged.relative_error)
+
+        self.assertEqual(HyperLogLog().count(), 0)
+        with self.assertRaises(ValueError):
+            HyperLogLog(10).merge(HyperLogLog(12))
+
+    def test_column_stats(self):
+        df = pd.DataFrame({
+            'a': self.values,
+            'b': np.arange(1000),
+            'c': np.nan,
+        })
+        columns = [df[col].to_numpy() for col in df.columns]
+
+        stats = column_stats(columns, quantiles=[0.5, 0.9])
+        np.testing.assert_array_equal(stats.count, df.count())
+        np.testing.assert_array_equal(stats.mean, df.mean())
+        np.testing.assert_array_equal(stats.std, df.std())
+        np.testing.assert_array_equal(stats.median, df.median())
+        np.testing.assert_array_equal(stats.quantiles[0.9], df.quantile(0.9))
+        np.testing.assert_array_equal(stats.min, df.min())
+        np.testing.assert_array_equal(stats.max, df.max())
+
+        # the statistics of many small blocks are merged
+        blocked = column_stats(np.column_stack(columns), block_rows=64)
+        np.testing.assert_array_equal(blocked.count, df.count())
+        np.testing.assert_allclose(blocked.mean, df.mean(), rtol=1e-12)
+        np.testing.assert_allclose(blocked.std, df.std(), rtol=1e-12)
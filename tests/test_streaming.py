@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import unittest
+import pandas as pd
+import numpy as np
+from dfcleaner.cleaner import preprocess
+from dfcleaner.streaming import preprocess_file
+from dfcleaner.dedup import Deduplicator
+
+
+class TestStreaming(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n_rows = 2000
+
+        self.df = pd.DataFrame({
+            'a': rng.normal(0, 1, n_rows).round(2),
+            'b': rng.integers(0, 100, n_rows),
+            'c': ['$ {:,.2f}'.format(x) for x in rng.uniform(0, 10000, n_rows)],
+            'd': rng.choice(['x', 'y', None], n_rows),
+            'label': rng.choice([0, 1, np.nan], n_rows, p=[0.45, 0.45, 0.1]),
+        })
+        self.df.loc[rng.random(n_rows) < 0.05, 'a'] = np.nan
+        self.df.loc[rng.random(n_rows) < 0.02, 'c'] = '?'
+        self.df.loc[10, 'b'] = 100000
+        # duplicate rows spread over different chunks
+        self.df = pd.concat([self.df, self.df.iloc[:300]], ignore_index=True)
+
+        self.tmp_dir = tempfile.mkdtemp()
+        self.input_path = os.path.join(self.tmp_dir, 'input.csv')
+        self.output_path = os.path.join(self.tmp_dir, 'output.csv')
+        self.df.to_csv(self.input_path, index=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_preprocess_file(self):
+        for fill_na_method in ['median', 'mean']:
+            rows = preprocess_file(self.input_path, self.output_path,
+                                   column_dtype_conversion_dictionary={'c': float},
+                                   fill_na_method=fill_na_method,
+                                   label_col='label',
+                                   chunksize=300)
+
+            expected = preprocess(pd.read_csv(self.input_path),
+                                  column_dtype_conversion_dictionary={'c': float},
+                                  fill_na_method=fill_na_method,
+                                  label_col='label')
+            output = pd.read_csv(self.output_path)
+
+            self.assertEqual(rows, {'rows_read': len(self.df),
+                                    'rows_written': len(expected),
+                                    'duplicates_removed': 300})
+            pd.testing.assert_frame_equal(output, expected.reset_index(drop=True))
+
+    def test_preprocess_file_sampled(self):
+        preprocess_file(self.input_path, self.output_path,
+                        column_dtype_conversion_dictionary={'c': float},
+                        chunksize=300, sample_size=50)
+        output = pd.read_csv(self.output_path)
+
+        self.assertFalse(output[['a', 'b', 'c', 'label']].isna().any().any())
+        self.assertEqual(len(output), len(self.df.drop_duplicates()))
+
+    def test_preprocess_file_shared_deduplicator(self):
+        first_path = os.path.join(self.tmp_dir, 'first.csv')
+        self.df.iloc[:1000].to_csv(first_path, index=False)
+
+        with Deduplicator(max_fingerprints=100) as deduplicator:
+            preprocess_file(first_path, self.output_path, chunksize=300,
+                            deduplicator=deduplicator)
+            rows = preprocess_file(self.input_path, self.output_path, chunksize=300,
+                                   deduplicator=deduplicator)
+
+        # the rows of the first file are duplicates in the second one
+        self.assertEqual(rows['duplicates_removed'], 1300)
+        self.assertEqual(rows['rows_written'], len(self.df.drop_duplicates()) - 1000)